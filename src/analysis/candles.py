@@ -0,0 +1,141 @@
+import numpy as np
+
+from src.collection.kline_store import INTERVALO_MS
+
+# Resoluções mantidas a partir dos ticks (nomes iguais aos intervalos de kline da Binance)
+RESOLUCOES_PADRAO = ('1m', '5m', '1h', '1d')
+
+
+def novo_candle(inicio, preco, volume_buy=None, volume_sell=None):
+    return {
+        'inicio': inicio, 'abertura': preco, 'maxima': preco, 'minima': preco, 'fechamento': preco,
+        'ticks': 1,
+        'soma_volume_buy': volume_buy or 0.0, 'n_volume_buy': int(volume_buy is not None),
+        'soma_volume_sell': volume_sell or 0.0, 'n_volume_sell': int(volume_sell is not None),
+    }
+
+
+def _somar(candle, preco, volume_buy, volume_sell):
+    if preco > candle['maxima']:
+        candle['maxima'] = preco
+    if preco < candle['minima']:
+        candle['minima'] = preco
+    candle['ticks'] += 1
+    if volume_buy is not None:
+        candle['soma_volume_buy'] += volume_buy
+        candle['n_volume_buy'] += 1
+    if volume_sell is not None:
+        candle['soma_volume_sell'] += volume_sell
+        candle['n_volume_sell'] += 1
+
+
+def resumo_candle(candle):
+    """Candle interno -> campos gravados/servidos (médias dos volumes do livro no período)."""
+    return {
+        'inicio': candle['inicio'],
+        'abertura': candle['abertura'], 'maxima': candle['maxima'],
+        'minima': candle['minima'], 'fechamento': candle['fechamento'],
+        'ticks': candle['ticks'],
+        'volume_buy_medio': candle['soma_volume_buy'] / candle['n_volume_buy'] if candle['n_volume_buy'] else None,
+        'volume_sell_medio': candle['soma_volume_sell'] / candle['n_volume_sell'] if candle['n_volume_sell'] else None,
+    }
+
+
+class AgregadorCandles:
+    """
+    Candles OHLC de várias resoluções mantidos tick a tick (O(1) por tick e resolução).
+
+    `atualizar` devolve os candles que fecharam com aquele tick, prontos para
+    gravar. Um tick atrasado que cai no último candle fechado o corrige e o
+    devolve de novo (a gravação é um upsert); ticks ainda mais antigos são
+    só contados em `atrasados` e ficam para a reconciliação com as klines.
+
+    Os ticks trazem o preço e os volumes do livro de ofertas (não o volume
+    negociado): o candle guarda a média desses volumes, e o volume negociado
+    vem das klines na reconciliação.
+    """
+
+    def __init__(self, resolucoes=RESOLUCOES_PADRAO):
+        self.passos = {resolucao: INTERVALO_MS[resolucao] for resolucao in resolucoes}
+        self.abertos = dict.fromkeys(self.passos)
+        self.ultimos_fechados = dict.fromkeys(self.passos)
+        self.atrasados = 0
+
+    def atualizar(self, t_ms, preco, volume_buy=None, volume_sell=None):
+        fechados = []
+        for resolucao, passo in self.passos.items():
+            inicio = t_ms - t_ms % passo
+            aberto = self.abertos[resolucao]
+            if aberto is None or inicio > aberto['inicio']:
+                if aberto is not None:
+                    fechados.append((resolucao, resumo_candle(aberto)))
+                    self.ultimos_fechados[resolucao] = aberto
+                self.abertos[resolucao] = novo_candle(inicio, preco, volume_buy, volume_sell)
+            elif inicio == aberto['inicio']:
+                _somar(aberto, preco, volume_buy, volume_sell)
+                aberto['fechamento'] = preco
+            else:
+                anterior = self.ultimos_fechados[resolucao]
+                if anterior is not None and anterior['inicio'] == inicio:
+                    # Fora de ordem: entra no extremo/volume, mas não muda o fechamento
+                    _somar(anterior, preco, volume_buy, volume_sell)
+                    fechados.append((resolucao, resumo_candle(anterior)))
+                else:
+                    self.atrasados += 1
+        return fechados
+
+    def aquecer(self, tempos, precos, volumes_buy=None, volumes_sell=None):
+        """
+        Recria os candles abertos a partir dos ticks já gravados (ex.: ao
+        reiniciar o servidor), incluindo as somas dos volumes do livro
+        (volumes ausentes como None ou NaN).
+        """
+        tempos = np.asarray(tempos, dtype=np.int64)
+        precos = np.asarray(precos, dtype=np.float64)
+        if not len(tempos):
+            return
+        volumes = {
+            'buy': np.asarray(volumes_buy if volumes_buy is not None else [None] * len(tempos), dtype=np.float64),
+            'sell': np.asarray(volumes_sell if volumes_sell is not None else [None] * len(tempos), dtype=np.float64),
+        }
+        for resolucao, passo in self.passos.items():
+            inicio = int(tempos[-1] - tempos[-1] % passo)
+            desde = np.searchsorted(tempos, inicio, 'left')
+            candles = agregar(tempos[desde:], precos[desde:], passo)
+            if len(candles['inicio']):
+                self.abertos[resolucao] = novo_candle(inicio, float(candles['abertura'][0]))
+                self.abertos[resolucao].update(maxima=float(candles['maxima'][0]), minima=float(candles['minima'][0]),
+                                               fechamento=float(candles['fechamento'][0]),
+                                               ticks=int(candles['ticks'][0]))
+                for lado, valores in volumes.items():
+                    presentes = valores[desde:][~np.isnan(valores[desde:])]
+                    self.abertos[resolucao].update({f'soma_volume_{lado}': float(presentes.sum()),
+                                                    f'n_volume_{lado}': len(presentes)})
+
+    def candles_abertos(self, resolucao):
+        aberto = self.abertos.get(resolucao)
+        return [resumo_candle(aberto)] if aberto is not None else []
+
+
+def agregar(tempos, precos, passo):
+    """
+    Candles de uma série inteira (tempos ordenados, em ms) de uma vez, com numpy.
+
+    Retorna um dict de colunas: inicio, abertura, maxima, minima, fechamento, ticks.
+    """
+    tempos = np.asarray(tempos, dtype=np.int64)
+    precos = np.asarray(precos, dtype=np.float64)
+    if not len(tempos):
+        vazio = np.empty(0)
+        return {'inicio': vazio.astype(np.int64), 'abertura': vazio, 'maxima': vazio, 'minima': vazio,
+                'fechamento': vazio, 'ticks': vazio.astype(np.int64)}
+    inicios = tempos - tempos % passo
+    cortes = np.flatnonzero(np.r_[True, inicios[1:] != inicios[:-1]])
+    return {
+        'inicio': inicios[cortes],
+        'abertura': precos[cortes],
+        'maxima': np.maximum.reduceat(precos, cortes),
+        'minima': np.minimum.reduceat(precos, cortes),
+        'fechamento': precos[np.r_[cortes[1:] - 1, len(precos) - 1]],
+        'ticks': np.diff(np.r_[cortes, len(precos)]),
+    }
@@ -0,0 +1,178 @@
+import time
+import numpy as np
+import pandas as pd
+
+TABELA_ANALISE = '[BTC].[dbo].[bitcoin_data_analise]'
+TABELA_STAGING = '#bitcoin_data_analise_staging'
+COLUNA_CHAVE = 'timestamp'
+COLUNA_HASH = 'hash_linha'
+
+
+def _tipo_sql(serie):
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return 'DATETIME2'
+    if pd.api.types.is_integer_dtype(serie):
+        return 'BIGINT'
+    if pd.api.types.is_float_dtype(serie):
+        return 'FLOAT'
+    return 'NVARCHAR(64)'
+
+
+def _para_parametros(df):
+    """Converte o DataFrame em lista de tuplas com NaN/NaT -> None (NULL no SQL)."""
+    valores = df.to_numpy(dtype=object)
+    valores[pd.isna(df).to_numpy()] = None
+    return [tuple(linha) for linha in valores]
+
+
+class CargaAnaliseSqlServer:
+    """
+    Carga em massa dos resultados da análise em bitcoin_data_analise.
+
+    As linhas são enviadas em lotes com parâmetros vinculados em array
+    (`fast_executemany`) para uma tabela temporária de staging e aplicadas com
+    um único MERGE por timestamp, de forma idempotente.
+
+    Cada linha é gravada com o seu hash (coluna `hash_linha`). O maior
+    timestamp já gravado é a marca d'água: linhas depois dela são novas e vão
+    direto; para as anteriores, os hashes gravados são lidos do servidor só no
+    intervalo do bloco, e vão ao staging apenas as linhas cujo hash mudou. O
+    MERGE compara o hash de novo e não reescreve linhas iguais. Nada é
+    guardado localmente entre cargas, e a memória é proporcional ao bloco,
+    não à tabela.
+
+    Uso: `enviar(df)` para cada bloco e `finalizar()` ao final.
+    """
+
+    def __init__(self, cnxn, tabela=TABELA_ANALISE, tamanho_lote=5_000, tamanho_lote_max=100_000):
+        self.cnxn = cnxn
+        self.tabela = tabela
+        self.tamanho_lote = tamanho_lote
+        self.tamanho_lote_max = tamanho_lote_max
+        self.melhor_vazao = 0.0
+        self.colunas = None
+        self.marca_dagua = None
+        self.ultima_chave = None
+        self.enviadas = 0
+        self.ignoradas = 0
+
+    def _preparar(self, df):
+        """
+        Cria a tabela de destino (se não existir, ou só a coluna de hash numa
+        tabela antiga), a tabela temporária de staging e lê a marca d'água.
+        """
+        self.colunas = list(df.columns)
+        definicoes = ', '.join(f'[{c}] {_tipo_sql(df[c])}' for c in self.colunas) + f', [{COLUNA_HASH}] BIGINT'
+        definicoes_destino = ', '.join(
+            f'[{c}] {_tipo_sql(df[c])}' + (' NOT NULL PRIMARY KEY' if c == COLUNA_CHAVE else '')
+            for c in self.colunas
+        ) + f', [{COLUNA_HASH}] BIGINT NULL'
+        cursor = self.cnxn.cursor()
+        cursor.execute(f"IF OBJECT_ID('{self.tabela}', 'U') IS NULL CREATE TABLE {self.tabela} ({definicoes_destino})")
+        cursor.execute(f"IF COL_LENGTH('{self.tabela}', '{COLUNA_HASH}') IS NULL "
+                       f"ALTER TABLE {self.tabela} ADD [{COLUNA_HASH}] BIGINT NULL")
+        cursor.execute(f"IF OBJECT_ID('tempdb..{TABELA_STAGING}') IS NOT NULL DROP TABLE {TABELA_STAGING}")
+        cursor.execute(f"CREATE TABLE {TABELA_STAGING} ({definicoes})")
+        marca = cursor.execute(f"SELECT MAX([{COLUNA_CHAVE}]) FROM {self.tabela}").fetchone()[0]
+        self.marca_dagua = None if marca is None else pd.Timestamp(marca)
+        cursor.close()
+
+    def _hashes_gravados(self, inicio, fim):
+        """(índice de timestamps, hashes) gravados entre `inicio` e `fim`; hash None em linhas antigas."""
+        cursor = self.cnxn.cursor()
+        linhas = cursor.execute(
+            f"SELECT [{COLUNA_CHAVE}], [{COLUNA_HASH}] FROM {self.tabela} "
+            f"WHERE [{COLUNA_CHAVE}] BETWEEN ? AND ?",
+            inicio.to_pydatetime(), fim.to_pydatetime(),
+        ).fetchall()
+        cursor.close()
+        return (pd.DatetimeIndex([linha[0] for linha in linhas]),
+                np.array([linha[1] for linha in linhas], dtype=object))
+
+    def _filtrar_alteradas(self, df):
+        """
+        Remove timestamps repetidos (vale a última linha) e mantém só as linhas
+        novas ou cujo hash difere do gravado; devolve-as com a coluna de hash.
+        """
+        df = df.drop_duplicates(COLUNA_CHAVE, keep='last')
+        hashes = pd.util.hash_pandas_object(df, index=False).to_numpy().view(np.int64)
+        chaves = df[COLUNA_CHAVE]
+        alteradas = np.ones(len(df), dtype=bool)
+        if self.marca_dagua is not None and len(df) and chaves.min() <= self.marca_dagua:
+            indice, gravados = self._hashes_gravados(chaves.min(), min(chaves.max(), self.marca_dagua))
+            posicoes = indice.get_indexer(chaves)
+            existe = posicoes >= 0
+            alteradas[existe] = gravados[posicoes[existe]] != hashes[existe]
+        self.ignoradas += int((~alteradas).sum())
+        return df[alteradas].assign(**{COLUNA_HASH: hashes[alteradas]})
+
+    def _descartar_repetida(self, df):
+        """
+        Um timestamp repetido pode cair na fronteira entre dois blocos: tira do
+        staging a versão anterior, já que o MERGE falha com chaves duplicadas.
+        """
+        if self.ultima_chave is not None and len(df) and df[COLUNA_CHAVE].iloc[0] == self.ultima_chave:
+            cursor = self.cnxn.cursor()
+            cursor.execute(f"DELETE FROM {TABELA_STAGING} WHERE [{COLUNA_CHAVE}] = ?",
+                           self.ultima_chave.to_pydatetime())
+            self.enviadas -= max(cursor.rowcount, 0)
+            cursor.close()
+        if len(df):
+            self.ultima_chave = df[COLUNA_CHAVE].iloc[-1]
+
+    def _inserir_staging(self, df):
+        """Insere no staging em lotes, ajustando o tamanho do lote pela vazão medida."""
+        colunas = ', '.join(f'[{c}]' for c in df.columns)
+        marcadores = ', '.join('?' for _ in df.columns)
+        sql = f"INSERT INTO {TABELA_STAGING} ({colunas}) VALUES ({marcadores})"
+        cursor = self.cnxn.cursor()
+        cursor.fast_executemany = True
+        inicio = 0
+        while inicio < len(df):
+            lote = df.iloc[inicio:inicio + self.tamanho_lote]
+            t0 = time.perf_counter()
+            cursor.executemany(sql, _para_parametros(lote))
+            vazao = len(lote) / max(time.perf_counter() - t0, 1e-9)
+            inicio += len(lote)
+            # Dobra o lote enquanto a vazão melhora; volta atrás quando piora
+            if vazao > self.melhor_vazao * 1.1 and self.tamanho_lote < self.tamanho_lote_max:
+                self.melhor_vazao = vazao
+                self.tamanho_lote = min(self.tamanho_lote * 2, self.tamanho_lote_max)
+            elif vazao < self.melhor_vazao * 0.8:
+                self.tamanho_lote = max(self.tamanho_lote // 2, 1_000)
+        cursor.close()
+
+    def enviar(self, df):
+        """Envia ao staging as linhas novas ou alteradas de `df`."""
+        if self.colunas is None:
+            self._preparar(df)
+        df = df[self.colunas]
+        self._descartar_repetida(df)
+        alteradas = self._filtrar_alteradas(df)
+        if not alteradas.empty:
+            self._inserir_staging(alteradas)
+            self.enviadas += len(alteradas)
+
+    def finalizar(self):
+        """Aplica o staging na tabela final com MERGE (upsert por timestamp) e confirma."""
+        if self.colunas is None or self.enviadas == 0:
+            print(f"Nenhuma linha alterada para carregar em {self.tabela} ({self.ignoradas} inalteradas).")
+            return 0
+        todas = self.colunas + [COLUNA_HASH]
+        demais = [c for c in todas if c != COLUNA_CHAVE]
+        atualizacao = ', '.join(f'destino.[{c}] = origem.[{c}]' for c in demais)
+        colunas = ', '.join(f'[{c}]' for c in todas)
+        valores = ', '.join(f'origem.[{c}]' for c in todas)
+        cursor = self.cnxn.cursor()
+        cursor.execute(
+            f"MERGE {self.tabela} WITH (HOLDLOCK) AS destino "
+            f"USING {TABELA_STAGING} AS origem ON destino.[{COLUNA_CHAVE}] = origem.[{COLUNA_CHAVE}] "
+            f"WHEN MATCHED AND (destino.[{COLUNA_HASH}] IS NULL OR destino.[{COLUNA_HASH}] <> origem.[{COLUNA_HASH}]) "
+            f"THEN UPDATE SET {atualizacao} "
+            f"WHEN NOT MATCHED THEN INSERT ({colunas}) VALUES ({valores});"
+        )
+        cursor.execute(f"DROP TABLE {TABELA_STAGING}")
+        self.cnxn.commit()
+        cursor.close()
+        print(f"{self.enviadas} linhas carregadas em {self.tabela} ({self.ignoradas} inalteradas).")
+        return self.enviadas
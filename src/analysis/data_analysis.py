@@ -1,9 +1,19 @@
+import sys
 import pyodbc
 import pandas as pd
 from datetime import datetime
 import os # Importar os
 from dotenv import load_dotenv # Importar dotenv
 
+# Permite executar o script diretamente (python src/analysis/data_analysis.py)
+RAIZ_PROJETO = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if RAIZ_PROJETO not in sys.path:
+    sys.path.insert(0, RAIZ_PROJETO)
+
+from src.analysis.indicadores import IndicadoresEmBlocos, INDICADORES_PADRAO
+from src.analysis.carga_sql_server import CargaAnaliseSqlServer
+from src.analysis.exportacao_parquet import ExportadorParquet
+
 load_dotenv() # Carregar variáveis do arquivo .env
 
 def validar_datas(start_date, end_date):
@@ -46,32 +56,62 @@ def carregar_dados_sql_server(cnxn, query):
     df = pd.read_sql_query(query, cnxn)
     return df
 
-def calcular_retornos(df):
-    df['retorno_diario'] = df['close'].pct_change()
-    df['retorno_acumulado'] = (1 + df['retorno_diario']).cumprod() - 1
-    return df
-
-def calcular_medias_moveis(df, periodos=[7, 30, 200]):
-    for periodo in periodos:
-        df[f'mm_{periodo}'] = df['close'].rolling(window=periodo).mean()
-    return df
-
-def calcular_volatilidade(df, periodo=30):
-    df[f'volatilidade_{periodo}'] = df['close'].rolling(window=periodo).std()
-    return df
+# Tipos das colunas de bitcoin_prices, aplicados bloco a bloco na leitura em streaming
+TIPOS_COLUNAS = {
+    'open': 'float64',
+    'high': 'float64',
+    'low': 'float64',
+    'close': 'float64',
+    'volume': 'float64',
+}
+
+def carregar_dados_sql_server_em_blocos(cnxn, query, tamanho_bloco=100_000):
+    """Lê a consulta em blocos de `tamanho_bloco` linhas já com os tipos convertidos."""
+    for bloco in pd.read_sql_query(query, cnxn, chunksize=tamanho_bloco, parse_dates=['timestamp']):
+        tipos = {coluna: tipo for coluna, tipo in TIPOS_COLUNAS.items() if coluna in bloco.columns}
+        yield bloco.astype(tipos)
+
+def processar_em_blocos(cnxn, query, diretorio_saida, indicadores=INDICADORES_PADRAO, tamanho_bloco=100_000, ao_processar=None):
+    """
+    Pipeline de análise com memória constante: lê a consulta (que deve vir
+    ordenada por timestamp) em blocos, calcula os indicadores carregando o
+    estado das janelas entre blocos e exporta cada bloco em Parquet
+    particionado por ano/mês assim que fica pronto. O pico de memória depende
+    de `tamanho_bloco`, não do tamanho da tabela.
+
+    `ao_processar(bloco)`, se informado, também recebe cada bloco
+    (ex.: CargaAnaliseSqlServer.enviar). Blocos vazios (o read_sql com
+    chunksize devolve um bloco vazio para uma tabela vazia) são ignorados.
+    """
+    processador = IndicadoresEmBlocos(indicadores)
+    exportador = ExportadorParquet(diretorio_saida)
+    total = 0
+    for bloco in carregar_dados_sql_server_em_blocos(cnxn, query, tamanho_bloco):
+        if bloco.empty:
+            continue
+        bloco = processador.processar(bloco)
+        bloco = adicionar_dia_semana(bloco)
+        if ao_processar:
+            ao_processar(bloco)
+        exportador.adicionar(bloco)
+        total += len(bloco)
+        print(f"{total} linhas processadas...")
+    exportador.finalizar()
+    return total
 
 def adicionar_dia_semana(df):
     df['dia_da_semana'] = df['timestamp'].dt.day_name()
     return df
 
 def preparar_dados_para_powerbi(df):
-    df['timestamp'] = df['timestamp'].dt.strftime('%Y-%m-%d')
+    # Mantém o timestamp nativo (o Parquet preserva o tipo para o Power BI)
     df = df.sort_values(by='timestamp')
     return df
 
 if __name__ == '__main__':
     # Definir cnxn como None inicialmente para o bloco finally
     cnxn = None
+    cnxn_carga = None
     try:
         # Validar datas
         start_date_str = "1 Jan, 2019"
@@ -81,28 +121,16 @@ if __name__ == '__main__':
         #Conectar ao SQL Server
         cnxn = conectar_sql_server()
 
-        #Consultar dados
+        #Consultar, calcular e salvar em blocos (memória constante, sem carregar a tabela inteira)
         query = "SELECT * FROM bitcoin_prices ORDER BY timestamp ASC" #Ordenar os dados por data
-        df = carregar_dados_sql_server(cnxn, query)
-    
-        #Calcular Retornos
-        df = calcular_retornos(df)
-    
-        #Calcular Médias Móveis
-        df = calcular_medias_moveis(df)
-
-        #Calcular Volatilidade
-        df = calcular_volatilidade(df)
-
-        #Adicionar Dia da Semana
-        df = adicionar_dia_semana(df)
-        
-        #Preparar os dados para o Power BI
-        df = preparar_dados_para_powerbi(df)
-
-        #Salvar os dados
-        df.to_csv('bitcoin_data_analisado.csv', index=False)
-        print("Dados analisados e salvos em 'bitcoin_data_analisado.csv'")
+        # A carga usa uma segunda conexão: a primeira fica ocupada com a leitura em blocos
+        cnxn_carga = conectar_sql_server()
+        carga = CargaAnaliseSqlServer(cnxn_carga)
+        total = processar_em_blocos(cnxn, query, 'data/processed/bitcoin_data_analisado', ao_processar=carga.enviar)
+        print(f"{total} linhas analisadas e salvas em 'data/processed/bitcoin_data_analisado'")
+
+        #Carregar em bitcoin_data_analise somente as linhas novas ou alteradas
+        carga.finalizar()
 
     except pyodbc.Error as ex:
       sqlstate = ex.args[0]
@@ -114,4 +142,6 @@ if __name__ == '__main__':
     finally:
         # Verificar se cnxn foi inicializado antes de tentar fechar
         if cnxn:
-            cnxn.close()
\ No newline at end of file
+            cnxn.close()
+        if cnxn_carga:
+            cnxn_carga.close()
\ No newline at end of file
@@ -0,0 +1,157 @@
+import os
+import json
+import hashlib
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+MANIFESTO = '_manifest.json'
+
+
+def _caminho_particao(diretorio, ano, mes):
+    return os.path.join(diretorio, f"ano={ano:04d}", f"mes={mes:02d}", "part-0.parquet")
+
+
+def _hash_conteudo(df):
+    """Hash estável do conteúdo de uma partição, usado para detectar mudanças."""
+    hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    digest = hashlib.sha1(hashes.tobytes())
+    digest.update(','.join(df.columns).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _estatisticas(df):
+    """Mínimo e máximo de cada coluna de tempo ou numérica (para pular partições na leitura)."""
+    estatisticas = {}
+    for coluna in df.columns:
+        serie = df[coluna]
+        if pd.api.types.is_datetime64_any_dtype(serie):
+            minimo, maximo = serie.min(), serie.max()
+            if pd.notna(minimo):
+                estatisticas[coluna] = {'min': minimo.isoformat(), 'max': maximo.isoformat()}
+        elif pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie):
+            minimo, maximo = serie.min(), serie.max()
+            if pd.notna(minimo):
+                estatisticas[coluna] = {'min': float(minimo), 'max': float(maximo)}
+    return estatisticas
+
+
+class ExportadorParquet:
+    """
+    Exporta um DataFrame em Parquet particionado por ano/mês, mantendo os
+    timestamps nativos e os tipos numéricos.
+
+    Aceita os dados de uma vez (`exportar`) ou em blocos ordenados por tempo
+    (`adicionar` + `finalizar`), caso em que só o mês corrente fica em memória.
+    Cada partição só é regravada se o conteúdo mudou, e o _manifest.json guarda
+    linhas, hash e min/máx por coluna para que leitores pulem partições.
+    """
+
+    def __init__(self, diretorio, coluna_tempo='timestamp'):
+        self.diretorio = diretorio
+        self.coluna_tempo = coluna_tempo
+        self.manifesto = self._ler_manifesto()
+        self.pendente = None
+        self.gravadas = 0
+        self.inalteradas = 0
+
+    def _ler_manifesto(self):
+        caminho = os.path.join(self.diretorio, MANIFESTO)
+        if not os.path.exists(caminho):
+            return {'coluna_tempo': self.coluna_tempo, 'particoes': {}}
+        with open(caminho, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _gravar_manifesto(self):
+        os.makedirs(self.diretorio, exist_ok=True)
+        caminho = os.path.join(self.diretorio, MANIFESTO)
+        with open(caminho + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(self.manifesto, f, indent=2)
+        os.replace(caminho + '.tmp', caminho)
+
+    def _gravar_particao(self, ano, mes, df):
+        chave = f"{ano:04d}-{mes:02d}"
+        df = df.reset_index(drop=True)
+        hash_atual = _hash_conteudo(df)
+        anterior = self.manifesto['particoes'].get(chave)
+        caminho = _caminho_particao(self.diretorio, ano, mes)
+        if anterior and anterior['hash'] == hash_atual and os.path.exists(caminho):
+            self.inalteradas += 1
+            return
+
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        tabela = pa.Table.from_pandas(df, preserve_index=False)
+        pq.write_table(tabela, caminho + '.tmp', compression='zstd')
+        os.replace(caminho + '.tmp', caminho)
+        self.manifesto['particoes'][chave] = {
+            'arquivo': os.path.relpath(caminho, self.diretorio).replace(os.sep, '/'),
+            'linhas': len(df),
+            'hash': hash_atual,
+            'estatisticas': _estatisticas(df),
+        }
+        self.gravadas += 1
+
+    def _gravar_por_mes(self, df):
+        tempo = df[self.coluna_tempo]
+        for (ano, mes), grupo in df.groupby([tempo.dt.year, tempo.dt.month], sort=True):
+            self._gravar_particao(int(ano), int(mes), grupo)
+
+    def adicionar(self, bloco):
+        """Recebe o próximo bloco (ordenado por tempo); grava os meses já completos."""
+        if bloco.empty:
+            return
+        if self.pendente is not None:
+            bloco = pd.concat([self.pendente, bloco], ignore_index=True)
+        tempo = bloco[self.coluna_tempo]
+        ultimo = tempo.iloc[-1]
+        # O último mês pode continuar no próximo bloco: fica pendente
+        do_ultimo_mes = (tempo.dt.year == ultimo.year) & (tempo.dt.month == ultimo.month)
+        completos = bloco[~do_ultimo_mes]
+        if not completos.empty:
+            self._gravar_por_mes(completos)
+        self.pendente = bloco[do_ultimo_mes]
+
+    def finalizar(self):
+        """Grava o mês pendente e o manifesto."""
+        if self.pendente is not None and not self.pendente.empty:
+            self._gravar_por_mes(self.pendente)
+        self.pendente = None
+        self._gravar_manifesto()
+        print(f"Parquet em {self.diretorio}: {self.gravadas} partições gravadas, {self.inalteradas} inalteradas.")
+
+    def exportar(self, df):
+        self.adicionar(df.sort_values(self.coluna_tempo))
+        self.finalizar()
+
+
+def ler_parquet_particionado(diretorio, inicio=None, fim=None, colunas=None):
+    """
+    Lê as partições com dados em [inicio, fim], pulando pelo manifesto as que
+    estão fora da faixa sem abrir os arquivos.
+    """
+    with open(os.path.join(diretorio, MANIFESTO), 'r', encoding='utf-8') as f:
+        manifesto = json.load(f)
+    coluna_tempo = manifesto['coluna_tempo']
+    inicio = pd.Timestamp(inicio) if inicio is not None else None
+    fim = pd.Timestamp(fim) if fim is not None else None
+
+    partes = []
+    for chave in sorted(manifesto['particoes']):
+        particao = manifesto['particoes'][chave]
+        faixa = particao['estatisticas'].get(coluna_tempo)
+        if faixa:
+            if inicio is not None and pd.Timestamp(faixa['max']) < inicio:
+                continue
+            if fim is not None and pd.Timestamp(faixa['min']) > fim:
+                continue
+        partes.append(pq.read_table(os.path.join(diretorio, particao['arquivo']), columns=colunas).to_pandas())
+
+    if not partes:
+        return pd.DataFrame(columns=colunas)
+    df = pd.concat(partes, ignore_index=True)
+    if coluna_tempo in df.columns:
+        if inicio is not None:
+            df = df[df[coluna_tempo] >= inicio]
+        if fim is not None:
+            df = df[df[coluna_tempo] <= fim]
+    return df.reset_index(drop=True)
@@ -0,0 +1,252 @@
+import os
+import json
+import math
+
+# Versões incrementais (O(1) por tick) dos indicadores de indicadores.py, para
+# o fluxo ao vivo. Os resultados coincidem com o cálculo em lote sobre a mesma
+# sequência de preços.
+
+
+class MediaMovelIncremental:
+    """Média móvel simples com buffer circular e soma compensada (Kahan)."""
+
+    tipo = 'mm'
+
+    def __init__(self, periodo):
+        self.periodo = periodo
+        self.buffer = [0.0] * periodo
+        self.posicao = 0
+        self.contagem = 0
+        self.soma = 0.0
+        self.compensacao = 0.0
+
+    def _somar(self, valor):
+        y = valor - self.compensacao
+        t = self.soma + y
+        self.compensacao = (t - self.soma) - y
+        self.soma = t
+
+    def atualizar(self, valor):
+        if self.contagem == self.periodo:
+            self._somar(-self.buffer[self.posicao])
+        else:
+            self.contagem += 1
+        self._somar(valor)
+        self.buffer[self.posicao] = valor
+        self.posicao = (self.posicao + 1) % self.periodo
+        return self.valor
+
+    @property
+    def valor(self):
+        if self.contagem < self.periodo:
+            return None
+        return self.soma / self.periodo
+
+    def estado(self):
+        return {
+            'periodo': self.periodo, 'buffer': list(self.buffer), 'posicao': self.posicao,
+            'contagem': self.contagem, 'soma': self.soma, 'compensacao': self.compensacao,
+        }
+
+    @classmethod
+    def restaurar(cls, estado):
+        obj = cls(estado['periodo'])
+        obj.buffer = list(estado['buffer'])
+        obj.posicao = estado['posicao']
+        obj.contagem = estado['contagem']
+        obj.soma = estado['soma']
+        obj.compensacao = estado['compensacao']
+        return obj
+
+
+class VolatilidadeIncremental:
+    """
+    Desvio padrão amostral móvel (ddof=1) pelo algoritmo de Welford adaptado
+    para janela deslizante: cada tick entra e o mais antigo sai em O(1).
+    """
+
+    tipo = 'volatilidade'
+
+    def __init__(self, periodo):
+        self.periodo = periodo
+        self.buffer = [0.0] * periodo
+        self.posicao = 0
+        self.contagem = 0
+        self.media = 0.0
+        self.m2 = 0.0
+
+    def atualizar(self, valor):
+        if self.contagem < self.periodo:
+            self.contagem += 1
+            delta = valor - self.media
+            self.media += delta / self.contagem
+            self.m2 += delta * (valor - self.media)
+        else:
+            antigo = self.buffer[self.posicao]
+            media_anterior = self.media
+            self.media += (valor - antigo) / self.periodo
+            self.m2 += (valor - antigo) * (valor - self.media + antigo - media_anterior)
+            # Erros de arredondamento podem deixar m2 levemente negativo
+            self.m2 = max(self.m2, 0.0)
+        self.buffer[self.posicao] = valor
+        self.posicao = (self.posicao + 1) % self.periodo
+        return self.valor
+
+    @property
+    def valor(self):
+        if self.contagem < self.periodo or self.periodo < 2:
+            return None
+        return math.sqrt(self.m2 / (self.periodo - 1))
+
+    def estado(self):
+        return {
+            'periodo': self.periodo, 'buffer': list(self.buffer), 'posicao': self.posicao,
+            'contagem': self.contagem, 'media': self.media, 'm2': self.m2,
+        }
+
+    @classmethod
+    def restaurar(cls, estado):
+        obj = cls(estado['periodo'])
+        obj.buffer = list(estado['buffer'])
+        obj.posicao = estado['posicao']
+        obj.contagem = estado['contagem']
+        obj.media = estado['media']
+        obj.m2 = estado['m2']
+        return obj
+
+
+class EMAIncremental:
+    """Média exponencial com alpha = 2 / (periodo + 1), iniciada no primeiro valor."""
+
+    tipo = 'ema'
+
+    def __init__(self, periodo):
+        self.periodo = periodo
+        self.alpha = 2.0 / (periodo + 1)
+        self.valor = None
+
+    def atualizar(self, valor):
+        if self.valor is None:
+            self.valor = valor
+        else:
+            self.valor += self.alpha * (valor - self.valor)
+        return self.valor
+
+    def estado(self):
+        return {'periodo': self.periodo, 'valor': self.valor}
+
+    @classmethod
+    def restaurar(cls, estado):
+        obj = cls(estado['periodo'])
+        obj.valor = estado['valor']
+        return obj
+
+
+class RSIIncremental:
+    """RSI de Wilder (alpha = 1/periodo); disponível após `periodo` variações."""
+
+    tipo = 'rsi'
+
+    def __init__(self, periodo=14):
+        self.periodo = periodo
+        self.alpha = 1.0 / periodo
+        self.anterior = None
+        self.media_ganhos = None
+        self.media_perdas = None
+        self.variacoes = 0
+
+    def atualizar(self, valor):
+        if self.anterior is not None:
+            delta = valor - self.anterior
+            ganho = delta if delta > 0 else 0.0
+            perda = -delta if delta < 0 else 0.0
+            if self.media_ganhos is None:
+                self.media_ganhos, self.media_perdas = ganho, perda
+            else:
+                self.media_ganhos += self.alpha * (ganho - self.media_ganhos)
+                self.media_perdas += self.alpha * (perda - self.media_perdas)
+            self.variacoes += 1
+        self.anterior = valor
+        return self.valor
+
+    @property
+    def valor(self):
+        if self.variacoes < self.periodo:
+            return None
+        if self.media_perdas == 0:
+            return 100.0
+        return 100.0 - 100.0 / (1.0 + self.media_ganhos / self.media_perdas)
+
+    def estado(self):
+        return {
+            'periodo': self.periodo, 'anterior': self.anterior, 'media_ganhos': self.media_ganhos,
+            'media_perdas': self.media_perdas, 'variacoes': self.variacoes,
+        }
+
+    @classmethod
+    def restaurar(cls, estado):
+        obj = cls(estado['periodo'])
+        obj.anterior = estado['anterior']
+        obj.media_ganhos = estado['media_ganhos']
+        obj.media_perdas = estado['media_perdas']
+        obj.variacoes = estado['variacoes']
+        return obj
+
+
+TIPOS = {cls.tipo: cls for cls in (MediaMovelIncremental, VolatilidadeIncremental, EMAIncremental, RSIIncremental)}
+
+# Indicadores exibidos por padrão no fluxo ao vivo
+INDICADORES_AO_VIVO = ['mm_7', 'mm_30', 'volatilidade_30', 'ema_12', 'rsi_14']
+
+
+class ConjuntoIndicadores:
+    """
+    Conjunto de indicadores incrementais com a mesma nomenclatura do cálculo
+    em lote ('mm_7', 'volatilidade_30', 'ema_12', 'rsi_14').
+    """
+
+    def __init__(self, indicadores=INDICADORES_AO_VIVO):
+        self.indicadores = {}
+        for nome in indicadores:
+            tipo, _, periodo = nome.partition('_')
+            if tipo not in TIPOS:
+                raise ValueError(f"Indicador incremental desconhecido: {nome}")
+            self.indicadores[nome] = TIPOS[tipo](int(periodo))
+
+    def atualizar(self, valor):
+        """Incorpora um novo preço e retorna os valores atuais (None enquanto aquece)."""
+        valor = float(valor)
+        return {nome: indicador.atualizar(valor) for nome, indicador in self.indicadores.items()}
+
+    def valores(self):
+        return {nome: indicador.valor for nome, indicador in self.indicadores.items()}
+
+    def estado(self):
+        return {nome: indicador.estado() for nome, indicador in self.indicadores.items()}
+
+    @classmethod
+    def restaurar(cls, estado):
+        obj = cls([])
+        for nome, estado_indicador in estado.items():
+            obj.indicadores[nome] = TIPOS[nome.partition('_')[0]].restaurar(estado_indicador)
+        return obj
+
+    def salvar(self, caminho):
+        """Grava o estado em JSON (escrita atômica) para retomar após reiniciar."""
+        tmp = caminho + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.estado(), f)
+        os.replace(tmp, caminho)
+
+    @classmethod
+    def carregar(cls, caminho, indicadores=INDICADORES_AO_VIVO):
+        """Restaura o estado salvo ou cria um conjunto novo se não houver checkpoint."""
+        if os.path.exists(caminho):
+            try:
+                with open(caminho, 'r', encoding='utf-8') as f:
+                    estado = json.load(f)
+                if set(estado) == set(indicadores):
+                    return cls.restaurar(estado)
+            except (ValueError, KeyError) as e:
+                print(f"Checkpoint de indicadores inválido, recomeçando: {e}")
+        return cls(indicadores)
@@ -0,0 +1,74 @@
+import numpy as np
+
+METODOS_REDUCAO = ('lttb', 'minmax')
+
+
+def _como_arrays(tempos, valores):
+    return np.asarray(tempos, dtype=np.int64), np.asarray(valores, dtype=np.float64)
+
+
+def lttb(tempos, valores, pontos):
+    """
+    Largest-Triangle-Three-Buckets: escolhe `pontos` amostras que preservam a
+    forma visual da série (primeiro e último ponto sempre mantidos).
+
+    O laço é por bucket (no máximo `pontos` iterações); dentro de cada bucket
+    as áreas dos triângulos são calculadas de uma vez com numpy. Retorna os
+    índices escolhidos, em ordem crescente.
+    """
+    t, y = _como_arrays(tempos, valores)
+    n = len(t)
+    if pontos >= n or pontos < 3:
+        return np.arange(n)
+    # Bordas dos pontos-1 buckets internos (exclui o primeiro e o último ponto)
+    bordas = np.linspace(1, n - 1, pontos - 1).astype(np.int64)
+    x = (t - t[0]).astype(np.float64)
+    escolhidos = np.empty(pontos, dtype=np.int64)
+    escolhidos[0] = 0
+    anterior = 0
+    for i in range(pontos - 2):
+        inicio, fim = bordas[i], max(bordas[i + 1], bordas[i] + 1)
+        # Vértice C: média do próximo bucket (ou o último ponto)
+        if i + 2 < len(bordas):
+            proximo = slice(bordas[i + 1], max(bordas[i + 2], bordas[i + 1] + 1))
+            cx, cy = x[proximo].mean(), y[proximo].mean()
+        else:
+            cx, cy = x[-1], y[-1]
+        ax, ay = x[anterior], y[anterior]
+        areas = np.abs((ax - cx) * (y[inicio:fim] - ay) - (ax - x[inicio:fim]) * (cy - ay))
+        anterior = inicio + int(np.argmax(areas))
+        escolhidos[i + 1] = anterior
+    escolhidos[-1] = n - 1
+    return escolhidos
+
+
+def minmax(tempos, valores, pontos):
+    """
+    Mínimo e máximo de cada intervalo de tempo (pontos // 2 intervalos iguais).
+
+    Os extremos de cada intervalo são exatos, então picos e vales aparecem na
+    resolução pedida. Retorna os índices escolhidos, em ordem crescente.
+    """
+    t, y = _como_arrays(tempos, valores)
+    n = len(t)
+    intervalos = max(pontos // 2, 1)
+    if pontos >= n:
+        return np.arange(n)
+    bucket = ((t - t[0]) * intervalos // (t[-1] - t[0] + 1)).astype(np.int64)
+    # Ordena por (bucket, valor): o primeiro de cada bucket é o mínimo e o último o máximo
+    ordem = np.lexsort((y, bucket))
+    bucket_ordenado = bucket[ordem]
+    primeiros = np.flatnonzero(np.r_[True, bucket_ordenado[1:] != bucket_ordenado[:-1]])
+    ultimos = np.r_[primeiros[1:] - 1, n - 1]
+    return np.unique(np.r_[ordem[primeiros], ordem[ultimos]])
+
+
+def reduzir(tempos, valores, pontos, metodo='lttb'):
+    """(tempos, valores) com no máximo ~`pontos` amostras; séries menores voltam inteiras."""
+    if metodo not in METODOS_REDUCAO:
+        raise ValueError(f"Método de redução inválido: {metodo} (use {', '.join(METODOS_REDUCAO)})")
+    t, y = _como_arrays(tempos, valores)
+    if len(t) <= pontos:
+        return t, y
+    indices = lttb(t, y, pontos) if metodo == 'lttb' else minmax(t, y, pontos)
+    return t[indices], y[indices]
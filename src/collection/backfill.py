@@ -0,0 +1,224 @@
+import sys
+import os
+import time
+import argparse
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+# Permite executar o script diretamente (python src/collection/backfill.py)
+RAIZ_PROJETO = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if RAIZ_PROJETO not in sys.path:
+    sys.path.insert(0, RAIZ_PROJETO)
+
+from src.collection.kline_store import KlineStore, limite_fechado, duracao_maxima_ms, validar_intervalo
+from src.collection.kline_decoder import decodificar_klines, CAMPOS_KLINE
+from src.collection.data_collection import validar_datas, para_ms
+
+BASE_URL_BINANCE = 'https://api.binance.com'
+LIMITE_POR_PAGINA = 1000
+# Peso de /api/v3/klines com limit=1000 e orçamento padrão de peso por minuto da Binance
+PESO_KLINES = 2
+PESO_POR_MINUTO = 6000
+
+
+class TokenBucket:
+    """Balde de tokens compartilhado entre as threads, reabastecido continuamente."""
+
+    def __init__(self, capacidade, por_segundo):
+        self.capacidade = capacidade
+        self.por_segundo = por_segundo
+        self.tokens = capacidade
+        self.ultimo = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _reabastecer(self):
+        agora = time.monotonic()
+        self.tokens = min(self.capacidade, self.tokens + (agora - self.ultimo) * self.por_segundo)
+        self.ultimo = agora
+
+    def consumir(self, peso=1):
+        """Bloqueia até haver `peso` tokens disponíveis."""
+        while True:
+            with self.lock:
+                self._reabastecer()
+                if self.tokens >= peso:
+                    self.tokens -= peso
+                    return
+                espera = (peso - self.tokens) / self.por_segundo
+            time.sleep(espera)
+
+    def sincronizar(self, peso_usado, limite):
+        """Ajusta o saldo pelo peso informado pela Binance (X-MBX-USED-WEIGHT-1M)."""
+        with self.lock:
+            self._reabastecer()
+            restante = self.capacidade * (limite - peso_usado) / limite
+            self.tokens = min(self.tokens, restante)
+
+    def pausar(self, segundos):
+        """Esvazia o balde após um 429/418 para que todas as threads esperem."""
+        with self.lock:
+            self.tokens = -segundos * self.por_segundo
+            self.ultimo = time.monotonic()
+
+
+def dividir_em_blocos(inicio_ms, fim_ms, interval, candles_por_bloco=LIMITE_POR_PAGINA):
+    """
+    Divide [inicio_ms, fim_ms) em blocos de no máximo uma página de klines cada
+    (para '1M', pela duração do maior mês). ValueError se o intervalo não for suportado.
+    """
+    passo = duracao_maxima_ms(interval) * candles_por_bloco
+    blocos = []
+    cursor = inicio_ms
+    while cursor < fim_ms:
+        blocos.append((cursor, min(cursor + passo, fim_ms)))
+        cursor += passo
+    return blocos
+
+
+class BackfillBinance:
+    """
+    Backfill paralelo de klines para vários símbolos e intervalos.
+
+    As faixas são divididas em blocos de uma página e baixadas em um pool de
+    threads que compartilha um TokenBucket dimensionado pelo orçamento de peso
+    da Binance. Os blocos concluídos são gravados no KlineStore, cujo manifesto
+    serve de checkpoint: uma execução interrompida retoma só o que falta. Se
+    um bloco falhar (esgotadas as tentativas), os que ainda não começaram são
+    cancelados e os que já terminaram são gravados antes de propagar o erro.
+    """
+
+    def __init__(self, store=None, base_url=BASE_URL_BINANCE, workers=8,
+                 peso_por_minuto=PESO_POR_MINUTO, margem=0.8, blocos_por_gravacao=50):
+        self.store = store or KlineStore()
+        self.base_url = base_url.rstrip('/')
+        self.workers = workers
+        self.peso_por_minuto = peso_por_minuto
+        self.blocos_por_gravacao = blocos_por_gravacao
+        capacidade = peso_por_minuto * margem
+        self.bucket = TokenBucket(capacidade, capacidade / 60.0)
+
+        self.session = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount('http://', adaptador)
+        self.session.mount('https://', adaptador)
+
+    def baixar_bloco(self, symbol, interval, inicio_ms, fim_ms, tentativas=5):
+        """Baixa uma página de klines respeitando o limite de peso."""
+        params = {
+            'symbol': symbol,
+            'interval': interval,
+            'startTime': inicio_ms,
+            'endTime': fim_ms - 1,
+            'limit': LIMITE_POR_PAGINA,
+        }
+        for tentativa in range(tentativas):
+            self.bucket.consumir(PESO_KLINES)
+            try:
+                resposta = self.session.get(f"{self.base_url}/api/v3/klines", params=params, timeout=30)
+            except requests.exceptions.RequestException as e:
+                print(f"Erro de rede em {symbol} {interval} {inicio_ms}: {e}")
+                time.sleep(2 ** tentativa)
+                continue
+
+            peso_usado = resposta.headers.get('X-MBX-USED-WEIGHT-1M')
+            if peso_usado is not None:
+                self.bucket.sincronizar(int(peso_usado), self.peso_por_minuto)
+
+            if resposta.status_code in (418, 429):
+                espera = int(resposta.headers.get('Retry-After', 60))
+                print(f"Limite de requisições atingido, aguardando {espera}s...")
+                self.bucket.pausar(espera)
+                continue
+            resposta.raise_for_status()
+            # Decodifica direto do corpo bruto, sem passar por json.loads
+            return decodificar_klines(resposta.content)
+        raise Exception(f"Falha ao baixar {symbol} {interval} a partir de {inicio_ms} após {tentativas} tentativas.")
+
+    def _gravar(self, symbol, interval, pendentes):
+        colunas = [c for c, _ in pendentes]
+        combinado = {nome: np.concatenate([c[nome] for c in colunas]) for nome in colunas[0]}
+        self.store.mesclar(symbol, interval, combinado, [faixa for _, faixa in pendentes])
+
+    def executar(self, symbols, intervals, inicio_ms, fim_ms):
+        """Baixa todas as lacunas de cada par símbolo/intervalo em [inicio_ms, fim_ms)."""
+        for interval in intervals:
+            validar_intervalo(interval)
+        tarefas = []
+        for symbol in symbols:
+            for interval in intervals:
+                self.store.garantir_esquema(symbol, interval, CAMPOS_KLINE)
+                limite = limite_fechado(interval, fim_ms)
+                for lacuna in self.store.lacunas(symbol, interval, inicio_ms, limite):
+                    for bloco in dividir_em_blocos(lacuna[0], lacuna[1], interval):
+                        tarefas.append((symbol, interval, bloco))
+
+        if not tarefas:
+            print("Nada a baixar: todas as faixas já estão no armazenamento.")
+            return
+        print(f"Backfill de {len(tarefas)} blocos com {self.workers} workers...")
+
+        pendentes = defaultdict(list)
+        recebidos = set()
+
+        def receber(futuro):
+            symbol, interval, bloco = futuros[futuro]
+            colunas = futuro.result()
+            fechados = colunas['timestamp'] < bloco[1]
+            colunas = {nome: valores[fechados] for nome, valores in colunas.items()}
+            pendentes[(symbol, interval)].append((colunas, bloco))
+            recebidos.add(futuro)
+            return symbol, interval
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futuros = {
+                executor.submit(self.baixar_bloco, symbol, interval, bloco[0], bloco[1]): (symbol, interval, bloco)
+                for symbol, interval, bloco in tarefas
+            }
+            try:
+                for futuro in as_completed(futuros):
+                    symbol, interval = receber(futuro)
+                    # Grava em lotes para não reescrever as colunas a cada página
+                    if len(pendentes[(symbol, interval)]) >= self.blocos_por_gravacao:
+                        self._gravar(symbol, interval, pendentes.pop((symbol, interval)))
+                        print(f"Checkpoint: {len(recebidos)}/{len(tarefas)} blocos concluídos.")
+            except Exception:
+                # Não baixa o resto à toa: cancela o que não começou, espera os que
+                # estão em andamento e aproveita os que terminaram sem erro
+                executor.shutdown(wait=True, cancel_futures=True)
+                for futuro in futuros:
+                    if futuro not in recebidos and not futuro.cancelled() and futuro.exception() is None:
+                        receber(futuro)
+                print(f"Backfill interrompido: {len(recebidos)}/{len(tarefas)} blocos concluídos serão gravados.")
+                raise
+            finally:
+                # Mesmo em caso de erro, persiste o que já foi baixado
+                for (symbol, interval), lote in pendentes.items():
+                    if lote:
+                        self._gravar(symbol, interval, lote)
+        print(f"Backfill concluído: {len(recebidos)} blocos.")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Backfill paralelo de klines da Binance.")
+    parser.add_argument('--symbols', nargs='+', default=['BTCUSDT'])
+    parser.add_argument('--intervals', nargs='+', default=['1m'])
+    parser.add_argument('--inicio', default="1 Jan, 2019")
+    parser.add_argument('--fim', default="09 Jan, 2025")
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--base-url', default=BASE_URL_BINANCE)
+    parser.add_argument('--cache-dir', default="data/raw/klines")
+    args = parser.parse_args()
+
+    try:
+        inicio, fim = validar_datas(args.inicio, args.fim)
+        backfill = BackfillBinance(KlineStore(args.cache_dir), base_url=args.base_url, workers=args.workers)
+        backfill.executar(args.symbols, args.intervals, para_ms(inicio), para_ms(fim) + 1)
+    except ValueError as e:
+        print(f"Erro de validação: {e}")
+    except Exception as e:
+        print(f"Erro no backfill: {e}")
@@ -1,9 +1,20 @@
+import sys
+import os
 import pandas as pd
 from binance.client import Client
-import os
 from datetime import datetime
 from dotenv import load_dotenv # Importar dotenv
 
+# Permite executar o script diretamente (python src/collection/data_collection.py)
+RAIZ_PROJETO = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if RAIZ_PROJETO not in sys.path:
+    sys.path.insert(0, RAIZ_PROJETO)
+
+from src.collection.kline_store import KlineStore
+from src.collection.kline_decoder import decodificar_klines, CAMPOS_KLINE
+from src.analysis.indicadores import calcular_indicadores
+from src.analysis.exportacao_parquet import ExportadorParquet
+
 load_dotenv() # Carregar variáveis do arquivo .env
 
 def validar_datas(start_date, end_date):
@@ -16,7 +27,11 @@ def validar_datas(start_date, end_date):
     except ValueError as e:
         raise ValueError(f"Erro ao validar datas: {e}")
 
-def obter_dados_binance(symbol, start_date, end_date, interval=Client.KLINE_INTERVAL_1DAY, cache_dir="data/raw"):
+def para_ms(data):
+    """Converte um datetime ingênuo (interpretado como UTC, igual à Binance) em ms."""
+    return int(pd.Timestamp(data).value // 1_000_000)
+
+def obter_dados_binance(symbol, start_date, end_date, interval=Client.KLINE_INTERVAL_1DAY, cache_dir="data/raw/klines"):
     # Ler credenciais das variáveis de ambiente
     api_key = os.getenv('BINANCE_API_KEY')
     api_secret = os.getenv('BINANCE_API_SECRET')
@@ -28,48 +43,30 @@ def obter_dados_binance(symbol, start_date, end_date, interval=Client.KLINE_INTE
 
     #Validar datas
     start_date, end_date = validar_datas(start_date, end_date)
-    start_date_str = start_date.strftime("%d %b, %Y")
-    end_date_str = end_date.strftime("%d %b, %Y")
-
-    cache_filename = f"{symbol}_{start_date_str.replace(' ', '_')}_{end_date_str.replace(' ', '_')}_{interval}.csv"
-    cache_path = os.path.join(cache_dir, cache_filename)
 
-    if os.path.exists(cache_path):
-        print(f"Carregando dados de cache: {cache_path}")
-        df = pd.read_csv(cache_path)
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        return df
-    
-    try:
-        client = Client(api_key, api_secret)
-        klines = client.get_historical_klines(symbol, interval, start_date_str, end_date_str)
-    except Exception as e:
-        raise Exception(f"Erro ao obter dados da Binance: {e}")
-    
-    df = pd.DataFrame(klines, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume', 'close_time', 'quote_asset_volume', 'number_of_trades', 'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume', 'ignore'])
-    df['timestamp'] = pd.to_datetime(df['timestamp']/1000, unit='s')
-    df[['open', 'high', 'low', 'close', 'volume']] = df[['open', 'high', 'low', 'close', 'volume']].astype(float)
-    df = df[['timestamp', 'open', 'high', 'low', 'close', 'volume']]
-    
-    # Salvar em cache
-    os.makedirs(cache_dir, exist_ok=True)
-    df.to_csv(cache_path, index=False)
-    print(f"Dados salvos em cache: {cache_path}")
-
-    return df
+    # A Binance trata endTime como inclusivo; o armazenamento usa faixas [inicio, fim)
+    inicio_ms = para_ms(start_date)
+    fim_ms = para_ms(end_date) + 1
 
-def calcular_retornos(df):
-    df['retorno_diario'] = df['close'].pct_change()
-    df['retorno_acumulado'] = (1 + df['retorno_diario']).cumprod() - 1
-    return df
+    client = None
 
-def calcular_medias_moveis(df, periodos=[7, 30, 200]):
-    for periodo in periodos:
-        df[f'mm_{periodo}'] = df['close'].rolling(window=periodo).mean()
-    return df
+    def buscar(lacuna_inicio, lacuna_fim):
+        nonlocal client
+        try:
+            if client is None:
+                client = Client(api_key, api_secret)
+            klines = client.get_historical_klines(symbol, interval, lacuna_inicio, lacuna_fim - 1)
+        except Exception as e:
+            raise Exception(f"Erro ao obter dados da Binance: {e}")
+        return decodificar_klines(klines)
 
-def calcular_volatilidade(df, periodo=30):
-    df[f'volatilidade_{periodo}'] = df['close'].rolling(window=periodo).std()
+    # Só as lacunas ainda não armazenadas são baixadas; o resto vem do disco
+    store = KlineStore(cache_dir)
+    store.garantir_esquema(symbol, interval, CAMPOS_KLINE)
+    df = store.obter(symbol, interval, inicio_ms, fim_ms, buscar)
+    if 'close_time' in df.columns:
+        df['close_time'] = pd.to_datetime(df['close_time'], unit='ms')
+    print(f"{len(df)} klines de {symbol} {interval} carregadas de {store.base_dir}")
     return df
 
 if __name__ == '__main__':
@@ -80,14 +77,13 @@ if __name__ == '__main__':
 
     try:
       bitcoin_data = obter_dados_binance(symbol, start_date, end_date, intervalo)
-      bitcoin_data = calcular_retornos(bitcoin_data)
-      bitcoin_data = calcular_medias_moveis(bitcoin_data)
-      bitcoin_data = calcular_volatilidade(bitcoin_data)
+      # Retornos, médias móveis e volatilidade em uma única passada
+      bitcoin_data = calcular_indicadores(bitcoin_data)
       print(bitcoin_data.head())
       
-      # Salvar na pasta de dados processados
-      output_path = 'data/processed/bitcoin_data_analise.csv'
-      bitcoin_data.to_csv(output_path, index=False)
+      # Salvar na pasta de dados processados (Parquet particionado por ano/mês)
+      output_path = 'data/processed/bitcoin_data_analise'
+      ExportadorParquet(output_path).exportar(bitcoin_data)
       print(f"Dados e análise salvos em {output_path}")
     except ValueError as e:
       print(f"Erro de validação: {e}")
@@ -0,0 +1,62 @@
+import numpy as np
+
+# Campos de cada kline na ordem do payload da Binance (o último, 'ignore', é descartado)
+CAMPOS_KLINE = [
+    'timestamp', 'open', 'high', 'low', 'close', 'volume', 'close_time',
+    'quote_asset_volume', 'number_of_trades', 'taker_buy_base_asset_volume',
+    'taker_buy_quote_asset_volume',
+]
+CAMPOS_PRECO = ('open', 'high', 'low', 'close')
+CAMPOS_TEMPO = ('timestamp', 'close_time')
+NUM_CAMPOS_PAYLOAD = 12
+
+
+def tipos_colunas(dtype_preco=np.float64):
+    """Dtype de cada coluna decodificada."""
+    tipos = {}
+    for nome in CAMPOS_KLINE:
+        if nome in CAMPOS_TEMPO:
+            tipos[nome] = np.dtype(np.int64)
+        elif nome == 'number_of_trades':
+            tipos[nome] = np.dtype(np.int32)
+        elif nome in CAMPOS_PRECO:
+            tipos[nome] = np.dtype(dtype_preco)
+        else:
+            tipos[nome] = np.dtype(np.float64)
+    return tipos
+
+
+def _matriz_do_payload(payload):
+    """Converte o payload (lista já parseada ou JSON bruto) em uma matriz float64 (n, 12)."""
+    if isinstance(payload, (bytes, bytearray, str)):
+        texto = payload.decode('ascii') if not isinstance(payload, str) else payload
+        # O JSON de klines é só números e strings numéricas: removendo aspas e
+        # colchetes sobra uma lista separada por vírgulas, lida em uma passada em C.
+        texto = texto.replace('"', '').replace('[', '').replace(']', '')
+        if not texto.strip():
+            return np.empty((0, NUM_CAMPOS_PAYLOAD))
+        valores = np.fromstring(texto, dtype=np.float64, sep=',')
+        return valores.reshape(-1, NUM_CAMPOS_PAYLOAD)
+    if not payload:
+        return np.empty((0, NUM_CAMPOS_PAYLOAD))
+    return np.array(payload, dtype=np.float64)
+
+
+def decodificar_klines(payload, dtype_preco=np.float64):
+    """
+    Decodifica klines da Binance em um dict coluna -> array tipado.
+
+    Aceita a lista retornada por `Client.get_historical_klines`/`response.json()`
+    ou o corpo bruto da resposta (mais rápido, evita o json.loads). Mantém todos
+    os campos: timestamps em int64 (ms), preços em `dtype_preco`, volumes em
+    float64 e número de trades em int32.
+    """
+    matriz = _matriz_do_payload(payload)
+    n = len(matriz)
+    colunas = {}
+    for indice, (nome, dtype) in enumerate(tipos_colunas(dtype_preco).items()):
+        coluna = np.empty(n, dtype=dtype)
+        # Timestamps em ms cabem exatamente em float64 (< 2**53)
+        coluna[:] = matriz[:, indice]
+        colunas[nome] = coluna
+    return colunas
@@ -0,0 +1,224 @@
+import os
+import json
+import time
+import datetime
+import numpy as np
+import pandas as pd
+
+# Duração de cada intervalo de kline da Binance em milissegundos.
+# '1M' (mês do calendário, em UTC) não tem duração fixa: fica fora da tabela
+# e é tratado à parte em limite_fechado e duracao_maxima_ms.
+INTERVALO_MS = {
+    '1m': 60_000,
+    '3m': 3 * 60_000,
+    '5m': 5 * 60_000,
+    '15m': 15 * 60_000,
+    '30m': 30 * 60_000,
+    '1h': 3_600_000,
+    '2h': 2 * 3_600_000,
+    '4h': 4 * 3_600_000,
+    '6h': 6 * 3_600_000,
+    '8h': 8 * 3_600_000,
+    '12h': 12 * 3_600_000,
+    '1d': 86_400_000,
+    '3d': 3 * 86_400_000,
+    '1w': 7 * 86_400_000,
+}
+
+INTERVALO_MENSAL = '1M'
+# Duração do maior mês, usada onde basta um limite superior para um candle mensal
+MES_MAXIMO_MS = 31 * 86_400_000
+
+COLUNA_TEMPO = 'timestamp'
+MANIFESTO = 'manifest.json'
+
+
+def mesclar_intervalos(intervalos):
+    """Une intervalos [inicio, fim) sobrepostos ou adjacentes."""
+    resultado = []
+    for inicio, fim in sorted(intervalos):
+        if resultado and inicio <= resultado[-1][1]:
+            resultado[-1][1] = max(resultado[-1][1], fim)
+        else:
+            resultado.append([inicio, fim])
+    return resultado
+
+
+def subtrair_intervalos(inicio, fim, cobertos):
+    """Retorna os trechos de [inicio, fim) que não estão em `cobertos`."""
+    lacunas = []
+    cursor = inicio
+    for c_inicio, c_fim in cobertos:
+        if c_fim <= cursor:
+            continue
+        if c_inicio >= fim:
+            break
+        if c_inicio > cursor:
+            lacunas.append((cursor, min(c_inicio, fim)))
+        cursor = max(cursor, c_fim)
+        if cursor >= fim:
+            break
+    if cursor < fim:
+        lacunas.append((cursor, fim))
+    return lacunas
+
+
+def validar_intervalo(interval):
+    """ValueError se `interval` não for um intervalo de kline suportado."""
+    if interval != INTERVALO_MENSAL and interval not in INTERVALO_MS:
+        raise ValueError(f"Intervalo de kline não suportado: {interval!r} "
+                         f"(use {', '.join(list(INTERVALO_MS) + [INTERVALO_MENSAL])}).")
+
+
+def duracao_maxima_ms(interval):
+    """Duração (ms) de um candle do intervalo; para '1M', a do maior mês."""
+    validar_intervalo(interval)
+    return MES_MAXIMO_MS if interval == INTERVALO_MENSAL else INTERVALO_MS[interval]
+
+
+def _inicio_do_mes_ms(momento_ms):
+    momento = datetime.datetime.fromtimestamp(momento_ms / 1000, tz=datetime.timezone.utc)
+    inicio = momento.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    return int(inicio.timestamp() * 1000)
+
+
+def limite_fechado(interval, fim_ms):
+    """Recorta `fim_ms` para não incluir o candle em aberto nem o futuro."""
+    validar_intervalo(interval)
+    agora_ms = int(time.time() * 1000)
+    if interval == INTERVALO_MENSAL:
+        # O candle mensal em aberto começa no dia 1 do mês atual (UTC)
+        return min(fim_ms, _inicio_do_mes_ms(agora_ms))
+    passo = INTERVALO_MS[interval]
+    return min(fim_ms, agora_ms - agora_ms % passo)
+
+
+class KlineStore:
+    """
+    Armazena klines em formato colunar, um diretório por símbolo/intervalo.
+
+    Cada coluna fica em um arquivo .npy (lido com mmap) e o manifest.json
+    registra quais faixas de tempo [inicio, fim) em ms já foram baixadas,
+    permitindo buscar na Binance apenas as lacunas.
+    """
+
+    def __init__(self, base_dir="data/raw/klines"):
+        self.base_dir = base_dir
+
+    def _diretorio(self, symbol, interval):
+        return os.path.join(self.base_dir, symbol.upper(), interval)
+
+    def _ler_manifesto(self, symbol, interval):
+        caminho = os.path.join(self._diretorio(symbol, interval), MANIFESTO)
+        if not os.path.exists(caminho):
+            return {'colunas': [], 'intervalos': []}
+        with open(caminho, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _gravar_atomico(self, caminho, escrever):
+        tmp = caminho + '.tmp'
+        with open(tmp, 'wb') as f:
+            escrever(f)
+        os.replace(tmp, caminho)
+
+    def intervalos_cobertos(self, symbol, interval):
+        return [tuple(i) for i in self._ler_manifesto(symbol, interval)['intervalos']]
+
+    def lacunas(self, symbol, interval, inicio_ms, fim_ms):
+        """Faixas de [inicio_ms, fim_ms) que ainda precisam ser baixadas."""
+        return subtrair_intervalos(inicio_ms, fim_ms, self.intervalos_cobertos(symbol, interval))
+
+    def garantir_esquema(self, symbol, interval, colunas):
+        """
+        Descarta o armazenamento se as colunas gravadas diferem de `colunas`
+        (ex.: o decodificador passou a manter mais campos), para que as lacunas
+        sejam recalculadas e tudo seja baixado de novo no esquema atual.
+        """
+        manifesto = self._ler_manifesto(symbol, interval)
+        if manifesto['colunas'] and set(manifesto['colunas']) != set(colunas):
+            print(f"Colunas de {symbol} {interval} mudaram; descartando o armazenamento antigo.")
+            manifesto = {'colunas': [], 'intervalos': []}
+            conteudo = json.dumps(manifesto, indent=2).encode('utf-8')
+            self._gravar_atomico(os.path.join(self._diretorio(symbol, interval), MANIFESTO), lambda f: f.write(conteudo))
+
+    def carregar_colunas(self, symbol, interval):
+        """Retorna um dict coluna -> array (mmap somente leitura) com todo o conteúdo."""
+        diretorio = self._diretorio(symbol, interval)
+        manifesto = self._ler_manifesto(symbol, interval)
+        colunas = {}
+        for nome in manifesto['colunas']:
+            colunas[nome] = np.load(os.path.join(diretorio, f"{nome}.npy"), mmap_mode='r')
+        return colunas
+
+    def mesclar(self, symbol, interval, novas_colunas, intervalos):
+        """
+        Incorpora `novas_colunas` (dict de arrays com a coluna 'timestamp' em ms)
+        e marca cada faixa (inicio_ms, fim_ms) de `intervalos` como coberta.
+        Linhas com o mesmo timestamp são substituídas pelas novas.
+        """
+        diretorio = self._diretorio(symbol, interval)
+        os.makedirs(diretorio, exist_ok=True)
+        manifesto = self._ler_manifesto(symbol, interval)
+        existentes = self.carregar_colunas(symbol, interval)
+
+        if existentes and set(existentes) != set(novas_colunas):
+            raise ValueError(
+                f"Colunas incompatíveis com o armazenamento de {symbol} {interval}: "
+                f"{list(novas_colunas)} != {list(existentes)}"
+            )
+
+        novos_ts = np.asarray(novas_colunas[COLUNA_TEMPO], dtype=np.int64)
+        if existentes:
+            antigos_ts = np.asarray(existentes[COLUNA_TEMPO])
+            manter = ~np.isin(antigos_ts, novos_ts)
+            combinado = {
+                nome: np.concatenate([np.asarray(existentes[nome])[manter], np.asarray(novas_colunas[nome], dtype=existentes[nome].dtype)])
+                for nome in existentes
+            }
+        else:
+            combinado = {nome: np.asarray(valores) for nome, valores in novas_colunas.items()}
+            combinado[COLUNA_TEMPO] = novos_ts
+
+        ordem = np.argsort(combinado[COLUNA_TEMPO], kind='stable')
+        # Libera os mmaps antes de sobrescrever os arquivos (necessário no Windows)
+        existentes = None
+        for nome, valores in combinado.items():
+            valores = np.ascontiguousarray(valores[ordem])
+            self._gravar_atomico(os.path.join(diretorio, f"{nome}.npy"), lambda f, v=valores: np.save(f, v))
+
+        manifesto['colunas'] = list(combinado)
+        manifesto['intervalos'] = mesclar_intervalos(manifesto['intervalos'] + [list(i) for i in intervalos])
+        manifesto['linhas'] = int(len(ordem))
+        conteudo = json.dumps(manifesto, indent=2).encode('utf-8')
+        self._gravar_atomico(os.path.join(diretorio, MANIFESTO), lambda f: f.write(conteudo))
+
+    def ler(self, symbol, interval, inicio_ms, fim_ms):
+        """Lê do disco as klines com timestamp em [inicio_ms, fim_ms) como DataFrame."""
+        colunas = self.carregar_colunas(symbol, interval)
+        if not colunas:
+            return pd.DataFrame(columns=[COLUNA_TEMPO])
+        ts = colunas[COLUNA_TEMPO]
+        i = int(np.searchsorted(ts, inicio_ms, side='left'))
+        j = int(np.searchsorted(ts, fim_ms, side='left'))
+        df = pd.DataFrame({nome: np.array(valores[i:j]) for nome, valores in colunas.items()})
+        df[COLUNA_TEMPO] = pd.to_datetime(df[COLUNA_TEMPO], unit='ms')
+        ordem = [COLUNA_TEMPO] + [c for c in df.columns if c != COLUNA_TEMPO]
+        return df[ordem]
+
+    def obter(self, symbol, interval, inicio_ms, fim_ms, buscar):
+        """
+        Garante que [inicio_ms, fim_ms) esteja no disco e devolve a faixa.
+
+        `buscar(inicio_ms, fim_ms)` deve baixar as klines da lacuna e devolver
+        um dict de colunas. Só é chamado para as lacunas não cobertas.
+        """
+        limite = limite_fechado(interval, fim_ms)
+        for lacuna_inicio, lacuna_fim in self.lacunas(symbol, interval, inicio_ms, limite):
+            print(f"Baixando lacuna {symbol} {interval}: {lacuna_inicio} -> {lacuna_fim}")
+            colunas = buscar(lacuna_inicio, lacuna_fim)
+            ts = np.asarray(colunas[COLUNA_TEMPO], dtype=np.int64)
+            fechados = ts < lacuna_fim
+            colunas = {nome: np.asarray(valores)[fechados] for nome, valores in colunas.items()}
+            self.mesclar(symbol, interval, colunas, [(lacuna_inicio, lacuna_fim)])
+
+        return self.ler(symbol, interval, inicio_ms, fim_ms)
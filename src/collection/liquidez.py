@@ -0,0 +1,131 @@
+import numpy as np
+
+# Faixas em torno do mid (fração do preço): 0,1%, 0,5%, 1% e 5%
+FAIXAS_PADRAO = (0.001, 0.005, 0.01, 0.05)
+# Tamanho da ordem (em USD) usado no cálculo de slippage
+TAMANHO_ORDEM_PADRAO = 100_000.0
+
+
+def _rotulo_faixa(faixa):
+    """0.001 -> '0_1pct' (nome usado nas colunas)."""
+    return f"{faixa * 100:g}".replace('.', '_') + 'pct'
+
+
+def colunas_liquidez(faixas=FAIXAS_PADRAO):
+    """Nomes das métricas na ordem em que são calculadas."""
+    colunas = ['mid', 'spread', 'spread_bps', 'microprice']
+    for faixa in faixas:
+        rotulo = _rotulo_faixa(faixa)
+        colunas += [f'notional_bid_{rotulo}', f'notional_ask_{rotulo}', f'desequilibrio_{rotulo}']
+    colunas += ['slippage_compra_bps', 'slippage_venda_bps']
+    return colunas
+
+
+def _niveis_do_texto(texto):
+    # Mesmo truque do decodificador de klines: sem aspas e colchetes sobra
+    # uma lista de números separada por vírgulas, lida em uma passada em C.
+    texto = texto.replace('"', '').replace('[', '').replace(']', '').replace('}', '').strip(' ,')
+    if not texto:
+        return np.empty((0, 2))
+    return np.fromstring(texto, dtype=np.float64, sep=',').reshape(-1, 2)
+
+
+def decodificar_profundidade(payload):
+    """
+    Converte a resposta de /api/v3/depth em (bids, asks), arrays float64 (n, 2)
+    de [preço, quantidade] do melhor para o pior preço.
+
+    Aceita o dict já parseado ou o corpo bruto da resposta (mais rápido).
+    """
+    if isinstance(payload, dict):
+        return (np.array(payload['bids'], dtype=np.float64).reshape(-1, 2),
+                np.array(payload['asks'], dtype=np.float64).reshape(-1, 2))
+    texto = payload.decode('ascii') if not isinstance(payload, str) else payload
+    inicio_bids = texto.index('"bids"')
+    inicio_asks = texto.index('"asks"')
+    if inicio_bids < inicio_asks:
+        trecho_bids, trecho_asks = texto[inicio_bids + 7:inicio_asks], texto[inicio_asks + 7:]
+    else:
+        trecho_asks, trecho_bids = texto[inicio_asks + 7:inicio_bids], texto[inicio_bids + 7:]
+    return _niveis_do_texto(trecho_bids), _niveis_do_texto(trecho_asks)
+
+
+def _empilhar(lados):
+    """Empilha livros de tamanhos diferentes em matrizes (símbolos, níveis), completando com quantidade 0."""
+    niveis = max((len(lado) for lado in lados), default=0)
+    precos = np.full((len(lados), max(niveis, 1)), np.nan)
+    quantidades = np.zeros_like(precos)
+    for i, lado in enumerate(lados):
+        precos[i, :len(lado)] = lado[:, 0]
+        quantidades[i, :len(lado)] = lado[:, 1]
+    return precos, quantidades
+
+
+def _slippage(precos, quantidades, mid, tamanho_ordem):
+    """Slippage (bps, em módulo) do preço médio de execução de `tamanho_ordem` USD em relação ao mid."""
+    notional = np.nan_to_num(precos * quantidades)
+    acumulado = np.cumsum(notional, axis=1)
+    quantidade_acumulada = np.cumsum(quantidades, axis=1)
+    # Nível em que a ordem termina de ser executada
+    k = (acumulado < tamanho_ordem).sum(axis=1)
+    suficiente = k < precos.shape[1]
+    k = np.minimum(k, precos.shape[1] - 1)[:, None]
+    linhas = np.arange(len(precos))[:, None]
+    antes_notional = np.where(k > 0, acumulado[linhas, k - 1], 0.0)[:, 0]
+    antes_quantidade = np.where(k > 0, quantidade_acumulada[linhas, k - 1], 0.0)[:, 0]
+    preco_final = precos[linhas, k][:, 0]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        quantidade = antes_quantidade + (tamanho_ordem - antes_notional) / preco_final
+        preco_medio = tamanho_ordem / quantidade
+        slippage = np.abs(preco_medio / mid - 1) * 1e4
+    return np.where(suficiente, slippage, np.nan)
+
+
+def calcular_liquidez(livros, faixas=FAIXAS_PADRAO, tamanho_ordem=TAMANHO_ORDEM_PADRAO):
+    """
+    Calcula as métricas de liquidez de vários livros de uma vez.
+
+    `livros` é uma lista de pares (bids, asks), arrays (n, 2) do melhor para o
+    pior preço (como os de `decodificar_profundidade` ou `LivroOfertasLocal.niveis`).
+    Retorna um dict métrica -> array com um valor por livro, com as colunas de
+    `colunas_liquidez(faixas)`: mid, spread, microprice, notional de cada lado
+    dentro de cada faixa em torno do mid, desequilíbrio (bid - ask) / (bid + ask)
+    na faixa e slippage de uma ordem de `tamanho_ordem` USD a mercado.
+    """
+    precos_bid, qtd_bid = _empilhar([bids for bids, _ in livros])
+    precos_ask, qtd_ask = _empilhar([asks for _, asks in livros])
+    melhor_bid, melhor_ask = precos_bid[:, 0], precos_ask[:, 0]
+    qtd_melhor_bid, qtd_melhor_ask = qtd_bid[:, 0], qtd_ask[:, 0]
+
+    mid = (melhor_bid + melhor_ask) / 2
+    spread = melhor_ask - melhor_bid
+    with np.errstate(invalid='ignore', divide='ignore'):
+        resultado = {
+            'mid': mid,
+            'spread': spread,
+            'spread_bps': spread / mid * 1e4,
+            # Preço ponderado pela quantidade do lado oposto no topo do livro
+            'microprice': (melhor_bid * qtd_melhor_ask + melhor_ask * qtd_melhor_bid) / (qtd_melhor_bid + qtd_melhor_ask),
+        }
+
+        notional_bid = np.nan_to_num(precos_bid * qtd_bid)
+        notional_ask = np.nan_to_num(precos_ask * qtd_ask)
+        for faixa in faixas:
+            rotulo = _rotulo_faixa(faixa)
+            dentro_bid = precos_bid >= (mid * (1 - faixa))[:, None]
+            dentro_ask = precos_ask <= (mid * (1 + faixa))[:, None]
+            soma_bid = (notional_bid * dentro_bid).sum(axis=1)
+            soma_ask = (notional_ask * dentro_ask).sum(axis=1)
+            resultado[f'notional_bid_{rotulo}'] = soma_bid
+            resultado[f'notional_ask_{rotulo}'] = soma_ask
+            resultado[f'desequilibrio_{rotulo}'] = (soma_bid - soma_ask) / (soma_bid + soma_ask)
+
+    resultado['slippage_compra_bps'] = _slippage(precos_ask, qtd_ask, mid, tamanho_ordem)
+    resultado['slippage_venda_bps'] = _slippage(precos_bid, qtd_bid, mid, tamanho_ordem)
+    return resultado
+
+
+def liquidez_do_livro(bids, asks, faixas=FAIXAS_PADRAO, tamanho_ordem=TAMANHO_ORDEM_PADRAO):
+    """Métricas de um único livro, como dict métrica -> float."""
+    resultado = calcular_liquidez([(bids, asks)], faixas, tamanho_ordem)
+    return {nome: float(valores[0]) for nome, valores in resultado.items()}
@@ -0,0 +1,400 @@
+import json
+import time
+import queue
+import threading
+import numpy as np
+import requests
+
+from src.storage.metricas import REGISTRO
+
+BASE_URL_BINANCE = 'https://api.binance.com'
+BASE_WS_BINANCE = 'wss://stream.binance.com:9443/ws'
+# Valores de `limit` aceitos por /api/v3/depth
+LIMITES_DEPTH = (5, 10, 20, 50, 100, 500, 1000, 5000)
+
+_DECODIFICACAO_EVENTO = REGISTRO.histograma('btc_livro_evento_decodificacao_segundos',
+                                            'Tempo para decodificar um evento de diff do livro')
+_APLICACAO_EVENTO = REGISTRO.histograma('btc_livro_evento_aplicacao_segundos',
+                                        'Tempo para aplicar um evento de diff ao livro local')
+_RESSINCRONIZACOES = REGISTRO.contador('btc_livro_ressincronizacoes_total',
+                                       'Lacunas na sequência do livro que exigiram um novo snapshot')
+_RECONEXOES = REGISTRO.contador('btc_livro_reconexoes_total',
+                                'Quedas da conexão do livro seguidas de reconexão e novo snapshot')
+_JANELAS_CURTAS = REGISTRO.contador('btc_livro_janelas_curtas_total',
+                                    'Novos snapshots pedidos porque a janela exata do livro ficou abaixo da profundidade')
+
+
+def limite_com_margem(limite):
+    """Menor `limit` do depth acima de `limite` (o máximo, se não houver), para sobrar margem."""
+    return next((valor for valor in LIMITES_DEPTH if valor > limite), LIMITES_DEPTH[-1])
+
+
+class LadoLivro:
+    """
+    Um lado do livro (bids ou asks) em arrays ordenados de preço/quantidade,
+    com o notional (soma de preço * quantidade) dos `profundidade` melhores
+    níveis recalculado a cada lote aplicado, então a leitura é O(1).
+
+    Os diffs também trazem níveis distantes, que sem corte se acumulariam: o
+    lado guarda no máximo `maximo` níveis (o tamanho pedido ao snapshot, que
+    deve sobrar além da janela). Só os níveis até `fronteira` são exatos; além
+    dela pode haver níveis que o snapshot não trouxe, e cada corte a recua
+    para o pior nível mantido. `curto()` avisa quando a janela chega a ela.
+    """
+
+    def __init__(self, decrescente, profundidade=None):
+        self.decrescente = decrescente
+        self.profundidade = profundidade
+        self.maximo = None
+        self.fronteira = None
+        self.precos = np.empty(0)
+        self.quantidades = np.empty(0)
+        self.notional = 0.0
+
+    def carregar(self, niveis, limite=None):
+        """
+        Carrega um snapshot. `limite` é quantos níveis foram pedidos: um lado
+        com menos que isso veio inteiro e não tem fronteira.
+        """
+        dados = np.array(niveis, dtype=np.float64).reshape(-1, 2)
+        dados = dados[dados[:, 1] > 0]
+        ordem = np.argsort(dados[:, 0])
+        self.precos = dados[ordem, 0]
+        self.quantidades = dados[ordem, 1]
+        self.maximo = max(limite or len(self.precos), self.profundidade or 0)
+        inteiro = limite is not None and len(self.precos) < limite
+        self.fronteira = None if inteiro or not len(self.precos) else self._pior()
+        self.aparar()
+        self.recalcular()
+
+    def _pior(self):
+        return float(self.precos[0] if self.decrescente else self.precos[-1])
+
+    def _janela(self):
+        if not self.profundidade:
+            return slice(None)
+        return slice(-self.profundidade, None) if self.decrescente else slice(None, self.profundidade)
+
+    def recalcular(self):
+        """Notional dos `profundidade` melhores níveis (todos, sem profundidade)."""
+        janela = self._janela()
+        self.notional = float(np.dot(self.precos[janela], self.quantidades[janela]))
+
+    def aplicar(self, niveis):
+        """Aplica um lote de atualizações [preço, quantidade]; quantidade 0 remove o nível."""
+        if not niveis:
+            return
+        dados = np.array(niveis, dtype=np.float64).reshape(-1, 2)
+        # Se o mesmo preço vier repetido no lote, vale a última quantidade
+        precos_lote, inverso = np.unique(dados[::-1, 0], return_index=True)
+        quantidades_lote = dados[::-1, 1][inverso]
+
+        indices = np.searchsorted(self.precos, precos_lote)
+        existe = indices < len(self.precos)
+        existe[existe] = self.precos[indices[existe]] == precos_lote[existe]
+        self.quantidades[indices[existe]] = quantidades_lote[existe]
+
+        novos = ~existe & (quantidades_lote > 0)
+        if novos.any():
+            self.precos = np.insert(self.precos, indices[novos], precos_lote[novos])
+            self.quantidades = np.insert(self.quantidades, indices[novos], quantidades_lote[novos])
+
+        vazios = self.quantidades == 0
+        if vazios.any():
+            self.precos = self.precos[~vazios]
+            self.quantidades = self.quantidades[~vazios]
+        self.aparar()
+        self.recalcular()
+
+    def aparar(self):
+        """Descarta os níveis além de `maximo` e recua a fronteira para o pior nível mantido."""
+        excesso = len(self.precos) - self.maximo if self.maximo else 0
+        if excesso <= 0:
+            return
+        # Bids: os piores ficam no início do array crescente; asks: no fim
+        dentro = slice(excesso, None) if self.decrescente else slice(None, -excesso)
+        self.precos = self.precos[dentro]
+        self.quantidades = self.quantidades[dentro]
+        pior = self._pior()
+        if self.fronteira is None:
+            self.fronteira = pior
+        else:
+            self.fronteira = max(self.fronteira, pior) if self.decrescente else min(self.fronteira, pior)
+
+    def exatos(self):
+        """Quantos níveis, a partir do melhor preço, estão até a fronteira."""
+        if self.fronteira is None:
+            return len(self.precos)
+        if self.decrescente:
+            return len(self.precos) - int(np.searchsorted(self.precos, self.fronteira, side='left'))
+        return int(np.searchsorted(self.precos, self.fronteira, side='right'))
+
+    def curto(self):
+        """
+        True se a janela passou da fronteira e só um novo snapshot a completa.
+        Sem margem (`maximo` igual à janela) nunca avisa: a janela fica curta.
+        """
+        if self.fronteira is None or not self.profundidade or self.maximo <= self.profundidade:
+            return False
+        return self.exatos() < self.profundidade
+
+    def melhor(self):
+        if not len(self.precos):
+            return None
+        return float(self.precos[-1] if self.decrescente else self.precos[0])
+
+    def niveis(self, limite=None):
+        """Níveis do melhor para o pior preço, como array (n, 2)."""
+        precos, quantidades = self.precos, self.quantidades
+        if self.decrescente:
+            precos, quantidades = precos[::-1], quantidades[::-1]
+        if limite:
+            precos, quantidades = precos[:limite], quantidades[:limite]
+        return np.column_stack([precos, quantidades])
+
+
+class FonteReplay:
+    """
+    Fonte de profundidade lida de um arquivo JSON lines, no lugar da Binance.
+    Cada linha é um snapshot ({"lastUpdateId", "bids", "asks"}) ou um evento
+    de diff no formato do stream depthUpdate ({"U", "u", "b", "a"}).
+    O fim do arquivo encerra o livro (não há reconexão).
+    """
+    reconectavel = False
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._snapshot = None
+        self._eventos = queue.Queue()
+
+    def iniciar(self):
+        with open(self.caminho, 'r', encoding='utf-8') as f:
+            for linha in f:
+                if not linha.strip():
+                    continue
+                mensagem = json.loads(linha)
+                if 'lastUpdateId' in mensagem:
+                    if self._snapshot is None:
+                        self._snapshot = mensagem
+                else:
+                    self._eventos.put(mensagem)
+        self._eventos.put(None)
+
+    def snapshot(self):
+        return self._snapshot
+
+    def proximo_evento(self, timeout=None):
+        return self._eventos.get(timeout=timeout)
+
+    def parar(self):
+        pass
+
+
+class FonteBinance:
+    """
+    Stream de diff de profundidade da Binance via WebSocket e snapshot via REST.
+    iniciar() pode ser chamado de novo depois de uma queda: cada conexão tem a
+    sua fila, então mensagens atrasadas da anterior não se misturam à nova.
+    """
+    reconectavel = True
+
+    def __init__(self, symbol='BTCUSDT', base_url=BASE_URL_BINANCE, base_ws=BASE_WS_BINANCE,
+                 velocidade='100ms', limite_snapshot=1000, session=None):
+        self.symbol = symbol
+        self.base_url = base_url.rstrip('/')
+        self.url_ws = f"{base_ws.rstrip('/')}/{symbol.lower()}@depth@{velocidade}"
+        # `limite_snapshot` é a janela usada pelo livro; o snapshot pede o
+        # próximo limit aceito acima dela, para sobrar margem além da janela
+        self.limite_snapshot = limite_snapshot
+        self.limite_pedido = limite_com_margem(limite_snapshot)
+        self.session = session or requests.Session()
+        self._eventos = queue.Queue()
+        self._ws = None
+
+    def iniciar(self):
+        # Dependência opcional: só é necessária para o feed ao vivo
+        import websocket
+
+        eventos = self._eventos = queue.Queue()
+
+        def ao_receber(_ws, mensagem):
+            with _DECODIFICACAO_EVENTO.cronometrar():
+                evento = json.loads(mensagem)
+            eventos.put(evento)
+
+        def ao_fechar(_ws, *args):
+            eventos.put(None)
+
+        self._ws = websocket.WebSocketApp(self.url_ws, on_message=ao_receber, on_close=ao_fechar)
+        threading.Thread(target=self._ws.run_forever, daemon=True, name='depth-ws').start()
+
+    def snapshot(self):
+        resposta = self.session.get(
+            f"{self.base_url}/api/v3/depth",
+            params={'symbol': self.symbol, 'limit': self.limite_pedido}, timeout=10,
+        )
+        resposta.raise_for_status()
+        return resposta.json()
+
+    def proximo_evento(self, timeout=None):
+        return self._eventos.get(timeout=timeout)
+
+    def parar(self):
+        if self._ws:
+            self._ws.close()
+
+
+class LivroOfertasLocal:
+    """
+    Livro de ofertas mantido localmente a partir de um snapshot e dos diffs.
+
+    Segue o procedimento da Binance: descarta eventos com u <= lastUpdateId,
+    exige U <= lastUpdateId + 1 <= u no primeiro evento e U == u anterior + 1
+    nos seguintes; uma lacuna na sequência dispara uma nova sincronização.
+    Leituras de melhor preço e notional por lado são O(1).
+
+    O notional é o dos `profundidade` melhores níveis (por padrão a janela da
+    fonte). O snapshot traz níveis além dela (`limite_pedido` da fonte) e os
+    diffs mantêm o livro exato até o pior nível do snapshot; se remoções
+    fizerem a parte exata ficar menor que a janela, pede um novo snapshot.
+    Sem essa margem (fonte de replay), a janela pode ficar curta. Se a
+    conexão de uma fonte ao vivo cair (a Binance derruba o WebSocket a cada
+    24 h) ou a sincronização falhar, reconecta com espera exponencial entre
+    `espera_inicial` e `espera_maxima` segundos e parte de um novo snapshot.
+    """
+
+    def __init__(self, fonte, profundidade=None, espera_inicial=1, espera_maxima=60):
+        self.fonte = fonte
+        self.profundidade = profundidade or getattr(fonte, 'limite_snapshot', None)
+        self.bids = LadoLivro(decrescente=True)
+        self.asks = LadoLivro(decrescente=False)
+        self.ultimo_update_id = None
+        self.sincronizado = False
+        self.ressincronizacoes = 0
+        self.reconexoes = 0
+        self.janelas_curtas = 0
+        self.espera_inicial = espera_inicial
+        self.espera_maxima = espera_maxima
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._thread = None
+
+    def _sincronizar(self):
+        snapshot = self.fonte.snapshot()
+        profundidade = self.profundidade or max(len(snapshot['bids']), len(snapshot['asks']))
+        limite = getattr(self.fonte, 'limite_pedido', None)
+        with self._lock:
+            self.bids.profundidade = self.asks.profundidade = profundidade
+            self.bids.carregar(snapshot['bids'], limite)
+            self.asks.carregar(snapshot['asks'], limite)
+            self.ultimo_update_id = snapshot['lastUpdateId']
+            self.sincronizado = False
+
+    def processar_evento(self, evento):
+        """Aplica um evento de diff; retorna False se houve lacuna (requer ressincronizar)."""
+        primeiro, ultimo = evento['U'], evento['u']
+        if ultimo <= self.ultimo_update_id:
+            return True
+        if not self.sincronizado:
+            if not (primeiro <= self.ultimo_update_id + 1 <= ultimo):
+                return False
+        elif primeiro != self.ultimo_update_id + 1:
+            return False
+
+        inicio = time.perf_counter()
+        with self._lock:
+            self.bids.aplicar(evento['b'])
+            self.asks.aplicar(evento['a'])
+            self.ultimo_update_id = ultimo
+            self.sincronizado = True
+        _APLICACAO_EVENTO.desde(inicio)
+        return True
+
+    def executar(self):
+        """Laço de consumo da fonte (bloqueante); use iniciar() para rodar em uma thread."""
+        reconectavel = getattr(self.fonte, 'reconectavel', False)
+        espera = self.espera_inicial
+        while not self._parar.is_set():
+            inicio = time.monotonic()
+            try:
+                self.fonte.iniciar()
+                self._sincronizar()
+                self._consumir()
+            except ImportError:
+                raise
+            except Exception as e:
+                if not reconectavel:
+                    raise
+                print(f"Falha no livro de ofertas local: {type(e).__name__} - {e}")
+                self.fonte.parar()
+            with self._lock:
+                self.sincronizado = False
+            if not reconectavel or self._parar.is_set():
+                break
+            # Uma conexão que durou mais que a espera máxima zera o backoff
+            if time.monotonic() - inicio > self.espera_maxima:
+                espera = self.espera_inicial
+            print(f"Conexão do livro de ofertas encerrada; reconectando em {espera:g} s...")
+            if self._parar.wait(espera):
+                break
+            espera = min(espera * 2, self.espera_maxima)
+            self.reconexoes += 1
+            _RECONEXOES.incrementar()
+
+    def _consumir(self):
+        """Aplica os eventos até a fonte encerrar (evento None) ou parar() ser chamado."""
+        while not self._parar.is_set():
+            try:
+                evento = self.fonte.proximo_evento(timeout=1)
+            except queue.Empty:
+                continue
+            if evento is None:
+                return
+            if not self.processar_evento(evento):
+                print(f"Lacuna na sequência do livro (último {self.ultimo_update_id}, evento U={evento['U']}); ressincronizando...")
+                self.ressincronizacoes += 1
+                _RESSINCRONIZACOES.incrementar()
+                self._sincronizar()
+            elif self.janela_curta():
+                print(f"Janela do livro abaixo de {self.profundidade} níveis exatos; pedindo novo snapshot...")
+                self.janelas_curtas += 1
+                _JANELAS_CURTAS.incrementar()
+                self._sincronizar()
+
+    def janela_curta(self):
+        with self._lock:
+            return self.bids.curto() or self.asks.curto()
+
+    def _executar_thread(self):
+        try:
+            self.executar()
+        except Exception as e:
+            print(f"Livro de ofertas local interrompido: {type(e).__name__} - {e}")
+        with self._lock:
+            self.sincronizado = False
+
+    def iniciar(self):
+        self._thread = threading.Thread(target=self._executar_thread, daemon=True, name='livro-ofertas')
+        self._thread.start()
+        return self
+
+    def parar(self):
+        self._parar.set()
+        self.fonte.parar()
+
+    def volumes(self):
+        """(notional dos bids, notional dos asks) em USD, ou (None, None) se não sincronizado."""
+        with self._lock:
+            if not self.sincronizado:
+                return None, None
+            return self.bids.notional, self.asks.notional
+
+    def topo(self):
+        """(melhor bid, melhor ask)."""
+        with self._lock:
+            return self.bids.melhor(), self.asks.melhor()
+
+    def niveis(self, limite=None):
+        """Cópia dos níveis {'bids': (n, 2), 'asks': (n, 2)} do melhor para o pior preço."""
+        with self._lock:
+            return {'bids': self.bids.niveis(limite).copy(), 'asks': self.asks.niveis(limite).copy()}
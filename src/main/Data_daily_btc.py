@@ -1,12 +1,9 @@
 import sys
 import os
-import requests
-import json
-import csv
-import pandas as pd
+import math
+import queue
 import datetime
-import ssl
-import uuid
+from collections import deque
 from cassandra.cluster import Cluster
 from cassandra.protocol import SyntaxException, InvalidRequest
 
@@ -15,6 +12,34 @@ from tkinter import ttk, messagebox, filedialog
 
 import logging
 
+# Permite executar o script diretamente (python src/main/Data_daily_btc.py)
+RAIZ_PROJETO = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if RAIZ_PROJETO not in sys.path:
+    sys.path.insert(0, RAIZ_PROJETO)
+
+from src.analysis.indicadores_streaming import ConjuntoIndicadores
+from src.main.worker_binance import WorkerBinance
+from src.collection.liquidez import colunas_liquidez
+from src.main.historico_ticks import HistoricoTicks, de_ms
+from src.main.historico_writer import EscritorHistorico
+from src.storage.cassandra_ingest import EscritorCassandra
+from src.storage.serie_temporal import TABELA_TICKS
+from src.main.barramento_ticks import PublicadorTicks
+from src.main.coletor import Coletor, SinkTicks, linha_tick
+from src.storage.metricas import REGISTRO, profiler_do_ambiente
+
+# Intervalo (ms) com que a interface consome os resultados do worker
+INTERVALO_FILA_MS = 50
+# Ticks mantidos em memória; os mais antigos são descartados ou, com
+# BTC_HISTORICO_TRANSBORDO=<arquivo>, gravados nesse arquivo (um por sessão)
+CAPACIDADE_HISTORICO = 100_000
+# Linhas exibidas no Treeview (janela com os ticks mais recentes)
+LINHAS_VISIVEIS = 1_000
+# Grava também um .bin (registros de 48 bytes) ao lado do CSV do histórico
+HISTORICO_BINARIO = False
+# Intervalo (ms) de atualização da aba de estatísticas
+INTERVALO_ESTATISTICAS_MS = 1000
+
 class BitcoinRelator(tk.Tk):
     def __init__(self):
         super().__init__()
@@ -22,20 +47,38 @@ class BitcoinRelator(tk.Tk):
         self.title("Bitcoin Relator - Binance")
         self.geometry("1000x700")
 
-        self.historico_precos = []
+        self.historico_precos = HistoricoTicks(
+            CAPACIDADE_HISTORICO,
+            arquivo_transbordo=os.environ.get("BTC_HISTORICO_TRANSBORDO"),
+        )
+        self.linhas_tree = deque()
+        self.escritor_historico = None
         self.nome_arquivo_csv = ""
         self.intervalo_atualizacao = 30 * 60  # 30 minutos
         self.tempo_restante = self.intervalo_atualizacao
-        self.atualizando = False
         self.diretorio_relatorios = os.path.expanduser("~")  # Diretório padrão inicial
         self.cassandra_session = None
         self.cassandra_cluster = None
+        self.escritor_cassandra = None
+        self.publicador_ticks = None
+        self.coletor = None
         self.timer_id = None
-        self.sequential_id = 1 # This will be updated by load_last_sequential_id
+        # Indicadores incrementais (O(1) por tick), retomados do último checkpoint
+        self.arquivo_indicadores = os.path.join(os.path.expanduser("~"), ".bitcoin_relator_indicadores.json")
+        self.indicadores = ConjuntoIndicadores.carregar(self.arquivo_indicadores)
+        # Rede e Cassandra rodam no worker; a interface só consome a fila de resultados
+        self.worker = WorkerBinance()
+        # Livro de ofertas local pelo stream de diffs (ou replay, se BTC_DEPTH_REPLAY apontar um arquivo)
+        self.worker.iniciar_livro(os.environ.get("BTC_DEPTH_REPLAY"))
+        # Opcional: pilhas amostradas gravadas ao fechar (BTC_PROFILER=<intervalo em ms>)
+        self.profiler = profiler_do_ambiente()
 
         self.init_cassandra()
-        self.load_last_sequential_id()
+        self.init_coletor()
+        self.registrar_metricas()
         self.init_ui()
+        self.processar_resultados()
+        self.atualizar_estatisticas()
         self.atualizar_preco()
         self.iniciar_contagem_regressiva()
         self.protocol("WM_DELETE_WINDOW", self.close_app)
@@ -49,54 +92,76 @@ class BitcoinRelator(tk.Tk):
                 WITH replication = { 'class': 'SimpleStrategy', 'replication_factor': '1' }
             """)
             self.cassandra_session.set_keyspace('btc')
+            # DDL e prepare uma vez por tabela; inserts assíncronos em lotes por partição
+            self.escritor_cassandra = EscritorCassandra(
+                self.cassandra_session, colunas_extra=colunas_liquidez(),
+                ao_erro=lambda e: self.worker.resultados.put(
+                    ('erro', "Erro de Query Cassandra", f"Erro ao salvar dados automaticamente no Cassandra: {e}")),
+            )
+            # Cada tick gravado também é publicado no barramento do server.py (entrega em milissegundos)
+            self.publicador_ticks = PublicadorTicks()
         except Exception as e:
             error_msg = f"Cassandra connection error: {type(e).__name__}"
             print(error_msg)
             messagebox.showerror("Cassandra Error", error_msg)
             self.cassandra_session = None
 
-    def load_last_sequential_id(self):
-        if not self.cassandra_session:
-            return
-        try:
-            now = datetime.datetime.now()
-            today_str = now.strftime('%Y_%m_%d')
-            table_name = f"btc_{today_str}"
-            day_partition = now.strftime('%Y-%m-%d')
-
-            # Garante que a tabela do dia exista antes de consultá-la
-            query = f"""CREATE TABLE IF NOT EXISTS {table_name} (
-                day_partition TEXT,
-                sequential_id INT,
-                id UUID,
-                dia_tempo TIMESTAMP,
-                valor DECIMAL,
-                volume_buy DECIMAL,
-                volume_sell DECIMAL,
-                PRIMARY KEY (day_partition, sequential_id)
-            ) WITH CLUSTERING ORDER BY (sequential_id ASC);"""
-            self.cassandra_session.execute(query)
-
-            # Busca o maior ID sequencial na tabela do dia
-            query = f"SELECT MAX(sequential_id) as max_id FROM {table_name} WHERE day_partition = %s"
-            result = self.cassandra_session.execute(query, (day_partition,))
-            row = result.one()
-            if row and row.max_id is not None:
-                self.sequential_id = row.max_id + 1
-            else:
-                self.sequential_id = 1
-            print(f"ID sequencial inicializado em: {self.sequential_id}")
-        except Exception as e:
-            print(f"Não foi possível carregar o último ID sequencial, iniciando em 1. Erro: {e}")
-            self.sequential_id = 1
+    def init_coletor(self):
+        """
+        A coleta e a gravação são as do coletor sem interface (src/main/coletor.py),
+        rodando em uma thread sob demanda: cada atualizar_preco pede um ciclo, e o
+        tick volta pela fila do worker como ('tick', ...).
+        """
+        sink = None
+        if self.cassandra_session:
+            sink = SinkTicks(self.escritor_cassandra, self.publicador_ticks, ao_erro=lambda e: self.worker.resultados.put(
+                ('erro', "Erro de Query Cassandra", f"Erro ao salvar dados automaticamente no Cassandra: {e}")))
+        # 1000 níveis: a mesma profundidade do livro local do worker, então o
+        # snapshot usado quando o livro não está sincronizado mede a mesma janela
+        self.coletor = Coletor(
+            [self.worker.symbol], self.worker, sink, intervalo=None, limite_livro=1000,
+            livros={self.worker.symbol: self.worker.livro},
+            ao_tick=lambda linha, liquidez: self.worker.resultados.put(
+                ('tick', linha['valor'], linha['volume_buy'], linha['volume_sell'], liquidez)),
+            ao_erro=lambda symbol, e: self.worker.resultados.put(('erro_busca', "Error getting Bitcoin price.")),
+        ).iniciar_thread()
 
     def close_app(self):
         if self.timer_id:
             self.after_cancel(self.timer_id)
+        if self.coletor:
+            self.coletor.parar_thread()
+        try:
+            self.indicadores.salvar(self.arquivo_indicadores)
+        except OSError as e:
+            print(f"Não foi possível salvar o estado dos indicadores: {e}")
+        if self.escritor_historico:
+            self.worker.executar(self.escritor_historico.fechar)
+        self.worker.encerrar()
+        self.historico_precos.fechar()
+        if self.escritor_cassandra:
+            self.escritor_cassandra.fechar()
+        if self.publicador_ticks:
+            self.publicador_ticks.fechar()
         if self.cassandra_cluster:
             self.cassandra_cluster.shutdown()
+        if self.profiler:
+            self.profiler.parar()
+            arquivo_perfil = os.path.join(os.path.expanduser("~"), ".bitcoin_relator_perfil.txt")
+            self.profiler.salvar(arquivo_perfil)
+            print(f"Pilhas do profiler salvas em {arquivo_perfil}")
         self.destroy()
 
+    def registrar_metricas(self):
+        """Métricas do próprio app; as de Binance, livro e Cassandra vêm dos módulos."""
+        REGISTRO.medidor('btc_coletor_fila_resultados', 'Resultados do worker aguardando a interface',
+                         funcao=self.worker.resultados.qsize)
+        REGISTRO.contador('btc_coletor_ticks_total', 'Ticks recebidos pela interface',
+                          funcao=lambda: self.historico_precos.total)
+        if self.publicador_ticks:
+            REGISTRO.contador('btc_publicador_descartados_total', 'Ticks não publicados no barramento (fila cheia)',
+                              funcao=lambda: self.publicador_ticks.descartados)
+
     def init_ui(self):
         # Variáveis de String para os Labels
         self.preco_var = tk.StringVar(value="Bitcoin Price: Waiting...")
@@ -104,6 +169,8 @@ class BitcoinRelator(tk.Tk):
         self.tempo_restante_var = tk.StringVar(value=self.formatar_tempo(self.tempo_restante))
         self.volume_compras_var = tk.StringVar(value="Buy Volume (USD est.): Waiting...")
         self.volume_vendas_var = tk.StringVar(value="Sell Volume (USD est.): Waiting...")
+        self.indicadores_var = tk.StringVar(value="Indicators: Waiting...")
+        self.liquidez_var = tk.StringVar(value="Liquidity: Waiting...")
         self.diretorio_var = tk.StringVar(value=self.diretorio_relatorios)
 
         # Menu Bar
@@ -120,8 +187,10 @@ class BitcoinRelator(tk.Tk):
         self.tabs = ttk.Notebook(self)
         self.tab_historico = ttk.Frame(self.tabs)
         self.tab_relatorio = ttk.Frame(self.tabs)
+        self.tab_estatisticas = ttk.Frame(self.tabs)
         self.tabs.add(self.tab_historico, text="History")
         self.tabs.add(self.tab_relatorio, text="Report")
+        self.tabs.add(self.tab_estatisticas, text="Stats")
         self.tabs.pack(expand=True, fill='both', padx=10, pady=10)
 
         # --- Layout da aba Histórico ---
@@ -132,6 +201,8 @@ class BitcoinRelator(tk.Tk):
         ttk.Label(hist_frame, textvariable=self.variacao_var).pack(anchor='w')
         ttk.Label(hist_frame, textvariable=self.volume_compras_var).pack(anchor='w')
         ttk.Label(hist_frame, textvariable=self.volume_vendas_var).pack(anchor='w')
+        ttk.Label(hist_frame, textvariable=self.indicadores_var).pack(anchor='w')
+        ttk.Label(hist_frame, textvariable=self.liquidez_var).pack(anchor='w')
 
         # Tree Widget
         self.tree_historico = ttk.Treeview(hist_frame, columns=("ID", "DateTime", "Price", "Change", "Buy Volume", "Sell Volume"), show='headings')
@@ -152,6 +223,8 @@ class BitcoinRelator(tk.Tk):
         # Layout dos intervalos
         interval_frame = ttk.Frame(hist_frame)
         interval_frame.pack(fill='x', pady=5)
+        ttk.Button(interval_frame, text="500 ms", command=lambda: self.definir_intervalo(0.5)).pack(side='left', padx=2)
+        ttk.Button(interval_frame, text="1 Second", command=lambda: self.definir_intervalo(1)).pack(side='left', padx=2)
         ttk.Button(interval_frame, text="10 Seconds", command=lambda: self.definir_intervalo(10)).pack(side='left', padx=2)
         ttk.Button(interval_frame, text="1 Minute", command=lambda: self.definir_intervalo(1 * 60)).pack(side='left', padx=2)
         ttk.Button(interval_frame, text="10 Minutes", command=lambda: self.definir_intervalo(10 * 60)).pack(side='left', padx=2)
@@ -175,125 +248,99 @@ class BitcoinRelator(tk.Tk):
         ttk.Button(relatorio_frame, text="Save Report to CSV", command=self.salvar_relatorio_csv).pack(pady=5)
         ttk.Button(relatorio_frame, text="Registrar no Cassandra", command=self.salvar_no_cassandra).pack(pady=5)
 
-    def obter_preco_e_volume_bitcoin(self):
-        try:
-            preco_url = 'https://api.binance.com/api/v3/ticker/price?symbol=BTCUSDT'
-            preco_response = requests.get(preco_url)
-            preco_response.raise_for_status()
-            preco_data = preco_response.json()
-            preco = float(preco_data['price'])
-
-            orderbook_url = 'https://api.binance.com/api/v3/depth?symbol=BTCUSDT&limit=1000'
-            orderbook_response = requests.get(orderbook_url)
-            orderbook_response.raise_for_status()
-            orderbook_data = orderbook_response.json()
-
-            volume_compras = sum([float(price) * float(quantity) for price, quantity in orderbook_data['bids']])
-            volume_vendas = sum([float(price) * float(quantity) for price, quantity in orderbook_data['asks']])
-
-            return preco, volume_compras, volume_vendas
-        except requests.exceptions.RequestException as e:
-            print(f"Request error: {type(e).__name__} - {e}")
-            return None, None, None
-        except (KeyError, json.JSONDecodeError) as e:
-            print(f"Error processing API response: {type(e).__name__} - {e}")
-            return None, None, None
-        except ssl.SSLError as e:
-            print(f"SSL Error: {type(e).__name__} - {e}")
-            return None, None, None
-        except Exception as e:
-            error_msg = f"Error getting Bitcoin data: {type(e).__name__}"
-            print(error_msg)
-            self.preco_var.set(error_msg)
-            return None, None, None
+        # --- Layout da aba Estatísticas ---
+        self.tree_estatisticas = ttk.Treeview(self.tab_estatisticas, columns=("Metric", "Value"), show='headings')
+        self.tree_estatisticas.heading("Metric", text="Metric")
+        self.tree_estatisticas.heading("Value", text="Value")
+        self.tree_estatisticas.column("Metric", width=420)
+        self.tree_estatisticas.pack(expand=True, fill='both', padx=5, pady=5)
+
+    def atualizar_estatisticas(self):
+        """Atualiza a aba Stats com o registro de métricas (só quando está visível)."""
+        if self.tabs.select() == str(self.tab_estatisticas):
+            self.tree_estatisticas.delete(*self.tree_estatisticas.get_children())
+            for nome, valor in REGISTRO.resumo():
+                self.tree_estatisticas.insert('', 'end', values=(nome, valor))
+        self.after(INTERVALO_ESTATISTICAS_MS, self.atualizar_estatisticas)
 
     def atualizar_preco(self):
-        if self.atualizando:
-            return
-        self.atualizando = True
-
-        preco, volume_compras, volume_vendas = self.obter_preco_e_volume_bitcoin()
-
-        if preco is not None and volume_compras is not None and volume_vendas is not None:
-            agora = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            variacao = self.calcular_variacao(preco)
-
-            self.preco_var.set(f"Bitcoin Price: ${preco:.2f}")
-            self.variacao_var.set(f"Change: {variacao:.2f}%")
-            self.volume_compras_var.set(f"Buy Volume (USD est.): ${volume_compras:.2f}")
-            self.volume_vendas_var.set(f"Sell Volume (USD est.): ${volume_vendas:.2f}")
-
-            self.historico_precos.append((agora, preco, variacao, volume_compras, volume_vendas))
-            self.atualizar_historico()
+        # Só agenda a coleta: a resposta chega pela fila em processar_resultados
+        self.coletor.solicitar()
 
-            if self.cassandra_session:
-                self.salvar_dados_cassandra_auto(preco, volume_compras, volume_vendas)
-
-            if self.nome_arquivo_csv:
-                self.salvar_historico()
-        else:
-            self.preco_var.set("Error getting Bitcoin price.")
-            self.variacao_var.set("")
-            self.volume_compras_var.set("")
-            self.volume_vendas_var.set("")
-        self.atualizando = False
-
-    def salvar_dados_cassandra_auto(self, preco, volume_compras, volume_vendas):
-        if not self.cassandra_session:
-            return
+    def processar_resultados(self):
+        """Consome a fila do worker na thread do Tkinter e reagenda a si mesma."""
         try:
-            now = datetime.datetime.now()
-            today_str = now.strftime('%Y_%m_%d')
-            table_name = f"btc_{today_str}"
-            day_partition = now.strftime('%Y-%m-%d')
-            query = f"""CREATE TABLE IF NOT EXISTS {table_name} (
-                day_partition TEXT,
-                sequential_id INT,
-                id UUID,
-                dia_tempo TIMESTAMP,
-                valor DECIMAL,
-                volume_buy DECIMAL,
-                volume_sell DECIMAL,
-                PRIMARY KEY (day_partition, sequential_id)
-            ) WITH CLUSTERING ORDER BY (sequential_id ASC);"""
-            self.cassandra_session.execute(query)
-
-            insert_now = now.replace(microsecond=0)
-            query = f"INSERT INTO {table_name} (day_partition, sequential_id, id, dia_tempo, valor, volume_buy, volume_sell) VALUES (%s, %s, %s, %s, %s, %s, %s)"
-            self.cassandra_session.execute(query, (day_partition, self.sequential_id, uuid.uuid4(), insert_now, preco, volume_compras, volume_vendas))
-            self.sequential_id += 1
-        except (SyntaxException, InvalidRequest) as e:
-            messagebox.showwarning("Erro de Query Cassandra", f"Erro ao salvar dados automaticamente no Cassandra: {e}")
-        except Exception as e:
-            messagebox.showwarning("Erro Inesperado", f"Ocorreu um erro inesperado ao salvar no Cassandra: {e}")
+            while True:
+                item = self.worker.resultados.get_nowait()
+                if item[0] == 'tick':
+                    self.aplicar_tick(*item[1:])
+                elif item[0] == 'erro_busca':
+                    self.preco_var.set(item[1])
+                    self.variacao_var.set("")
+                    self.volume_compras_var.set("")
+                    self.volume_vendas_var.set("")
+                elif item[0] == 'erro':
+                    messagebox.showwarning(item[1], item[2])
+                elif item[0] == 'info':
+                    messagebox.showinfo(item[1], item[2])
+        except queue.Empty:
+            pass
+        self.after(INTERVALO_FILA_MS, self.processar_resultados)
+
+    def aplicar_tick(self, preco, volume_compras, volume_vendas, liquidez=None):
+        agora = datetime.datetime.now().replace(microsecond=0)
+        variacao = self.calcular_variacao(preco)
+
+        self.preco_var.set(f"Bitcoin Price: ${preco:.2f}")
+        self.variacao_var.set(f"Change: {variacao:.2f}%")
+        self.volume_compras_var.set(f"Buy Volume (USD est.): ${volume_compras:.2f}")
+        self.volume_vendas_var.set(f"Sell Volume (USD est.): ${volume_vendas:.2f}")
+        self.indicadores_var.set(self.formatar_indicadores(self.indicadores.atualizar(preco)))
+        if liquidez:
+            self.liquidez_var.set(self.formatar_liquidez(liquidez))
+
+        self.historico_precos.adicionar(agora, preco, variacao, volume_compras, volume_vendas)
+        self.inserir_linha_historico(self.historico_precos.total, agora, preco, variacao, volume_compras, volume_vendas)
+
+        if self.escritor_historico:
+            # Só anexa o tick: o custo não cresce com o tamanho do histórico
+            self.worker.executar(self.escritor_historico.escrever, agora, preco, variacao, volume_compras, volume_vendas,
+                                 titulo_erro="Erro ao Salvar Histórico")
 
     def calcular_variacao(self, preco_atual):
-        if not self.historico_precos:
+        ultimo = self.historico_precos.ultimo()
+        if ultimo is None:
             return 0
-        _, preco_anterior, _, _, _ = self.historico_precos[-1]
+        _, preco_anterior, _, _, _ = ultimo
         if preco_anterior == 0:
             return 0
         return ((preco_atual - preco_anterior) / preco_anterior) * 100
 
+    def inserir_linha_historico(self, seq, momento, preco, variacao, volume_compras, volume_vendas):
+        """Acrescenta uma linha ao Treeview e remove a mais antiga além da janela visível."""
+        iid = str(seq)
+        self.tree_historico.insert('', 'end', iid=iid, values=(seq, momento.strftime('%m-%d %H:%M:%S'), f"${preco:.2f}", f"{variacao:.2f}%", f"${volume_compras:.2f}", f"${volume_vendas:.2f}"))
+        self.linhas_tree.append(iid)
+        while len(self.linhas_tree) > min(LINHAS_VISIVEIS, self.historico_precos.capacidade):
+            self.tree_historico.delete(self.linhas_tree.popleft())
+
     def atualizar_historico(self):
-        for i in self.tree_historico.get_children():
-            self.tree_historico.delete(i)
-        for i, (data_str, preco, variacao, volume_compras, volume_vendas) in enumerate(self.historico_precos, 1):
-            try:
-                data_obj = datetime.datetime.strptime(data_str, '%Y-%m-%d %H:%M:%S')
-                data_formatada = data_obj.strftime('%m-%d %H:%M:%S')
-            except ValueError:
-                data_formatada = data_str
-            self.tree_historico.insert('', 'end', values=(i, data_formatada, f"${preco:.2f}", f"{variacao:.2f}%", f"${volume_compras:.2f}", f"${volume_vendas:.2f}"))
+        """Reconstrói o Treeview a partir do histórico (só usado ao reiniciar o histórico)."""
+        if self.linhas_tree:
+            self.tree_historico.delete(*self.linhas_tree)
+        self.linhas_tree.clear()
+        for registro in self.historico_precos.ordenados(LINHAS_VISIVEIS):
+            self.inserir_linha_historico(int(registro['seq']), de_ms(registro['tempo']), float(registro['preco']), float(registro['variacao']),
+                                         float(registro['volume_compras']), float(registro['volume_vendas']))
 
     def gerar_relatorio(self):
-        if not self.historico_precos:
+        if not len(self.historico_precos):
             self.text_relatorio.delete('1.0', tk.END)
             self.text_relatorio.insert(tk.END, "No data available to generate a report.")
             return
 
-        df = pd.DataFrame(self.historico_precos, columns=['DateTime', 'Price', 'Change', 'Buy Volume (USD)', 'Sell Volume (USD)'])
-        df['DateTime'] = pd.to_datetime(df['DateTime']).dt.strftime('%m-%d %H:%M:%S')
+        df = self.historico_precos.para_dataframe()
+        df['DateTime'] = df['DateTime'].dt.strftime('%m-%d %H:%M:%S')
         media = df['Price'].mean()
         maximo = df['Price'].max()
         minimo = df['Price'].min()
@@ -318,35 +365,27 @@ class BitcoinRelator(tk.Tk):
         if not self.cassandra_session:
             messagebox.showerror("Erro de Conexão", "Não há conexão com o Cassandra.")
             return
-        if not self.historico_precos:
+        if not len(self.historico_precos):
             messagebox.showwarning("Sem Dados", "Não há dados para registrar no Cassandra.")
             return
-        try:
-            now = datetime.datetime.now()
-            today_str = now.strftime('%Y_%m_%d')
-            table_name = f'btc_{today_str}'
-            day_partition = now.strftime('%Y-%m-%d')
-            query = f"""CREATE TABLE IF NOT EXISTS {table_name} (
-                day_partition TEXT,
-                sequential_id INT,
-                id UUID,
-                dia_tempo TIMESTAMP,
-                valor DECIMAL,
-                volume_buy DECIMAL,
-                volume_sell DECIMAL,
-                PRIMARY KEY (day_partition, sequential_id)
-            ) WITH CLUSTERING ORDER BY (sequential_id ASC);"""
-            self.cassandra_session.execute(query)
-            _, preco, _, volume_compras, volume_vendas = self.historico_precos[-1]
-            insert_now = now.replace(microsecond=0)
-            query = f"INSERT INTO {table_name} (day_partition, sequential_id, id, dia_tempo, valor, volume_buy, volume_sell) VALUES (%s, %s, %s, %s, %s, %s, %s)"
-            self.cassandra_session.execute(query, (day_partition, self.sequential_id, uuid.uuid4(), insert_now, preco, volume_compras, volume_vendas))
-            self.sequential_id += 1
-            messagebox.showinfo("Sucesso", f"Dados registrados na tabela '{table_name}' do Cassandra.")
-        except (SyntaxException, InvalidRequest) as e:
-            messagebox.showerror("Erro de Query", f"Erro ao criar tabela/inserir dados no Cassandra: {e}")
-        except Exception as e:
-            messagebox.showerror("Erro Inesperado", f"Ocorreu um erro inesperado: {e}")
+        _, preco, _, volume_compras, volume_vendas = self.historico_precos.ultimo()
+        tick = linha_tick(self.worker.symbol, datetime.datetime.now(), preco, volume_compras, volume_vendas)
+
+        # inserir/descarregar podem bloquear (esquema, prepare, backpressure):
+        # rodam na thread de escrita do worker e o resultado volta pela fila
+        def gravar():
+            try:
+                linha = self.escritor_cassandra.inserir(tick)
+                self.escritor_cassandra.descarregar()
+            except (SyntaxException, InvalidRequest) as e:
+                self.worker.resultados.put(
+                    ('erro', "Erro de Query", f"Erro ao criar tabela/inserir dados no Cassandra: {e}"))
+                return
+            self.publicador_ticks.publicar(linha)
+            self.worker.resultados.put(
+                ('info', "Sucesso", f"Dados registrados na tabela '{TABELA_TICKS}' do Cassandra."))
+
+        self.worker.executar(gravar)
 
     def selecionar_diretorio(self):
         diretorio = filedialog.askdirectory(title="Select Reports Directory")
@@ -361,7 +400,7 @@ class BitcoinRelator(tk.Tk):
         report_dir = self.diretorio_relatorios
         os.makedirs(report_dir, exist_ok=True)
         filepath = os.path.join(report_dir, filename)
-        df = pd.DataFrame(self.historico_precos, columns=['DateTime', 'Price', 'Change', 'Buy Volume (USD)', 'Sell Volume (USD)'])
+        df = self.historico_precos.para_dataframe()
         try:
             df.to_csv(filepath, index=False)
             print(f"Report saved to {filepath}")
@@ -369,13 +408,20 @@ class BitcoinRelator(tk.Tk):
             print(f"Error saving report: {e}")
 
     def novo_historico(self):
-        self.historico_precos = []
+        self.historico_precos.limpar()
         self.nome_arquivo_csv = ""
+        if self.escritor_historico:
+            self.worker.executar(self.escritor_historico.fechar)
+            self.escritor_historico = None
         self.atualizar_historico()
         self.text_relatorio.delete('1.0', tk.END)
         print("New history created.")
 
     def salvar_historico(self):
+        if self.escritor_historico:
+            # Os ticks já são anexados ao arquivo; aqui só força a gravação do buffer
+            self.worker.executar(self.escritor_historico.flush, titulo_erro="Erro ao Salvar Histórico")
+            return
         if not self.nome_arquivo_csv:
             file_path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV Files", "*.csv"), ("All Files", "*.*")], title="Save CSV File")
             if file_path:
@@ -383,13 +429,16 @@ class BitcoinRelator(tk.Tk):
             else:
                 return
         try:
-            with open(self.nome_arquivo_csv, 'w', newline='') as arquivo_csv:
-                escritor_csv = csv.writer(arquivo_csv)
-                escritor_csv.writerow(["DateTime", "Price", "Change (%)", "Buy Volume (USD)", "Sell Volume (USD)"])
-                for row in self.historico_precos:
-                    escritor_csv.writerow(row)
+            # Grava o histórico atual uma única vez; os próximos ticks são anexados
+            self.escritor_historico = EscritorHistorico(self.nome_arquivo_csv, binario=HISTORICO_BINARIO, sobrescrever=True)
+            registros = self.historico_precos.ordenados()
+            self.escritor_historico.escrever_lote(
+                (de_ms(r['tempo']), float(r['preco']), float(r['variacao']), float(r['volume_compras']), float(r['volume_vendas']))
+                for r in registros
+            )
             print(f"History saved to {self.nome_arquivo_csv}")
         except Exception as e:
+            self.escritor_historico = None
             print(f"Error saving file: {e}")
 
     def definir_intervalo(self, intervalo_segundos):
@@ -404,16 +453,29 @@ class BitcoinRelator(tk.Tk):
         self.contagem_regressiva()
 
     def contagem_regressiva(self):
+        # Passo de 1 s, ou o próprio intervalo quando ele é menor que 1 s
+        passo = min(1, self.intervalo_atualizacao)
         self.tempo_restante_var.set(self.formatar_tempo(self.tempo_restante))
+        self.tempo_restante -= passo
         if self.tempo_restante <= 0:
             self.atualizar_preco()
             self.tempo_restante = self.intervalo_atualizacao
-        else:
-            self.tempo_restante -= 1
-        self.timer_id = self.after(1000, self.contagem_regressiva)
+        self.timer_id = self.after(int(passo * 1000), self.contagem_regressiva)
+
+    def formatar_indicadores(self, valores):
+        partes = []
+        for nome, valor in valores.items():
+            rotulo = nome.replace('_', ' ').upper()
+            partes.append(f"{rotulo}: {valor:.2f}" if valor is not None else f"{rotulo}: warming up")
+        return "Indicators: " + " | ".join(partes)
+
+    def formatar_liquidez(self, liquidez):
+        return (f"Liquidity: Spread {liquidez['spread_bps']:.2f} bps | Microprice ${liquidez['microprice']:.2f}"
+                f" | Imbalance ±1%: {liquidez['desequilibrio_1pct']:+.2f}"
+                f" | Slippage buy/sell: {liquidez['slippage_compra_bps']:.2f}/{liquidez['slippage_venda_bps']:.2f} bps")
 
     def formatar_tempo(self, segundos):
-        minutos, segundos = divmod(segundos, 60)
+        minutos, segundos = divmod(int(math.ceil(segundos)), 60)
         return f"{minutos:02}:{segundos:02}"
 
 if __name__ == '__main__':
@@ -0,0 +1,189 @@
+import os
+import json
+import queue
+import socket
+import asyncio
+import datetime
+import threading
+
+from src.storage.serie_temporal import para_ms
+
+# Endereço local do barramento: o coletor publica, o server.py assina
+HOST_BARRAMENTO = '127.0.0.1'
+PORTA_BARRAMENTO = 8765
+# Campos obrigatórios de uma mensagem (volume_buy e volume_sell são opcionais)
+CAMPOS_TICK = ('symbol', 'dia', 't', 'writer_id', 'seq', 'valor')
+
+
+def endereco_barramento():
+    """(host, porta) do barramento, configurável por BTC_TICK_BUS=host:porta."""
+    valor = os.environ.get('BTC_TICK_BUS')
+    if not valor:
+        return HOST_BARRAMENTO, PORTA_BARRAMENTO
+    host, porta = valor.rsplit(':', 1)
+    return host, int(porta)
+
+
+def tick_para_mensagem(linha):
+    """Linha gravada no Cassandra -> mensagem do barramento (uma linha JSON)."""
+    return json.dumps({
+        'symbol': linha['symbol'],
+        'dia': linha['dia'].isoformat(),
+        't': para_ms(linha['dia_tempo']),
+        'writer_id': linha['writer_id'],
+        'seq': linha['seq'],
+        'valor': float(linha['valor']),
+        'volume_buy': float(linha['volume_buy']) if linha.get('volume_buy') is not None else None,
+        'volume_sell': float(linha['volume_sell']) if linha.get('volume_sell') is not None else None,
+    }) + '\n'
+
+
+def mensagem_para_tick(linha):
+    """Mensagem do barramento -> tick (dict, com `dia` como date); ValueError se for inválida."""
+    tick = json.loads(linha)
+    if not isinstance(tick, dict):
+        raise ValueError("a mensagem não é um objeto JSON")
+    faltando = [campo for campo in CAMPOS_TICK if campo not in tick]
+    if faltando:
+        raise ValueError(f"campos ausentes: {', '.join(faltando)}")
+    for campo in ('t', 'valor', 'volume_buy', 'volume_sell'):
+        valor = tick.get(campo)
+        if valor is not None and (isinstance(valor, bool) or not isinstance(valor, (int, float))):
+            raise ValueError(f"{campo} não é numérico: {valor!r}")
+    try:
+        tick['dia'] = datetime.date.fromisoformat(tick['dia'])
+    except TypeError as e:
+        raise ValueError(f"dia inválido: {e}") from e
+    return tick
+
+
+class PublicadorTicks:
+    """
+    Lado do coletor: envia cada tick ao barramento por um socket TCP local.
+
+    `publicar` nunca bloqueia quem grava: a mensagem vai para uma fila limitada
+    e uma thread cuida da conexão (e das reconexões). Se o servidor estiver fora
+    do ar ou a fila encher, o tick é descartado aqui; o server.py o recupera
+    depois na leitura de catch-up do Cassandra.
+    """
+
+    def __init__(self, host=None, porta=None, tamanho_fila=10_000, intervalo_reconexao=5.0):
+        padrao_host, padrao_porta = endereco_barramento()
+        self.host = host or padrao_host
+        self.porta = porta or padrao_porta
+        self.intervalo_reconexao = intervalo_reconexao
+        self.fila = queue.Queue(maxsize=tamanho_fila)
+        self.descartados = 0
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._laco, daemon=True, name='publicador-ticks')
+        self._thread.start()
+
+    def publicar(self, linha):
+        try:
+            self.fila.put_nowait(tick_para_mensagem(linha))
+        except queue.Full:
+            self.descartados += 1
+
+    def _laco(self):
+        conexao = None
+        while not self._parar.is_set():
+            try:
+                mensagem = self.fila.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if mensagem is None:
+                break
+            # Junta o que mais estiver na fila em um único envio
+            mensagens = [mensagem]
+            while len(mensagens) < 1000:
+                try:
+                    proxima = self.fila.get_nowait()
+                except queue.Empty:
+                    break
+                if proxima is None:
+                    self._parar.set()
+                    break
+                mensagens.append(proxima)
+            try:
+                if conexao is None:
+                    conexao = socket.create_connection((self.host, self.porta), timeout=2)
+                    conexao.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                conexao.sendall(''.join(mensagens).encode('utf-8'))
+            except OSError:
+                self.descartados += len(mensagens)
+                if conexao is not None:
+                    conexao.close()
+                    conexao = None
+                self._parar.wait(self.intervalo_reconexao)
+        if conexao is not None:
+            conexao.close()
+
+    def fechar(self):
+        try:
+            self.fila.put_nowait(None)
+        except queue.Full:
+            self._parar.set()
+        self._thread.join(timeout=2)
+
+
+class BarramentoTicks:
+    """
+    Lado do servidor: pub/sub em processo (asyncio) alimentado pelo socket local.
+
+    Cada assinante recebe uma asyncio.Queue limitada; se ela encher, os ticks
+    mais novos são descartados para esse assinante (e recuperados pelo
+    catch-up do Cassandra). Sem ticks chegando, nada roda.
+    """
+
+    def __init__(self, tamanho_fila=10_000):
+        self.tamanho_fila = tamanho_fila
+        self.assinantes = set()
+        self.publicadores = 0
+        self.recebidos = 0
+        self.descartados = 0
+        self._servidor = None
+
+    def assinar(self):
+        fila = asyncio.Queue(maxsize=self.tamanho_fila)
+        self.assinantes.add(fila)
+        return fila
+
+    def cancelar(self, fila):
+        self.assinantes.discard(fila)
+
+    def publicar(self, tick):
+        self.recebidos += 1
+        for fila in self.assinantes:
+            try:
+                fila.put_nowait(tick)
+            except asyncio.QueueFull:
+                self.descartados += 1
+
+    async def _atender(self, leitor, escritor):
+        self.publicadores += 1
+        try:
+            while True:
+                linha = await leitor.readline()
+                if not linha:
+                    break
+                try:
+                    tick = mensagem_para_tick(linha)
+                except ValueError as e:
+                    print(f"Mensagem inválida no barramento de ticks: {e}")
+                    continue
+                self.publicar(tick)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.publicadores -= 1
+            escritor.close()
+
+    async def servir(self, host=None, porta=None):
+        padrao_host, padrao_porta = endereco_barramento()
+        self._servidor = await asyncio.start_server(self._atender, host or padrao_host, porta or padrao_porta)
+        print(f"Barramento de ticks ouvindo em {host or padrao_host}:{porta or padrao_porta}.")
+        return self._servidor
+
+    def fechar(self):
+        if self._servidor is not None:
+            self._servidor.close()
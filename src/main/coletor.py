@@ -0,0 +1,345 @@
+import os
+import sys
+import math
+import uuid
+import signal
+import asyncio
+import datetime
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Permite executar o script diretamente (python src/main/coletor.py)
+RAIZ_PROJETO = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if RAIZ_PROJETO not in sys.path:
+    sys.path.insert(0, RAIZ_PROJETO)
+
+from src.collection.order_book import LivroOfertasLocal, FonteBinance
+from src.collection.liquidez import colunas_liquidez
+from src.main.worker_binance import WorkerBinance, BASE_URL_BINANCE
+from src.main.barramento_ticks import PublicadorTicks
+from src.storage.metricas import REGISTRO, MIDIA_PROMETHEUS, profiler_do_ambiente
+
+# Intervalo (s) entre coletas do daemon e níveis do snapshot do livro por símbolo
+INTERVALO_PADRAO = 1.0
+LIMITE_LIVRO_PADRAO = 100
+# Orçamento de peso por minuto da Binance e peso de /api/v3/depth por faixa de `limit`
+PESO_POR_MINUTO = 6000
+PESOS_PROFUNDIDADE = ((100, 5), (500, 25), (1000, 50), (5000, 250))
+PESO_PRECOS = 4
+
+_DURACAO_CICLO = REGISTRO.histograma('btc_coletor_ciclo_segundos', 'Duração de um ciclo de coleta (todos os símbolos)')
+_TICKS = REGISTRO.contador('btc_coletor_ticks_coletados_total', 'Ticks coletados pelo coletor')
+_ERROS = REGISTRO.contador('btc_coletor_erros_total', 'Falhas ao coletar um símbolo ou gravar um lote')
+_CICLOS_PERDIDOS = REGISTRO.contador('btc_coletor_ciclos_perdidos_total',
+                                     'Ciclos pulados porque a coleta anterior demorou mais que o intervalo')
+
+
+def peso_por_minuto(n_symbols, intervalo, limite_livro):
+    """Peso estimado da coleta por snapshots (preços em uma requisição + um depth por símbolo)."""
+    peso_livro = next((peso for limite, peso in PESOS_PROFUNDIDADE if limite_livro <= limite), PESOS_PROFUNDIDADE[-1][1])
+    return (60 / intervalo) * (PESO_PRECOS + n_symbols * peso_livro)
+
+
+def linha_tick(symbol, momento, preco, volume_compras, volume_vendas, liquidez=None):
+    """Linha da tabela de ticks (ver EscritorCassandra.inserir); métricas NaN do livro viram null."""
+    linha = {
+        'symbol': symbol,
+        'dia': momento.date(),
+        'dia_tempo': momento,
+        'id': uuid.uuid4(),
+        'valor': preco,
+        'volume_buy': volume_compras,
+        'volume_sell': volume_vendas,
+    }
+    if liquidez:
+        for coluna in colunas_liquidez():
+            valor = liquidez.get(coluna)
+            # NaN (ex.: livro raso demais para o slippage) vira null
+            linha[coluna] = valor if valor is not None and not math.isnan(valor) else None
+    return linha
+
+
+class SinkTicks:
+    """
+    Destino único dos ticks coletados: o EscritorCassandra (lotes por
+    partição, assíncronos) e, com as linhas já numeradas, o barramento do
+    server.py. Qualquer um dos dois pode ser None; erros ao enfileirar uma
+    linha vão para `ao_erro(excecao)` e não interrompem as demais.
+    """
+
+    def __init__(self, escritor=None, publicador=None, ao_erro=None):
+        self.escritor = escritor
+        self.publicador = publicador
+        self.ao_erro = ao_erro
+
+    def gravar(self, linhas):
+        for linha in linhas:
+            try:
+                if self.escritor:
+                    linha = self.escritor.inserir(linha)
+                if self.publicador:
+                    self.publicador.publicar(linha)
+            except Exception as e:
+                _ERROS.incrementar()
+                print(f"Erro ao gravar o tick de {linha['symbol']}: {type(e).__name__} - {e}")
+                if self.ao_erro:
+                    self.ao_erro(e)
+
+    def fechar(self):
+        if self.escritor:
+            self.escritor.fechar()
+        if self.publicador:
+            self.publicador.fechar()
+
+
+class Coletor:
+    """
+    Coleta de ticks de vários símbolos em asyncio, sem interface gráfica.
+
+    A cada ciclo os preços de todos os símbolos vêm de uma única requisição e
+    os livros são lidos em paralelo (livro local pelo stream de diffs, se
+    houver, ou snapshot de `limite_livro` níveis). As chamadas HTTP usam a
+    session e o pool de threads de um WorkerBinance compartilhado, e as
+    gravações vão em ordem para o `sink` pela thread de escrita do worker.
+
+    Com `intervalo=None` não há coleta periódica: cada `solicitar()` dispara
+    um ciclo (é assim que o BitcoinRelator usa o coletor). `ao_tick(linha,
+    liquidez)` e `ao_erro(symbol, excecao)` (symbol None: falha nos preços)
+    são chamados no loop do coletor.
+    """
+
+    def __init__(self, symbols, worker, sink=None, intervalo=INTERVALO_PADRAO, limite_livro=LIMITE_LIVRO_PADRAO,
+                 livros=None, ao_tick=None, ao_erro=None):
+        self.symbols = list(symbols)
+        self.worker = worker
+        self.sink = sink
+        self.intervalo = intervalo
+        self.limite_livro = limite_livro
+        self.livros = dict(livros or {})
+        self.ao_tick = ao_tick
+        self.ao_erro = ao_erro
+        self.ciclos = 0
+        self.loop = None
+        self._acordar = None
+        self._parando = False
+        self._pronto = threading.Event()
+        self._thread = None
+
+    def iniciar_livros(self):
+        """
+        Um livro local por símbolo (stream de diffs), com a session HTTP do
+        worker e a mesma profundidade (`limite_livro`) do snapshot por REST.
+        """
+        for symbol in self.symbols:
+            if symbol not in self.livros:
+                fonte = FonteBinance(symbol, base_url=self.worker.base_url, session=self.worker.session,
+                                     limite_snapshot=self.limite_livro)
+                self.livros[symbol] = LivroOfertasLocal(fonte).iniciar()
+
+    def _notificar_erro(self, symbol, excecao):
+        _ERROS.incrementar()
+        print(f"Erro ao coletar {symbol or 'os preços'}: {type(excecao).__name__} - {excecao}")
+        if self.ao_erro:
+            self.ao_erro(symbol, excecao)
+
+    async def coletar(self):
+        """Um ciclo: coleta todos os símbolos, grava no sink e retorna as linhas."""
+        loop = asyncio.get_running_loop()
+        inicio = loop.time()
+        momento = datetime.datetime.now()
+        tarefas = [loop.run_in_executor(self.worker.executor, self.worker.obter_precos, self.symbols)]
+        tarefas += [loop.run_in_executor(self.worker.executor, self.worker.volumes_do_livro,
+                                         symbol, self.livros.get(symbol), self.limite_livro)
+                    for symbol in self.symbols]
+        precos, *livros = await asyncio.gather(*tarefas, return_exceptions=True)
+        if isinstance(precos, Exception):
+            self._notificar_erro(None, precos)
+            return []
+
+        linhas, liquidezes = [], []
+        for symbol, livro in zip(self.symbols, livros):
+            if isinstance(livro, Exception) or symbol not in precos:
+                self._notificar_erro(symbol, livro if isinstance(livro, Exception) else KeyError(symbol))
+                continue
+            volume_compras, volume_vendas, liquidez = livro
+            linhas.append(linha_tick(symbol, momento, precos[symbol], volume_compras, volume_vendas, liquidez))
+            liquidezes.append(liquidez)
+
+        if self.sink and linhas:
+            # Espera a gravação: se o Cassandra segurar (backpressure), o próximo ciclo atrasa
+            await loop.run_in_executor(self.worker.executor_escrita, self.sink.gravar, linhas)
+        _TICKS.incrementar(len(linhas))
+        _DURACAO_CICLO.observar(loop.time() - inicio)
+        self.ciclos += 1
+        if self.ao_tick:
+            for linha, liquidez in zip(linhas, liquidezes):
+                self.ao_tick(linha, liquidez)
+        return linhas
+
+    async def executar(self):
+        """Laço de coleta até `parar()`; o ciclo em andamento sempre termina (e grava) antes de sair."""
+        self.loop = asyncio.get_running_loop()
+        self._acordar = asyncio.Event()
+        if self.intervalo is not None:
+            self._acordar.set()
+        self._pronto.set()
+        proximo = self.loop.time()
+        while True:
+            espera = None if self.intervalo is None else max(0.0, proximo - self.loop.time())
+            try:
+                await asyncio.wait_for(self._acordar.wait(), timeout=espera)
+            except asyncio.TimeoutError:
+                pass
+            self._acordar.clear()
+            if self._parando:
+                break
+            try:
+                await self.coletar()
+            except Exception as e:
+                _ERROS.incrementar()
+                print(f"Erro no ciclo de coleta: {type(e).__name__} - {e}")
+            if self.intervalo is not None:
+                proximo += self.intervalo
+                agora = self.loop.time()
+                if proximo < agora:
+                    # Não acumula atraso: pula os ciclos perdidos e segue a grade a partir de agora
+                    perdidos = int((agora - proximo) // self.intervalo) + 1
+                    _CICLOS_PERDIDOS.incrementar(perdidos)
+                    proximo += perdidos * self.intervalo
+
+    def solicitar(self):
+        """Pede um ciclo de coleta imediato (pode ser chamado de qualquer thread)."""
+        self._pronto.wait()
+        self.loop.call_soon_threadsafe(self._acordar.set)
+
+    def parar(self):
+        """Encerra o laço após o ciclo em andamento (pode ser chamado de qualquer thread)."""
+        self._parando = True
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self._acordar.set)
+
+    def iniciar_thread(self):
+        """Roda o coletor em um loop asyncio próprio, em uma thread (uso a partir do Tkinter)."""
+        self._thread = threading.Thread(target=lambda: asyncio.run(self.executar()), daemon=True, name='coletor')
+        self._thread.start()
+        self._pronto.wait()
+        return self
+
+    def parar_thread(self):
+        self.parar()
+        if self._thread is not None:
+            self._thread.join()
+
+    def parar_livros(self):
+        for livro in self.livros.values():
+            livro.parar()
+
+
+def servir_metricas(porta):
+    """GET /metrics do coletor (formato Prometheus) em uma thread."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != '/metrics':
+                self.send_error(404)
+                return
+            corpo = REGISTRO.exportar().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', MIDIA_PROMETHEUS)
+            self.send_header('Content-Length', str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer(('0.0.0.0', porta), Handler)
+    threading.Thread(target=servidor.serve_forever, daemon=True, name='metricas').start()
+    return servidor
+
+
+def conectar_cassandra(hosts, keyspace):
+    from cassandra.cluster import Cluster
+
+    cluster = Cluster(hosts)
+    session = cluster.connect()
+    session.execute(f"""
+        CREATE KEYSPACE IF NOT EXISTS {keyspace}
+        WITH replication = {{ 'class': 'SimpleStrategy', 'replication_factor': '1' }}
+    """)
+    session.set_keyspace(keyspace)
+    return cluster, session
+
+
+async def executar_daemon(coletor):
+    loop = asyncio.get_running_loop()
+    for sinal in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sinal, coletor.parar)
+        except NotImplementedError:
+            pass  # Windows: o KeyboardInterrupt encerra o asyncio.run
+    await coletor.executar()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Coletor de ticks sem interface: vários símbolos, gravação em lote no Cassandra."
+    )
+    parser.add_argument('--symbols', nargs='+', default=['BTCUSDT'])
+    parser.add_argument('--intervalo', type=float, default=INTERVALO_PADRAO, help="Segundos entre coletas (ex.: 0.5).")
+    parser.add_argument('--limite-livro', type=int, default=LIMITE_LIVRO_PADRAO,
+                        help="Níveis do snapshot do livro por símbolo.")
+    parser.add_argument('--stream', action='store_true',
+                        help="Mantém um livro local por símbolo pelo stream de diffs (sem snapshots a cada ciclo).")
+    parser.add_argument('--hosts', nargs='+', default=os.environ.get('BTC_CASSANDRA_HOSTS', '127.0.0.1').split(','))
+    parser.add_argument('--keyspace', default='btc')
+    parser.add_argument('--sem-cassandra', action='store_true')
+    parser.add_argument('--sem-barramento', action='store_true', help="Não publica os ticks no server.py.")
+    parser.add_argument('--porta-metricas', type=int, help="Serve GET /metrics nesta porta.")
+    parser.add_argument('--base-url', default=BASE_URL_BINANCE)
+    args = parser.parse_args()
+
+    symbols = [symbol.upper() for symbol in args.symbols]
+    if not args.stream:
+        peso = peso_por_minuto(len(symbols), args.intervalo, args.limite_livro)
+        if peso > PESO_POR_MINUTO:
+            print(f"Aviso: ~{peso:.0f} de peso por minuto, acima do limite de {PESO_POR_MINUTO} da Binance; "
+                  f"use --stream, um --intervalo maior ou um --limite-livro menor.")
+
+    # Uma session HTTP e um pool de threads para todos os símbolos
+    worker = WorkerBinance(symbol=symbols[0], base_url=args.base_url, max_workers=min(32, len(symbols) + 1))
+    cluster = escritor = None
+    if not args.sem_cassandra:
+        # Importado aqui: o coletor também roda só publicando no barramento
+        from src.storage.cassandra_ingest import EscritorCassandra
+
+        cluster, session = conectar_cassandra(args.hosts, args.keyspace)
+        escritor = EscritorCassandra(session, colunas_extra=colunas_liquidez())
+    sink = SinkTicks(escritor, None if args.sem_barramento else PublicadorTicks())
+    coletor = Coletor(symbols, worker, sink, intervalo=args.intervalo, limite_livro=args.limite_livro)
+    if args.stream:
+        coletor.iniciar_livros()
+    if args.porta_metricas:
+        servir_metricas(args.porta_metricas)
+    profiler = profiler_do_ambiente()
+
+    print(f"Coletando {', '.join(symbols)} a cada {args.intervalo}s (Ctrl+C para encerrar)...")
+    try:
+        asyncio.run(executar_daemon(coletor))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print("Encerrando: aguardando as gravações pendentes...")
+        coletor.parar_livros()
+        worker.encerrar()
+        sink.fechar()
+        if cluster:
+            cluster.shutdown()
+        if profiler:
+            profiler.parar()
+            profiler.salvar('coletor_perfil.txt')
+        print(f"Coletor encerrado após {coletor.ciclos} ciclos.")
+
+
+if __name__ == '__main__':
+    main()
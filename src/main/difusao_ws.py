@@ -0,0 +1,148 @@
+import os
+import json
+import time
+import asyncio
+from collections import deque
+
+from src.main.formato_binario import codificar_mensagem
+
+# Políticas para clientes lentos (fila cheia):
+#   descartar_antigas - remove a mensagem mais antiga da fila para caber a nova
+#   coalescer         - esvazia a fila e mantém só a última mensagem (o cliente
+#                       perde os pontos intermediários, mas volta ao tempo real)
+#   desconectar       - fecha a conexão do cliente (código 1013, "tente mais tarde")
+POLITICAS = ('descartar_antigas', 'coalescer', 'desconectar')
+POLITICA_PADRAO = os.environ.get('BTC_WS_POLITICA', 'descartar_antigas')
+TAMANHO_FILA_CLIENTE = 256
+TIMEOUT_ENVIO = 10.0
+
+
+class ClienteWS:
+    """Uma conexão WebSocket com sua fila limitada e sua tarefa de envio."""
+
+    def __init__(self, websocket, tamanho_fila, binario=False):
+        self.websocket = websocket
+        self.binario = binario
+        self.fila = asyncio.Queue(maxsize=tamanho_fila)
+        self.tarefa = None
+        self.descartadas = 0
+
+
+class ConnectionManager:
+    """
+    Fan-out das mensagens do streaming para os clientes WebSocket.
+
+    Cada mensagem é serializada uma única vez por formato (JSON, ou o
+    binário de formato_binario para quem conectou com ?format=bin) e colocada
+    na fila de cada cliente; uma tarefa por cliente esvazia a sua fila. Um cliente lento ou
+    morto só atrasa a si mesmo: quando a fila dele enche, vale a `politica`
+    (ver POLITICAS), e um envio que passa de `timeout_envio` segundos ou falha
+    desconecta o cliente. `metricas()` informa profundidade das filas,
+    contadores e latência de envio (p50/p99/máx).
+    """
+
+    def __init__(self, politica=POLITICA_PADRAO, tamanho_fila=TAMANHO_FILA_CLIENTE, timeout_envio=TIMEOUT_ENVIO):
+        if politica not in POLITICAS:
+            raise ValueError(f"Política inválida: {politica} (use {', '.join(POLITICAS)})")
+        self.politica = politica
+        self.tamanho_fila = tamanho_fila
+        self.timeout_envio = timeout_envio
+        self.clientes = {}
+        self.enfileiradas = 0
+        self.enviadas = 0
+        self.descartadas = 0
+        self.desconectados_lentos = 0
+        self.falhas_envio = 0
+        self.latencias = deque(maxlen=1000)
+        self._fechamentos = set()
+
+    async def connect(self, websocket, binario=False):
+        await websocket.accept()
+        cliente = ClienteWS(websocket, self.tamanho_fila, binario)
+        cliente.tarefa = asyncio.create_task(self._enviar(cliente))
+        self.clientes[websocket] = cliente
+
+    def disconnect(self, websocket):
+        cliente = self.clientes.pop(websocket, None)
+        if cliente is not None:
+            cliente.tarefa.cancel()
+
+    async def _enviar(self, cliente):
+        try:
+            while True:
+                mensagem = await cliente.fila.get()
+                inicio = time.perf_counter()
+                envio = cliente.websocket.send_bytes if cliente.binario else cliente.websocket.send_text
+                await asyncio.wait_for(envio(mensagem), self.timeout_envio)
+                self.latencias.append((time.perf_counter() - inicio) * 1000)
+                self.enviadas += 1
+        except Exception as e:
+            # Envio falhou ou estourou o tempo: o cliente sai sem afetar os outros
+            self.falhas_envio += 1
+            print(f"Falha ao enviar para um cliente WebSocket ({type(e).__name__}); desconectando.")
+            self.clientes.pop(cliente.websocket, None)
+            await self._fechar(cliente.websocket)
+
+    async def _fechar(self, websocket, codigo=1013):
+        try:
+            await asyncio.wait_for(websocket.close(code=codigo), self.timeout_envio)
+        except Exception:
+            pass  # A conexão já pode estar fechada
+
+    def _enfileirar(self, cliente, mensagem):
+        try:
+            cliente.fila.put_nowait(mensagem)
+            return
+        except asyncio.QueueFull:
+            pass
+        if self.politica == 'desconectar':
+            self.desconectados_lentos += 1
+            self.disconnect(cliente.websocket)
+            # O fechamento roda à parte: o broadcast não espera pelo cliente lento
+            tarefa = asyncio.create_task(self._fechar(cliente.websocket))
+            self._fechamentos.add(tarefa)
+            tarefa.add_done_callback(self._fechamentos.discard)
+            return
+        if self.politica == 'coalescer':
+            descartadas = cliente.fila.qsize()
+            while not cliente.fila.empty():
+                cliente.fila.get_nowait()
+        else:
+            descartadas = 1
+            cliente.fila.get_nowait()
+        cliente.descartadas += descartadas
+        self.descartadas += descartadas
+        cliente.fila.put_nowait(mensagem)
+
+    async def broadcast_json(self, data: dict):
+        if not data or not data.get("points"):
+            return
+        # Serializa uma vez por formato para todos os clientes
+        mensagens = {}
+        for cliente in list(self.clientes.values()):
+            message = mensagens.get(cliente.binario)
+            if message is None:
+                message = codificar_mensagem(data) if cliente.binario else json.dumps(data)
+                mensagens[cliente.binario] = message
+            self._enfileirar(cliente, message)
+        self.enfileiradas += 1
+
+    def metricas(self):
+        profundidades = [cliente.fila.qsize() for cliente in self.clientes.values()]
+        ordenadas = sorted(self.latencias)
+        metricas = {
+            'politica': self.politica,
+            'clientes': len(profundidades),
+            'profundidade_max': max(profundidades, default=0),
+            'profundidade_total': sum(profundidades),
+            'mensagens': self.enfileiradas,
+            'enviadas': self.enviadas,
+            'descartadas': self.descartadas,
+            'desconectados_lentos': self.desconectados_lentos,
+            'falhas_envio': self.falhas_envio,
+        }
+        if ordenadas:
+            metricas['envio_p50_ms'] = ordenadas[len(ordenadas) // 2]
+            metricas['envio_p99_ms'] = ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * 0.99))]
+            metricas['envio_max_ms'] = ordenadas[-1]
+        return metricas
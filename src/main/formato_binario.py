@@ -0,0 +1,91 @@
+import json
+import zlib
+import struct
+
+import numpy as np
+
+# Formato binário colunar das séries (histórico e mensagens do /ws).
+#
+#   prefixo (8 bytes): b'BTC1', flags (u8), 3 bytes zerados
+#   corpo (comprimido com zlib se flags & COMPRIMIDO):
+#     n (u32), tamanho do meta (u32), meta em JSON (utf-8), preenchimento até múltiplo de 8
+#     tempos: t0 (f64) + n-1 deltas em ms (i32), preenchimento até múltiplo de 8
+#             (ou n tempos absolutos em f64 se flags & TEMPOS_ABSOLUTOS)
+#     valores: n float64
+#
+# Tudo little-endian e alinhado em 8 bytes: o navegador lê os arrays com
+# Float64Array/Int32Array direto do buffer (ver src/web/js/serie_binaria.js).
+MIDIA_BINARIA = 'application/vnd.btc.serie'
+MAGICO = b'BTC1'
+COMPRIMIDO = 1
+TEMPOS_ABSOLUTOS = 2
+# Corpos menores que isso não compensam a compressão
+LIMIAR_COMPRESSAO = 16 * 1024
+# Nível 1: quase a mesma taxa que o 6 em floats, em 1/3 do tempo
+NIVEL_COMPRESSAO = 1
+
+_I32_MIN, _I32_MAX = np.iinfo(np.int32).min, np.iinfo(np.int32).max
+
+
+def _preenchimento(tamanho):
+    return b'\0' * (-tamanho % 8)
+
+
+def aceita_binario(accept):
+    """True se o cabeçalho Accept pede o formato binário."""
+    return MIDIA_BINARIA in (accept or '')
+
+
+def codificar_serie(tempos, valores, meta=None, comprimir=None):
+    """(tempos em ms, valores) -> bytes no formato binário; `comprimir=None` decide pelo tamanho."""
+    t = np.asarray(tempos, dtype=np.int64)
+    v = np.asarray(valores, dtype='<f8')
+    meta = json.dumps(meta or {}).encode('utf-8')
+    flags = 0
+    partes = [struct.pack('<II', len(t), len(meta)), meta, _preenchimento(8 + len(meta))]
+    deltas = np.diff(t)
+    if len(deltas) and (deltas.min() < _I32_MIN or deltas.max() > _I32_MAX):
+        # Saltos maiores que ~24 dias não cabem em i32
+        flags |= TEMPOS_ABSOLUTOS
+        partes.append(t.astype('<f8').tobytes())
+    else:
+        delta_bytes = deltas.astype('<i4').tobytes()
+        partes += [struct.pack('<d', float(t[0]) if len(t) else 0.0), delta_bytes, _preenchimento(len(delta_bytes))]
+    partes.append(v.tobytes())
+    corpo = b''.join(partes)
+    if comprimir is None:
+        comprimir = len(corpo) >= LIMIAR_COMPRESSAO
+    if comprimir:
+        corpo = zlib.compress(corpo, NIVEL_COMPRESSAO)
+        flags |= COMPRIMIDO
+    return MAGICO + bytes((flags, 0, 0, 0)) + corpo
+
+
+def decodificar_serie(dados):
+    """Inverso de codificar_serie: retorna (meta, tempos int64, valores float64)."""
+    if dados[:4] != MAGICO:
+        raise ValueError("Mensagem não está no formato binário de séries.")
+    flags = dados[4]
+    corpo = zlib.decompress(dados[8:]) if flags & COMPRIMIDO else bytes(dados[8:])
+    n, tamanho_meta = struct.unpack_from('<II', corpo)
+    meta = json.loads(corpo[8:8 + tamanho_meta])
+    pos = 8 + tamanho_meta
+    pos += -pos % 8
+    if flags & TEMPOS_ABSOLUTOS:
+        tempos = np.frombuffer(corpo, '<f8', n, pos).astype(np.int64)
+        pos += 8 * n
+    else:
+        t0 = struct.unpack_from('<d', corpo, pos)[0]
+        deltas = np.frombuffer(corpo, '<i4', max(n - 1, 0), pos + 8)
+        tempos = (int(t0) + np.r_[0, np.cumsum(deltas, dtype=np.int64)])[:n]
+        pos += 8 + 4 * len(deltas)
+        pos += -pos % 8
+    valores = np.frombuffer(corpo, '<f8', n, pos).astype(np.float64)
+    return meta, tempos, valores
+
+
+def codificar_mensagem(data):
+    """Mensagem do stream ({"table", "points": [{t, value}], "indicators"}) no formato binário."""
+    pontos = data.get("points") or []
+    meta = {chave: valor for chave, valor in data.items() if chave != "points"}
+    return codificar_serie([p["t"] for p in pontos], [p["value"] for p in pontos], meta)
@@ -0,0 +1,118 @@
+import os
+import datetime
+import numpy as np
+import pandas as pd
+
+# Registro de um tick: 48 bytes, sem objetos Python por linha
+DTYPE_TICK = np.dtype([
+    ('seq', '<i8'),
+    ('tempo', '<i8'),  # ms desde a época (horário local, sem fuso)
+    ('preco', '<f8'),
+    ('variacao', '<f8'),
+    ('volume_compras', '<f8'),
+    ('volume_vendas', '<f8'),
+])
+COLUNAS_HISTORICO = ['DateTime', 'Price', 'Change', 'Buy Volume (USD)', 'Sell Volume (USD)']
+_EPOCA = datetime.datetime(1970, 1, 1)
+
+
+def para_ms(momento):
+    return int((momento - _EPOCA) / datetime.timedelta(milliseconds=1))
+
+
+def de_ms(ms):
+    return _EPOCA + datetime.timedelta(milliseconds=int(ms))
+
+
+def _registros_para_dataframe(registros):
+    return pd.DataFrame({
+        'DateTime': registros['tempo'].astype('datetime64[ms]'),
+        'Price': registros['preco'],
+        'Change': registros['variacao'],
+        'Buy Volume (USD)': registros['volume_compras'],
+        'Sell Volume (USD)': registros['volume_vendas'],
+    }, columns=COLUNAS_HISTORICO)
+
+
+class HistoricoTicks:
+    """
+    Histórico de ticks em um buffer circular de tamanho fixo (array estruturado).
+
+    Guarda no máximo `capacidade` ticks; ao encher, o mais antigo é descartado
+    e, se `arquivo_transbordo` for informado, anexado a esse arquivo binário
+    (registros DTYPE_TICK, lidos com `ler_transbordo`). Cada tick recebe um
+    `seq` crescente, usado como id da linha na interface.
+
+    O arquivo guarda uma única sessão: é truncado no primeiro transbordo e de
+    novo após `limpar()`, que recomeça o `seq`.
+    """
+
+    def __init__(self, capacidade=100_000, arquivo_transbordo=None):
+        self.capacidade = capacidade
+        self.arquivo_transbordo = arquivo_transbordo
+        self.registros = np.zeros(capacidade, dtype=DTYPE_TICK)
+        self.inicio = 0
+        self.tamanho = 0
+        self.total = 0
+        self._transbordo = None
+
+    def __len__(self):
+        return self.tamanho
+
+    def adicionar(self, momento, preco, variacao, volume_compras, volume_vendas):
+        """Acrescenta um tick; retorna o `seq` do tick descartado, ou None."""
+        descartado = None
+        if self.tamanho == self.capacidade:
+            antigo = self.registros[self.inicio]
+            descartado = int(antigo['seq'])
+            self._transbordar(antigo)
+            posicao = self.inicio
+            self.inicio = (self.inicio + 1) % self.capacidade
+        else:
+            posicao = (self.inicio + self.tamanho) % self.capacidade
+            self.tamanho += 1
+        self.total += 1
+        self.registros[posicao] = (self.total, para_ms(momento), preco, variacao, volume_compras, volume_vendas)
+        return descartado
+
+    def _transbordar(self, registro):
+        if not self.arquivo_transbordo:
+            return
+        if self._transbordo is None:
+            os.makedirs(os.path.dirname(self.arquivo_transbordo) or '.', exist_ok=True)
+            self._transbordo = open(self.arquivo_transbordo, 'wb')
+        self._transbordo.write(registro.tobytes())
+
+    def ordenados(self, ultimos=None):
+        """Cópia dos registros do mais antigo ao mais novo (ou só os `ultimos`)."""
+        quantidade = self.tamanho if ultimos is None else min(ultimos, self.tamanho)
+        indices = (self.inicio + np.arange(self.tamanho - quantidade, self.tamanho)) % self.capacidade
+        return self.registros[indices]
+
+    def ultimo(self):
+        """Último tick como (momento, preco, variacao, volume_compras, volume_vendas), ou None."""
+        if not self.tamanho:
+            return None
+        registro = self.registros[(self.inicio + self.tamanho - 1) % self.capacidade]
+        return (de_ms(registro['tempo']), float(registro['preco']), float(registro['variacao']),
+                float(registro['volume_compras']), float(registro['volume_vendas']))
+
+    def para_dataframe(self):
+        return _registros_para_dataframe(self.ordenados())
+
+    def limpar(self):
+        self.inicio = 0
+        self.tamanho = 0
+        self.total = 0
+        # O próximo transbordo reabre (e trunca) o arquivo
+        self.fechar()
+
+    def fechar(self):
+        if self._transbordo is not None:
+            self._transbordo.close()
+            self._transbordo = None
+
+
+def ler_transbordo(caminho):
+    """Lê os ticks descartados do buffer e gravados em disco, como DataFrame."""
+    return _registros_para_dataframe(np.fromfile(caminho, dtype=DTYPE_TICK))
@@ -0,0 +1,153 @@
+import os
+import time
+import datetime
+import numpy as np
+
+from src.main.historico_ticks import DTYPE_TICK, para_ms
+
+CABECALHO_CSV = "DateTime,Price,Change (%),Buy Volume (USD),Sell Volume (USD)\n"
+POLITICAS_FSYNC = ('nunca', 'lote', 'sempre')
+
+
+def _recuperar_final(caminho, tamanho_registro=None):
+    """
+    Descarta um registro incompleto no fim do arquivo (ex.: queda no meio de
+    uma escrita): para CSV corta até a última quebra de linha, para o binário
+    até o último registro inteiro.
+    """
+    if not os.path.exists(caminho):
+        return
+    tamanho = os.path.getsize(caminho)
+    if tamanho_registro:
+        valido = tamanho - tamanho % tamanho_registro
+    else:
+        with open(caminho, 'rb') as f:
+            f.seek(max(0, tamanho - 65536))
+            final = f.read()
+        if not final or final.endswith(b'\n'):
+            return
+        valido = tamanho - len(final) + final.rfind(b'\n') + 1
+    if valido != tamanho:
+        print(f"Registro incompleto descartado no fim de {caminho} ({tamanho - valido} bytes).")
+        with open(caminho, 'r+b') as f:
+            f.truncate(valido)
+
+
+class EscritorHistorico:
+    """
+    Grava o histórico de ticks em modo somente-anexar, com custo constante por tick.
+
+    Os registros ficam em buffer e são gravados em lote a cada `registros_por_lote`
+    ticks ou `intervalo_flush` segundos. `fsync` controla a durabilidade: 'nunca'
+    (o sistema operacional decide), 'lote' (a cada gravação em lote) ou 'sempre'
+    (a cada tick). O arquivo é rotacionado (renomeado com data e hora) ao passar
+    de `tamanho_max_bytes` ou de `intervalo_rotacao` segundos. Com `binario=True`
+    também grava um .bin ao lado do CSV, com registros DTYPE_TICK de 48 bytes.
+    """
+
+    def __init__(self, caminho, binario=False, registros_por_lote=20, intervalo_flush=5.0, fsync='lote',
+                 tamanho_max_bytes=64 * 1024 * 1024, intervalo_rotacao=None, sobrescrever=False):
+        if fsync not in POLITICAS_FSYNC:
+            raise ValueError(f"Política de fsync inválida: {fsync} (use {', '.join(POLITICAS_FSYNC)})")
+        self.caminho = caminho
+        self.caminho_binario = os.path.splitext(caminho)[0] + '.bin' if binario else None
+        self.registros_por_lote = registros_por_lote
+        self.intervalo_flush = intervalo_flush
+        self.fsync = fsync
+        self.tamanho_max_bytes = tamanho_max_bytes
+        self.intervalo_rotacao = intervalo_rotacao
+        self.seq = 0
+        self._linhas = []
+        self._registros = []
+        self._ultimo_flush = time.monotonic()
+        if sobrescrever:
+            for caminho in (self.caminho, self.caminho_binario):
+                if caminho and os.path.exists(caminho):
+                    os.remove(caminho)
+        self._abrir()
+
+    def _abrir(self):
+        os.makedirs(os.path.dirname(self.caminho) or '.', exist_ok=True)
+        _recuperar_final(self.caminho)
+        self._csv = open(self.caminho, 'a', newline='', encoding='utf-8')
+        if self._csv.tell() == 0:
+            self._csv.write(CABECALHO_CSV)
+        self._binario = None
+        if self.caminho_binario:
+            _recuperar_final(self.caminho_binario, DTYPE_TICK.itemsize)
+            self._binario = open(self.caminho_binario, 'ab')
+            if self.seq == 0 and self._binario.tell():
+                # Continua a sequência do último registro de um arquivo já existente
+                self.seq = int(np.fromfile(self.caminho_binario, dtype=DTYPE_TICK,
+                                           offset=self._binario.tell() - DTYPE_TICK.itemsize)['seq'][0])
+        self._aberto_em = time.monotonic()
+
+    def escrever(self, momento, preco, variacao, volume_compras, volume_vendas):
+        self.seq += 1
+        self._linhas.append(f"{momento:%Y-%m-%d %H:%M:%S},{preco},{variacao},{volume_compras},{volume_vendas}\n")
+        if self._binario is not None:
+            self._registros.append((self.seq, para_ms(momento), preco, variacao, volume_compras, volume_vendas))
+        if (self.fsync == 'sempre' or len(self._linhas) >= self.registros_por_lote
+                or time.monotonic() - self._ultimo_flush >= self.intervalo_flush):
+            self.flush()
+
+    def escrever_lote(self, registros):
+        """Grava vários ticks (momento, preco, variacao, volume_compras, volume_vendas) de uma vez."""
+        for registro in registros:
+            self.seq += 1
+            self._linhas.append(f"{registro[0]:%Y-%m-%d %H:%M:%S},{registro[1]},{registro[2]},{registro[3]},{registro[4]}\n")
+            if self._binario is not None:
+                self._registros.append((self.seq, para_ms(registro[0])) + tuple(registro[1:]))
+        self.flush()
+
+    def flush(self):
+        self._gravar_buffer(self.fsync != 'nunca')
+        self._rotacionar_se_preciso()
+
+    def _gravar_buffer(self, sincronizar):
+        if self._linhas:
+            self._csv.write(''.join(self._linhas))
+            self._linhas = []
+        self._csv.flush()
+        if self._binario is not None:
+            if self._registros:
+                self._binario.write(np.array(self._registros, dtype=DTYPE_TICK).tobytes())
+                self._registros = []
+            self._binario.flush()
+        if sincronizar:
+            os.fsync(self._csv.fileno())
+            if self._binario is not None:
+                os.fsync(self._binario.fileno())
+        self._ultimo_flush = time.monotonic()
+
+    def _rotacionar_se_preciso(self):
+        excedeu_tamanho = self.tamanho_max_bytes and self._csv.tell() >= self.tamanho_max_bytes
+        excedeu_tempo = self.intervalo_rotacao and time.monotonic() - self._aberto_em >= self.intervalo_rotacao
+        if excedeu_tamanho or excedeu_tempo:
+            self.rotacionar()
+
+    def rotacionar(self):
+        """Fecha os arquivos atuais, renomeia com a data e hora e começa arquivos novos."""
+        self._fechar_arquivos()
+        sufixo = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+        base = os.path.splitext(self.caminho)[0]
+        # Duas rotações no mesmo segundo não podem sobrescrever a anterior
+        contador = 1
+        while os.path.exists(f"{base}_{sufixo}.csv") or os.path.exists(f"{base}_{sufixo}.bin"):
+            contador += 1
+            sufixo = f"{datetime.datetime.now():%Y%m%d_%H%M%S}_{contador}"
+        for caminho in (self.caminho, self.caminho_binario):
+            if caminho and os.path.exists(caminho):
+                extensao = os.path.splitext(caminho)[1]
+                os.replace(caminho, f"{base}_{sufixo}{extensao}")
+        print(f"Histórico rotacionado: {self.caminho} ({sufixo}).")
+        self._abrir()
+
+    def _fechar_arquivos(self):
+        self._csv.close()
+        if self._binario is not None:
+            self._binario.close()
+
+    def fechar(self):
+        self._gravar_buffer(sincronizar=True)
+        self._fechar_arquivos()
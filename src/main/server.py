@@ -4,157 +4,439 @@ os.environ['CASS_DRIVER_GEVENT_PATCH'] = 'true'
 
 import asyncio
 import json
+import base64
+import hashlib
 import datetime
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
-from fastapi.responses import HTMLResponse
+import numpy as np
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import HTMLResponse, JSONResponse, Response, PlainTextResponse
 from cassandra.cluster import Cluster
 from cassandra.protocol import SyntaxException
+from src.analysis.indicadores_streaming import ConjuntoIndicadores
+from src.analysis.reducao_serie import reduzir
+from src.analysis.candles import AgregadorCandles, RESOLUCOES_PADRAO
+from src.storage.serie_temporal import (
+    SYMBOL_PADRAO, CursorTicks, criar_esquema, nome_tabela_legado, dia_da_tabela_legado, para_ms, de_ms,
+    dias_no_intervalo,
+)
+from src.storage.cache_dias import CacheDias
+from src.storage.tabela_candles import (
+    CONSULTA_CANDLE, criar_esquema_candles, parametros_candle, consultas_intervalo, candle_da_linha,
+)
+from src.storage.cassandra_async import (
+    SessaoAssincrona, ler_pagina, HOSTS_CASSANDRA, THREADS_DRIVER, FETCH_SIZE, TIMEOUT_CONSULTA,
+)
+from src.main.barramento_ticks import BarramentoTicks
+from src.main.difusao_ws import ConnectionManager
+from src.main.formato_binario import MIDIA_BINARIA, aceita_binario, codificar_serie
+from src.storage.metricas import REGISTRO, MIDIA_PROMETHEUS, profiler_do_ambiente
 
 app = FastAPI()
 
 # --- Configuração do Cassandra ---
+# SessaoAssincrona: nenhuma consulta bloqueia o loop do servidor
 cassandra_session = None
 
+# --- Barramento de ticks (push do coletor) ---
+barramento = BarramentoTicks()
+# Catch-up no Cassandra: raro com publicadores conectados, a cada segundo sem eles
+INTERVALO_CATCHUP = 30
+INTERVALO_POLLING = 1
+
+# --- Histórico ---
+# Séries diárias em memória: dias fechados lidos uma vez, o dia atual estendido pelo stream
+cache_dias = CacheDias()
+PONTOS_PADRAO = 2000
+PONTOS_MAX = 20000
+LIMITE_PAGINA_MAX = 50000
+# Dias que um pedido de histórico pode cobrir (cada dia é uma série no cache / uma consulta)
+DIAS_MAX_HISTORICO = 366
+
+# --- Candles ---
+# OHLC 1m/5m/1h/1d mantidos tick a tick; os fechados são gravados na tabela `candles`
+agregador_candles = AgregadorCandles()
+_gravacoes_candles = set()
+CANDLES_MAX = 5000
+
 def connect_to_cassandra():
-    """Conecta ao cluster Cassandra e retorna a sessão."""
-    global cassandra_session
+    """Conecta ao cluster Cassandra e retorna a sessão assíncrona (ver cassandra_async)."""
     try:
-        cluster = Cluster(['127.0.0.1'])
+        cluster = Cluster(HOSTS_CASSANDRA, executor_threads=THREADS_DRIVER)
         session = cluster.connect()
+        session.default_timeout = TIMEOUT_CONSULTA
+        session.default_fetch_size = FETCH_SIZE
         session.execute("""
             CREATE KEYSPACE IF NOT EXISTS btc
             WITH replication = { 'class': 'SimpleStrategy', 'replication_factor': '1' }
         """)
         session.set_keyspace('btc')
+        criar_esquema(session)
+        criar_esquema_candles(session)
         print("Conexão com Cassandra estabelecida com sucesso.")
-        return session
+        return SessaoAssincrona(session)
     except Exception as e:
         print(f"Erro fatal ao conectar com Cassandra: {e}")
         return None
 
 # --- Gerenciamento de Conexões WebSocket ---
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: list[WebSocket] = []
+# Fila limitada e tarefa de envio por cliente (ver difusao_ws)
+manager = ConnectionManager()
 
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
+# --- Métricas (GET /metrics) e profiler opcional (BTC_PROFILER) ---
+ATRASO_STREAMER = REGISTRO.histograma('btc_streamer_atraso_segundos',
+                                      'Tempo do tick no coletor até o broadcast pelo WebSocket')
+REGISTRO.coletor('btc_ws', manager.metricas, 'Fan-out WebSocket (ver /api/metrics/ws)')
+REGISTRO.coletor('btc_cache', cache_dias.metricas, 'Cache de dias (ver /api/metrics/cache)')
+REGISTRO.medidor('btc_barramento_publicadores', 'Coletores conectados ao barramento de ticks',
+                 funcao=lambda: barramento.publicadores)
+REGISTRO.contador('btc_barramento_recebidos_total', 'Ticks recebidos pelo barramento',
+                  funcao=lambda: barramento.recebidos)
+REGISTRO.contador('btc_candles_atrasados_total', 'Ticks antigos demais para corrigir um candle',
+                  funcao=lambda: agregador_candles.atrasados)
+profiler = None
 
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+# --- Lógica de Streaming de Dados ---
+async def _gravar_candles(fechados):
+    try:
+        for resolucao, candle in fechados:
+            await cassandra_session.executar(CONSULTA_CANDLE, parametros_candle(resolucao, candle))
+    except Exception as e:
+        print(f"Erro ao gravar candles no Cassandra: {e}")
 
-    async def broadcast_json(self, data: dict):
-        if not data or not data.get("points"):
-            return
-        message = json.dumps(data)
-        for connection in self.active_connections:
-            await connection.send_text(message)
+def gravar_candles(fechados):
+    """Grava os candles fechados em segundo plano, sem atrasar o broadcast."""
+    if not fechados or not cassandra_session:
+        return
+    tarefa = asyncio.create_task(_gravar_candles(fechados))
+    _gravacoes_candles.add(tarefa)
+    tarefa.add_done_callback(_gravacoes_candles.discard)
 
-manager = ConnectionManager()
+async def aquecer_candles(cursor):
+    """
+    Recria os candles abertos com os ticks de hoje já gravados (reinício do
+    servidor). A leitura passa pelo cursor do streamer, que registra esses
+    ticks: o primeiro catch-up não os entrega (nem os soma aos candles) de
+    novo. Retorna os preços lidos, para aquecer também os indicadores do dia.
+    """
+    try:
+        dia = datetime.date.today()
+        rows = cursor.filtrar(dia, await cassandra_session.executar(*cursor.consulta(dia)))
+        agregador_candles.aquecer([para_ms(row.dia_tempo) for row in rows], [float(row.valor) for row in rows],
+                                  [row.volume_buy for row in rows], [row.volume_sell for row in rows])
+        return [float(row.valor) for row in rows]
+    except Exception as e:
+        print(f"Não foi possível recriar os candles abertos: {e}")
+        return []
 
-# --- Lógica de Streaming de Dados ---
 async def data_streamer():
-    """Verifica novos dados no Cassandra e transmite via WebSocket."""
-    global cassandra_session
-    if not cassandra_session:
-        print("Sessão do Cassandra não está disponível. Tentando reconectar...")
-        cassandra_session = connect_to_cassandra()
-        if not cassandra_session:
-            await asyncio.sleep(5) # Espera antes de tentar novamente
-            return
+    """
+    Transmite via WebSocket os ticks publicados no barramento assim que chegam.
 
-    last_id = 0
+    O Cassandra só é lido como catch-up (ticks de coletores que não publicam ou
+    que se perderam): a cada INTERVALO_CATCHUP segundos com publicadores
+    conectados, ou a cada INTERVALO_POLLING sem nenhum. O cursor descarta os
+    ticks já entregues pelo barramento, e a virada do dia reinicia o cursor e
+    os indicadores. Cada ponto também atualiza os candles (agregador_candles).
+    """
+    global cassandra_session
+    fila = barramento.assinar()
+    # Cursor com janela de sobreposição: correto com vários coletores gravando o mesmo dia
+    cursor = CursorTicks(SYMBOL_PADRAO, colunas=('valor', 'volume_buy', 'volume_sell'))
+    # Indicadores incrementais do dia, atualizados a cada novo ponto
+    indicadores = ConjuntoIndicadores()
+    dia_atual = None
+    if cassandra_session:
+        dia_atual = datetime.date.today()
+        for valor in await aquecer_candles(cursor):
+            indicadores.atualizar(valor)
+    loop = asyncio.get_running_loop()
+    proximo_catchup = 0.0
     while True:
+        pontos = []
         try:
-            now = datetime.datetime.now()
-            table_name = f"btc_{now.strftime('%Y_%m_%d')}"
-            day_partition = now.strftime('%Y-%m-%d')
-
-            # Garante que a tabela do dia exista
-            cassandra_session.execute(f"""CREATE TABLE IF NOT EXISTS {table_name} (
-                day_partition TEXT,
-                sequential_id INT,
-                id UUID,
-                dia_tempo TIMESTAMP,
-                valor DECIMAL,
-                volume_buy DECIMAL,
-                volume_sell DECIMAL,
-                PRIMARY KEY (day_partition, sequential_id)
-            ) WITH CLUSTERING ORDER BY (sequential_id ASC);""")
-
-            # Busca novos dados
-            query = f"SELECT sequential_id, valor FROM {table_name} WHERE day_partition = %s AND sequential_id > %s"
-            rows = cassandra_session.execute(query, (day_partition, last_id))
-            
-            new_data = []
-            max_id_in_batch = last_id
-
-            for row in rows:
-                new_data.append({"id": row.sequential_id, "value": float(row.valor)})
-                if row.sequential_id > max_id_in_batch:
-                    max_id_in_batch = row.sequential_id
-            
-            if new_data:
-                print(f"Enviando {len(new_data)} novos pontos de dados da tabela {table_name}.")
-                await manager.broadcast_json({"table": table_name, "points": new_data})
-                last_id = max_id_in_batch
-
-        except SyntaxException as e:
-            print(f"Erro de sintaxe na query do Cassandra (a tabela pode não existir ainda): {e}")
-        except Exception as e:
-            print(f"Erro durante o streaming de dados: {e}")
-            # Em caso de erro, reseta a conexão para tentar novamente
-            cassandra_session = None 
+            tick = await asyncio.wait_for(fila.get(), timeout=max(0.0, proximo_catchup - loop.time()))
+            ticks = [tick]
+            while not fila.empty():
+                ticks.append(fila.get_nowait())
+            for tick in ticks:
+                if tick['symbol'] != SYMBOL_PADRAO:
+                    continue
+                try:
+                    dia_tempo = de_ms(tick['t'])
+                    ponto = (tick['dia'], dia_tempo, tick['valor'], tick.get('volume_buy'), tick.get('volume_sell'))
+                    # Ticks atrasados de um dia anterior não mexem no cursor do dia atual
+                    if cursor.dia and tick['dia'] < cursor.dia:
+                        pontos.append(ponto)
+                    elif cursor.registrar(tick['dia'], dia_tempo, tick['writer_id'], tick['seq']):
+                        pontos.append(ponto)
+                except Exception as e:
+                    print(f"Tick inválido do barramento descartado ({type(e).__name__}: {e}): {tick}")
+        except asyncio.TimeoutError:
+            proximo_catchup = loop.time() + (INTERVALO_CATCHUP if barramento.publicadores else INTERVALO_POLLING)
+            if not cassandra_session:
+                print("Sessão do Cassandra não está disponível. Tentando reconectar...")
+                cassandra_session = await loop.run_in_executor(None, connect_to_cassandra)
+                if not cassandra_session:
+                    proximo_catchup = loop.time() + 5  # Espera antes de tentar novamente
+                    continue
+            try:
+                dia = datetime.date.today()
+                rows = cursor.filtrar(dia, await cassandra_session.executar(*cursor.consulta(dia)))
+                pontos = [(dia, row.dia_tempo, row.valor, row.volume_buy, row.volume_sell) for row in rows]
+            except SyntaxException as e:
+                print(f"Erro de sintaxe na query do Cassandra (a tabela pode não existir ainda): {e}")
+            except Exception as e:
+                print(f"Erro durante o streaming de dados: {e}")
+                # Em caso de erro, reseta a conexão para tentar novamente
+                cassandra_session = None
 
-        await asyncio.sleep(1) # Verifica a cada 1 segundo
+        try:
+            por_dia = {}
+            fechados = []
+            for dia, dia_tempo, valor, volume_buy, volume_sell in pontos:
+                if dia_atual is None or dia > dia_atual:
+                    # Virada do dia: recomeça os indicadores e a lista de dias em cache
+                    indicadores = ConjuntoIndicadores()
+                    dia_atual = dia
+                    cache_dias.invalidar_dias()
+                if dia == dia_atual:
+                    indicadores.atualizar(valor)
+                tempos, valores = por_dia.setdefault(dia, ([], []))
+                tempos.append(para_ms(dia_tempo))
+                valores.append(float(valor))
+                fechados += agregador_candles.atualizar(
+                    tempos[-1], valores[-1],
+                    float(volume_buy) if volume_buy is not None else None,
+                    float(volume_sell) if volume_sell is not None else None,
+                )
+            gravar_candles(fechados)
+
+            for dia, (tempos, valores) in por_dia.items():
+                # O dia em cache cresce com o stream, sem reler a partição
+                cache_dias.estender(dia, tempos, valores)
+                new_data = [{"t": t, "value": v} for t, v in zip(tempos, valores)]
+                await manager.broadcast_json({"table": nome_tabela_legado(dia), "points": new_data,
+                                              "indicators": indicadores.valores()})
+                # dia_tempo é o horário local do coletor, o mesmo relógio de datetime.now()
+                agora = para_ms(datetime.datetime.now())
+                for t in tempos:
+                    ATRASO_STREAMER.observar(max(0, agora - t) / 1000)
+        except Exception as e:
+            # Um ponto com problema não pode derrubar o streamer para o resto do processo
+            print(f"Erro ao processar {len(pontos)} ponto(s) do stream: {type(e).__name__} - {e}")
 
 # --- Endpoints da API ---
 @app.on_event("startup")
 async def startup_event():
     """Inicia a conexão com o BD e a tarefa de streaming."""
-    global cassandra_session
-    cassandra_session = connect_to_cassandra()
+    global cassandra_session, profiler
+    profiler = profiler_do_ambiente()
+    cassandra_session = await asyncio.get_running_loop().run_in_executor(None, connect_to_cassandra)
+    try:
+        await barramento.servir()
+    except OSError as e:
+        print(f"Não foi possível abrir o barramento de ticks ({e}); usando só o polling do Cassandra.")
     asyncio.create_task(data_streamer())
 
 @app.get("/api/tables")
 async def get_tables():
-    """Lista todas as tabelas de dados de bitcoin do keyspace 'btc'."""
+    """Lista os dias com dados (no formato btc_YYYY_MM_DD usado pelas páginas)."""
     if not cassandra_session:
         return {"error": "Cassandra connection not available"}, 500
     
     try:
-        query = "SELECT table_name FROM system_schema.tables WHERE keyspace_name = 'btc'"
-        rows = cassandra_session.execute(query)
-        table_names = sorted([row.table_name for row in rows if row.table_name.startswith('btc_')], reverse=True)
+        table_names = [nome_tabela_legado(dia) for dia in await cache_dias.dias(cassandra_session)]
         return {"tables": table_names}
     except Exception as e:
         print(f"Erro ao buscar tabelas: {e}")
         return {"error": "Could not fetch tables from Cassandra"}, 500
 
+def _etag_confere(request, etag):
+    return etag is not None and etag in [valor.strip() for valor in request.headers.get("if-none-match", "").split(",")]
+
+def _resposta_serie(request, tempos, valores, meta, etag=None):
+    """
+    Série como JSON ({"data": [{t, value}], ...meta}) ou, se o Accept pedir,
+    no formato binário colunar (formato_binario). Com `etag` (dias fechados)
+    a resposta leva ETag forte por formato e vira 304 se o cliente já a tem.
+    """
+    binario = aceita_binario(request.headers.get("accept"))
+    cabecalhos = {"Vary": "Accept"}
+    if etag is not None:
+        etag = etag[:-1] + '-bin"' if binario else etag
+        cabecalhos.update({"ETag": etag, "Cache-Control": "public, max-age=86400"})
+        if _etag_confere(request, etag):
+            return Response(status_code=304, headers=cabecalhos)
+    if binario:
+        return Response(codificar_serie(tempos, valores, meta), media_type=MIDIA_BINARIA, headers=cabecalhos)
+    data = [{"t": t, "value": v} for t, v in zip(tempos.tolist(), valores.tolist())]
+    return JSONResponse({"data": data, **meta}, headers=cabecalhos)
+
 @app.get("/api/data/{table_name}")
-async def get_table_data(table_name: str):
-    """Retorna todos os dados de uma tabela específica."""
+async def get_table_data(table_name: str, request: Request):
+    """Retorna todos os dados de um dia (identificado como btc_YYYY_MM_DD)."""
     if not cassandra_session:
         return {"error": "Cassandra connection not available"}, 500
     
-    if not table_name.startswith("btc_") or not all(c.isalnum() or c == '_' for c in table_name):
+    try:
+        dia = dia_da_tabela_legado(table_name)
+    except ValueError:
         return {"error": "Invalid table name"}, 400
 
     try:
-        day_partition = table_name.replace("btc_", "").replace("_", "-")
-        
-        query = f"SELECT sequential_id, valor FROM {table_name} WHERE day_partition = %s"
-        rows = cassandra_session.execute(query, (day_partition,))
-        
-        data = [{"id": row.sequential_id, "value": float(row.valor)} for row in rows]
-        return {"data": data}
+        serie = await cache_dias.serie(cassandra_session, dia)
+        return _resposta_serie(request, serie.tempos, serie.valores, {}, serie.etag)
     except SyntaxException:
         return {"error": f"Table '{table_name}' not found or query is invalid."}, 404
     except Exception as e:
         print(f"Erro ao buscar dados da tabela {table_name}: {e}")
         return {"error": f"Could not fetch data for table {table_name}"}, 500
 
+def _instante(valor):
+    """
+    Parâmetro de tempo da API: ms desde a época (como o campo `t`) ou data/hora
+    ISO. ISO com fuso (Z, +03:00) é convertido para o horário local, o mesmo
+    relógio naive do dia_tempo gravado pelo coletor.
+    """
+    try:
+        if valor.lstrip('-').isdigit():
+            return de_ms(int(valor))
+        momento = datetime.datetime.fromisoformat(valor.replace('Z', '+00:00'))
+    except (OverflowError, TypeError) as e:
+        raise ValueError(str(e))
+    if momento.tzinfo is not None:
+        momento = momento.astimezone().replace(tzinfo=None)
+    return momento
+
+def _intervalo(start, end, dias_max=None):
+    """(inicio, fim) validados; ValueError se inválidos, fora de ordem ou longos demais."""
+    inicio, fim = _instante(start), _instante(end)
+    if fim < inicio:
+        raise ValueError("end must not be before start")
+    if dias_max is not None and (fim.date() - inicio.date()).days >= dias_max:
+        raise ValueError(f"Interval too long (at most {dias_max} days per request)")
+    return inicio, fim
+
+def _codificar_cursor(chave):
+    dia_tempo, writer_id, seq = chave
+    return base64.urlsafe_b64encode(json.dumps([para_ms(dia_tempo), writer_id, seq]).encode()).decode()
+
+def _decodificar_cursor(cursor):
+    t, writer_id, seq = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    return de_ms(t), writer_id, int(seq)
+
+@app.get("/api/history")
+async def get_history(request: Request, start: str, end: str, points: int = PONTOS_PADRAO, method: str = "lttb",
+                      raw: bool = False, limit: int = 5000, cursor: str = None, symbol: str = SYMBOL_PADRAO):
+    """
+    Série de [start, end] (ms ou ISO, horário do coletor; ISO com fuso é
+    convertido para ele), cobrindo no máximo DIAS_MAX_HISTORICO dias.
+
+    Por padrão devolve no máximo `points` pontos, reduzidos por `method`
+    (lttb ou minmax, ver reducao_serie): o gráfico carrega sempre a mesma
+    quantidade de pontos, qualquer que seja a frequência dos ticks. Com
+    `raw=true` devolve os ticks brutos em páginas de `limit` linhas; a
+    resposta traz `next_cursor` para pedir a página seguinte.
+
+    A série reduzida sai do cache de dias; se todos os dias do intervalo
+    estão fechados, a resposta leva ETag e aceita If-None-Match (304). Com
+    Accept: application/vnd.btc.serie ela vem no formato binário.
+    """
+    if not cassandra_session:
+        return JSONResponse({"error": "Cassandra connection not available"}, status_code=500)
+
+    try:
+        inicio, fim = _intervalo(start, end, DIAS_MAX_HISTORICO)
+    except ValueError as e:
+        return JSONResponse({"error": f"Invalid start or end: {e}"}, status_code=400)
+    try:
+        apos = _decodificar_cursor(cursor) if cursor else None
+    except (ValueError, TypeError, OverflowError):
+        return JSONResponse({"error": "Invalid cursor"}, status_code=400)
+
+    try:
+        if raw:
+            linhas, proxima = await ler_pagina(cassandra_session, inicio, fim, symbol,
+                                         limite=max(1, min(limit, LIMITE_PAGINA_MAX)), apos=apos)
+            data = [{"t": para_ms(row.dia_tempo), "writer_id": row.writer_id, "seq": row.seq,
+                     "value": float(row.valor),
+                     "volume_buy": float(row.volume_buy) if row.volume_buy is not None else None,
+                     "volume_sell": float(row.volume_sell) if row.volume_sell is not None else None}
+                    for row in linhas]
+            return {"data": data, "next_cursor": _codificar_cursor(proxima) if proxima else None}
+
+        series = await asyncio.gather(*[cache_dias.serie(cassandra_session, dia, symbol)
+                                        for dia in dias_no_intervalo(inicio, fim)])
+        etag = None
+        if all(serie.fechado for serie in series):
+            chave = "|".join([serie.etag for serie in series] + [str(request.url.query)])
+            etag = f'"h-{hashlib.sha1(chave.encode()).hexdigest()}"'
+        fatias = [serie.intervalo(para_ms(inicio), para_ms(fim)) for serie in series]
+        tempos = np.concatenate([t for t, _ in fatias]) if fatias else np.empty(0, dtype=np.int64)
+        valores = np.concatenate([v for _, v in fatias]) if fatias else np.empty(0)
+        t, y = reduzir(tempos, valores, max(3, min(points, PONTOS_MAX)), method)
+        meta = {"total": len(tempos), "method": method if len(t) < len(tempos) else "raw"}
+        return _resposta_serie(request, t, y, meta, etag)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    except Exception as e:
+        print(f"Erro ao buscar o histórico de {start} a {end}: {e}")
+        return JSONResponse({"error": "Could not fetch history"}, status_code=500)
+
+@app.get("/api/candles")
+async def get_candles(start: str, end: str, resolution: str = "1m", symbol: str = SYMBOL_PADRAO):
+    """
+    Candles OHLC de [start, end) (ms ou ISO) na resolução pedida (1m, 5m, 1h ou 1d).
+
+    Os candles fechados vêm da tabela `candles` (alguns registros por dia em
+    vez de todos os ticks); o candle em aberto vem da memória do servidor.
+    """
+    if not cassandra_session:
+        return JSONResponse({"error": "Cassandra connection not available"}, status_code=500)
+    if resolution not in RESOLUCOES_PADRAO:
+        return JSONResponse({"error": f"Invalid resolution (use {', '.join(RESOLUCOES_PADRAO)})"}, status_code=400)
+    try:
+        inicio, fim = _intervalo(start, end)
+    except ValueError as e:
+        return JSONResponse({"error": f"Invalid start or end: {e}"}, status_code=400)
+    inicio_ms, fim_ms = para_ms(inicio), para_ms(fim)
+
+    try:
+        resultados = await asyncio.gather(*[cassandra_session.executar(consulta, parametros)
+                                            for consulta, parametros in consultas_intervalo(resolution, inicio_ms, fim_ms, symbol)])
+        candles = [candle_da_linha(row) for linhas in resultados for row in linhas][-CANDLES_MAX:]
+        if symbol == SYMBOL_PADRAO:
+            for aberto in agregador_candles.candles_abertos(resolution):
+                if inicio_ms <= aberto['inicio'] < fim_ms and (not candles or candles[-1]['inicio'] < aberto['inicio']):
+                    candles.append(dict(aberto, volume=None, divergencia_bps=None, fonte='aberto'))
+        return {"resolution": resolution, "candles": candles}
+    except Exception as e:
+        print(f"Erro ao buscar candles de {start} a {end}: {e}")
+        return JSONResponse({"error": "Could not fetch candles"}, status_code=500)
+
+@app.get("/api/metrics/ws")
+async def get_ws_metrics():
+    """Métricas do fan-out WebSocket: clientes, profundidade das filas e latência de envio."""
+    return manager.metricas()
+
+@app.get("/api/metrics/cache")
+async def get_cache_metrics():
+    """Métricas do cache de dias: séries em memória, bytes, acertos e faltas."""
+    return cache_dias.metricas()
+
+@app.get("/metrics")
+async def get_metrics():
+    """Todas as métricas do servidor no formato texto do Prometheus."""
+    return PlainTextResponse(REGISTRO.exportar(), media_type=MIDIA_PROMETHEUS)
+
+@app.get("/debug/profile")
+async def get_profile(limit: int = 200):
+    """Pilhas mais amostradas pelo profiler (formato folded); requer BTC_PROFILER."""
+    if profiler is None:
+        return PlainTextResponse("Profiler desativado: inicie o servidor com BTC_PROFILER=<intervalo em ms>.\n",
+                                 status_code=404)
+    return PlainTextResponse(profiler.pilhas(limit))
+
 @app.get("/")
 async def get_index():
     """Serve o arquivo HTML principal (menu de seleção)."""
@@ -182,17 +464,27 @@ async def get_chartjs():
     except FileNotFoundError:
         return HTMLResponse("<h1>chartjs.html não encontrado.</h1>", status_code=404)
 
+@app.get("/js/serie_binaria.js")
+async def get_serie_binaria_js():
+    """Serve o leitor do formato binário de séries usado pelas páginas."""
+    try:
+        with open("src/web/js/serie_binaria.js", "r", encoding="utf-8") as f:
+            return Response(f.read(), media_type="application/javascript")
+    except FileNotFoundError:
+        return Response("// serie_binaria.js não encontrado.", status_code=404, media_type="application/javascript")
+
 @app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    """Endpoint WebSocket para clientes se conectarem."""
-    await manager.connect(websocket)
+async def websocket_endpoint(websocket: WebSocket, format: str = "json"):
+    """Endpoint WebSocket para clientes se conectarem (?format=bin para mensagens binárias)."""
+    await manager.connect(websocket, binario=format == "bin")
     print("Novo cliente conectado via WebSocket.")
     try:
         while True:
             # Mantém a conexão viva
             await websocket.receive_text()
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
         print("Cliente desconectado.")
+    finally:
+        manager.disconnect(websocket)
 
 # Para executar: uvicorn server:app --reload
\ No newline at end of file
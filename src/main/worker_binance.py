@@ -0,0 +1,136 @@
+import json
+import time
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.collection.order_book import LivroOfertasLocal, FonteBinance, FonteReplay
+from src.collection.liquidez import decodificar_profundidade, calcular_liquidez, liquidez_do_livro
+from src.storage.metricas import REGISTRO
+
+BASE_URL_BINANCE = 'https://api.binance.com'
+
+_PESO_USADO = REGISTRO.medidor('btc_binance_peso_usado', 'Peso da API usado no último minuto (X-MBX-USED-WEIGHT-1M)')
+_DECODIFICACAO_LIVRO = REGISTRO.histograma('btc_livro_decodificacao_segundos',
+                                           'Tempo para decodificar o snapshot do livro de ofertas')
+
+
+def _notional(niveis):
+    """Soma de preço * quantidade de um array de níveis (n, 2)."""
+    return float(np.dot(niveis[:, 0], niveis[:, 1]))
+
+
+class WorkerBinance:
+    """
+    Executa as chamadas à Binance (e outros trabalhos de I/O) fora da thread
+    do Tkinter.
+
+    Usa uma requests.Session com pool de conexões persistentes, dispara as
+    requisições de preço e de livro de ofertas ao mesmo tempo e entrega os
+    resultados em uma fila, consumida pela interface com `self.after`.
+    Itens da fila: ('tick', preco, volume_compras, volume_vendas, liquidez),
+    ('erro_busca', mensagem) ou ('erro', titulo, mensagem), onde `liquidez` é
+    o dict de métricas de src.collection.liquidez.
+
+    Com `iniciar_livro`, os volumes vêm de um livro de ofertas mantido
+    localmente pelo stream de diffs; enquanto ele não estiver sincronizado, o
+    snapshot de 1000 níveis continua sendo baixado a cada tick.
+    """
+
+    def __init__(self, symbol='BTCUSDT', base_url=BASE_URL_BINANCE, max_workers=4, timeout=10):
+        self.symbol = symbol
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.resultados = queue.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='binance')
+        # Escritas (Cassandra, arquivos) em uma única thread, preservando a ordem dos ticks
+        self.executor_escrita = ThreadPoolExecutor(max_workers=1, thread_name_prefix='escrita')
+        self.session = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('https://', adaptador)
+        self.session.mount('http://', adaptador)
+        self.livro = None
+
+    def iniciar_livro(self, arquivo_replay=None):
+        """Inicia o livro local, a partir da Binance ou de um arquivo de replay (JSON lines)."""
+        if arquivo_replay:
+            fonte = FonteReplay(arquivo_replay)
+        else:
+            fonte = FonteBinance(self.symbol, base_url=self.base_url, session=self.session)
+        self.livro = LivroOfertasLocal(fonte).iniciar()
+        return self.livro
+
+    def _get(self, caminho, params):
+        """GET na Binance registrando a latência por endpoint e o peso usado."""
+        inicio = time.perf_counter()
+        try:
+            resposta = self.session.get(f"{self.base_url}{caminho}", params=params, timeout=self.timeout)
+        except requests.exceptions.RequestException:
+            REGISTRO.contador('btc_binance_erros_total', 'Requisições à Binance com erro', endpoint=caminho).incrementar()
+            raise
+        REGISTRO.histograma('btc_binance_requisicao_segundos', 'Latência das requisições à Binance',
+                            endpoint=caminho).desde(inicio)
+        peso_usado = resposta.headers.get('X-MBX-USED-WEIGHT-1M')
+        if peso_usado is not None:
+            _PESO_USADO.definir(int(peso_usado))
+        if not resposta.ok:
+            REGISTRO.contador('btc_binance_erros_total', 'Requisições à Binance com erro', endpoint=caminho).incrementar()
+        resposta.raise_for_status()
+        return resposta
+
+    def _get_json(self, caminho, params):
+        return self._get(caminho, params).json()
+
+    def obter_precos(self, symbols):
+        """Preços de vários símbolos em uma única requisição: dict symbol -> preço."""
+        if len(symbols) == 1:
+            dados = [self._get_json('/api/v3/ticker/price', {'symbol': symbols[0]})]
+        else:
+            dados = self._get_json('/api/v3/ticker/price', {'symbols': json.dumps(list(symbols), separators=(',', ':'))})
+        return {item['symbol']: float(item['price']) for item in dados}
+
+    def obter_livro(self, limite=1000, symbol=None):
+        """Snapshot do livro como (bids, asks), arrays (n, 2) decodificados do corpo bruto."""
+        resposta = self._get('/api/v3/depth', {'symbol': symbol or self.symbol, 'limit': limite})
+        with _DECODIFICACAO_LIVRO.cronometrar():
+            return decodificar_profundidade(resposta.content)
+
+    def obter_liquidez(self, symbols, limite=1000):
+        """Baixa os livros de vários símbolos em paralelo e calcula as métricas de todos de uma vez."""
+        livros = list(self.executor.map(lambda symbol: self.obter_livro(limite, symbol), symbols))
+        metricas = calcular_liquidez(livros)
+        return {symbol: {nome: float(valores[i]) for nome, valores in metricas.items()}
+                for i, symbol in enumerate(symbols)}
+
+    def volumes_do_livro(self, symbol=None, livro=None, limite=1000):
+        """
+        (volume_compras, volume_vendas, liquidez) do livro local `livro`, se
+        estiver sincronizado, ou de um snapshot de `limite` níveis.
+        """
+        if livro is not None:
+            volume_compras, volume_vendas = livro.volumes()
+            if volume_compras is not None:
+                niveis = livro.niveis(livro.profundidade)
+                return volume_compras, volume_vendas, liquidez_do_livro(niveis['bids'], niveis['asks'])
+        bids, asks = self.obter_livro(limite, symbol)
+        return _notional(bids), _notional(asks), liquidez_do_livro(bids, asks)
+
+    def executar(self, funcao, *args, titulo_erro="Erro Inesperado"):
+        """Executa `funcao(*args)` na thread de escrita; erros são enviados à fila."""
+        def tarefa():
+            try:
+                funcao(*args)
+            except Exception as e:
+                self.resultados.put(('erro', titulo_erro, str(e)))
+        return self.executor_escrita.submit(tarefa)
+
+    def encerrar(self):
+        if self.livro is not None:
+            self.livro.parar()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        # Deixa terminar as escritas já enfileiradas
+        self.executor_escrita.shutdown(wait=True)
+        self.session.close()
@@ -0,0 +1,214 @@
+import os
+import zlib
+import asyncio
+import datetime
+from collections import OrderedDict, deque
+
+import numpy as np
+
+from src.storage.serie_temporal import TABELA_TICKS, SYMBOL_PADRAO, CONSULTA_DIAS, dias_das_linhas, para_ms
+
+# Limite de memória do cache (MB), configurável por BTC_CACHE_MB
+LIMITE_CACHE_MB = int(os.environ.get('BTC_CACHE_MB', '256'))
+# Um dia só é considerado fechado (imutável) depois desta carência após a meia-noite,
+# para não congelar o bucket antes de chegarem os últimos lotes dos coletores
+CARENCIA_FECHAMENTO = datetime.timedelta(minutes=5)
+# Janela de ticks recentes do stream mesclada em uma carga do dia atual
+JANELA_RECENTES_MS = 10_000
+
+
+def _ordenar(tempos, valores):
+    ordem = np.argsort(tempos, kind='stable')
+    return tempos[ordem], valores[ordem]
+
+
+class SerieDia:
+    """
+    Série de um dia em arrays colunares (t em ms, valor em float64).
+
+    Dias fechados são imutáveis e têm uma ETag forte derivada do conteúdo. O
+    dia atual cresce com `estender`, com capacidade dobrada quando enche
+    (append amortizado O(1)); pontos fora de ordem são reordenados e os que
+    já estão na série são ignorados.
+    """
+
+    def __init__(self, dia, tempos, valores, fechado):
+        self.dia = dia
+        self.fechado = fechado
+        self.n = len(tempos)
+        self._t = np.asarray(tempos, dtype=np.int64)
+        self._v = np.asarray(valores, dtype=np.float64)
+        self.etag = None
+        if fechado:
+            crc = zlib.crc32(self._v.tobytes(), zlib.crc32(self._t.tobytes()))
+            self.etag = f'"{dia:%Y%m%d}-{self.n}-{crc:08x}"'
+
+    @property
+    def tempos(self):
+        return self._t[:self.n]
+
+    @property
+    def valores(self):
+        return self._v[:self.n]
+
+    @property
+    def nbytes(self):
+        return self._t.nbytes + self._v.nbytes
+
+    def estender(self, tempos, valores):
+        tempos = np.asarray(tempos, dtype=np.int64)
+        valores = np.asarray(valores, dtype=np.float64)
+        if self.n and len(tempos) and tempos.min() <= self._t[self.n - 1]:
+            tempos, valores = self._sem_repetidos(tempos, valores)
+        if not len(tempos):
+            return
+        fim = self.n + len(tempos)
+        if fim > len(self._t):
+            capacidade = max(fim, 2 * len(self._t), 1024)
+            self._t = np.resize(self._t[:self.n], capacidade)
+            self._v = np.resize(self._v[:self.n], capacidade)
+        fora_de_ordem = self.n and tempos.min() < self._t[self.n - 1]
+        self._t[self.n:fim] = tempos
+        self._v[self.n:fim] = valores
+        self.n = fim
+        if fora_de_ordem or np.any(np.diff(tempos) < 0):
+            self._t[:fim], self._v[:fim] = _ordenar(self._t[:fim], self._v[:fim])
+
+    def _sem_repetidos(self, tempos, valores):
+        # O stream pode trazer de novo ticks que já vieram na carga do dia (o
+        # cursor não conhece as chaves lidas pelo cache): como em
+        # _mesclar_recentes, um (t, valor) já presente não entra outra vez
+        corte = np.searchsorted(self.tempos, tempos.min(), 'left')
+        existentes = set(zip(self._t[corte:self.n].tolist(), self._v[corte:self.n].tolist()))
+        novos = np.fromiter((par not in existentes for par in zip(tempos.tolist(), valores.tolist())),
+                            dtype=bool, count=len(tempos))
+        return tempos[novos], valores[novos]
+
+    def intervalo(self, inicio_ms, fim_ms):
+        """Fatias (t, valor) com inicio_ms <= t <= fim_ms."""
+        t = self.tempos
+        i, j = np.searchsorted(t, inicio_ms, 'left'), np.searchsorted(t, fim_ms, 'right')
+        return t[i:j], self.valores[i:j]
+
+
+class CacheDias:
+    """
+    Cache LRU, limitado em bytes, das séries diárias lidas do Cassandra.
+
+    - Dias fechados (anteriores a hoje, passada a carência) são lidos uma
+      vez e servidos da memória com ETag forte.
+    - O dia atual é lido uma vez e depois estendido pelo stream
+      (`estender`, chamado pelo data_streamer), sem reler a partição.
+    - A lista de dias também fica em cache e é invalidada na virada do dia.
+
+    As leituras usam uma SessaoAssincrona (cassandra_async): a partição chega
+    página a página e cada página vira um pedaço de array, sem manter as
+    linhas do driver na memória. Pedidos simultâneos do mesmo dia esperam a
+    mesma leitura.
+    """
+
+    def __init__(self, limite_bytes=LIMITE_CACHE_MB * 1024 * 1024):
+        self.limite_bytes = limite_bytes
+        self.series = OrderedDict()
+        self._carregando = {}
+        self.bytes = 0
+        self.acertos = 0
+        self.faltas = 0
+        self._dias = {}
+        # Ticks recentes do stream, por símbolo: cobrem os que ainda não estavam
+        # gravados no Cassandra quando o dia atual foi carregado
+        self._recentes = {}
+
+    def dia_fechado(self, dia):
+        return dia < (datetime.datetime.now() - CARENCIA_FECHAMENTO).date()
+
+    async def _carregar(self, sessao, symbol, dia):
+        pedacos_t, pedacos_v = [], []
+        consulta = f"SELECT dia_tempo, valor FROM {TABELA_TICKS} WHERE symbol = %s AND dia = %s"
+        async for pagina in sessao.paginas(consulta, (symbol, dia)):
+            pedacos_t.append(np.fromiter((para_ms(row.dia_tempo) for row in pagina), dtype=np.int64, count=len(pagina)))
+            pedacos_v.append(np.fromiter((row.valor for row in pagina), dtype=np.float64, count=len(pagina)))
+        if not pedacos_t:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        return np.concatenate(pedacos_t), np.concatenate(pedacos_v)
+
+    def _mesclar_recentes(self, symbol, dia, tempos, valores):
+        recentes = [(t, v) for d, t, v in self._recentes.get(symbol, ()) if d == dia]
+        if not recentes:
+            return tempos, valores
+        desde = tempos[-1] - JANELA_RECENTES_MS if len(tempos) else np.iinfo(np.int64).min
+        # Mescla a janela final com os ticks recentes, sem repetir (t, valor)
+        corte = np.searchsorted(tempos, desde, 'left')
+        cauda = set(zip(tempos[corte:].tolist(), valores[corte:].tolist()))
+        extras = sorted(par for par in set(recentes) if par[0] >= desde and par not in cauda)
+        if not extras:
+            return tempos, valores
+        t_extra, v_extra = zip(*extras)
+        return _ordenar(np.r_[tempos, np.array(t_extra, dtype=np.int64)],
+                        np.r_[valores, np.array(v_extra, dtype=np.float64)])
+
+    async def serie(self, sessao, dia, symbol=SYMBOL_PADRAO):
+        """SerieDia de (symbol, dia), da memória ou lida uma vez do Cassandra."""
+        chave = (symbol, dia)
+        serie = self.series.get(chave)
+        fechado = self.dia_fechado(dia)
+        if serie is not None and (serie.fechado or not fechado):
+            self.acertos += 1
+            self.series.move_to_end(chave)
+            return serie
+        # Falta, ou um dia aberto que acabou de fechar: relê uma vez e congela
+        tarefa = self._carregando.get(chave)
+        if tarefa is None:
+            self.faltas += 1
+            tarefa = asyncio.ensure_future(self._ler_serie(sessao, symbol, dia, fechado))
+            self._carregando[chave] = tarefa
+            tarefa.add_done_callback(lambda _: self._carregando.pop(chave, None))
+        return await asyncio.shield(tarefa)
+
+    async def _ler_serie(self, sessao, symbol, dia, fechado):
+        tempos, valores = await self._carregar(sessao, symbol, dia)
+        if not fechado:
+            tempos, valores = self._mesclar_recentes(symbol, dia, tempos, valores)
+        serie = SerieDia(dia, tempos, valores, fechado)
+        self._guardar((symbol, dia), serie)
+        return serie
+
+    def _guardar(self, chave, serie):
+        anterior = self.series.pop(chave, None)
+        if anterior is not None:
+            self.bytes -= anterior.nbytes
+        self.series[chave] = serie
+        self.bytes += serie.nbytes
+        self._despejar()
+
+    def _despejar(self):
+        while self.bytes > self.limite_bytes and len(self.series) > 1:
+            _, serie = self.series.popitem(last=False)
+            self.bytes -= serie.nbytes
+
+    def estender(self, dia, tempos, valores, symbol=SYMBOL_PADRAO):
+        """Acrescenta ticks do stream ao dia aberto em cache (se estiver carregado)."""
+        recentes = self._recentes.setdefault(symbol, deque(maxlen=10_000))
+        recentes.extend(zip([dia] * len(tempos), tempos, valores))
+        serie = self.series.get((symbol, dia))
+        if serie is None or serie.fechado:
+            return
+        self.bytes -= serie.nbytes
+        serie.estender(tempos, valores)
+        self.bytes += serie.nbytes
+        self._despejar()
+
+    async def dias(self, sessao, symbol=SYMBOL_PADRAO):
+        """Dias com dados do símbolo (lista em cache até `invalidar_dias`)."""
+        if symbol not in self._dias:
+            self._dias[symbol] = dias_das_linhas(await sessao.executar(CONSULTA_DIAS, (symbol,)))
+        return self._dias[symbol]
+
+    def invalidar_dias(self):
+        self._dias.clear()
+
+    def metricas(self):
+        consultas = self.acertos + self.faltas
+        return {'series': len(self.series), 'bytes': self.bytes, 'limite_bytes': self.limite_bytes,
+                'acertos': self.acertos, 'faltas': self.faltas,
+                'taxa_acertos': self.acertos / consultas if consultas else 0.0}
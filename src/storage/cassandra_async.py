@@ -0,0 +1,148 @@
+import os
+import re
+import time
+import asyncio
+
+from src.storage.serie_temporal import SYMBOL_PADRAO, consulta_pagina, dias_no_intervalo
+from src.storage.metricas import REGISTRO
+
+# Ajustes do acesso ao Cassandra pelo servidor (variáveis de ambiente)
+HOSTS_CASSANDRA = os.environ.get('BTC_CASSANDRA_HOSTS', '127.0.0.1').split(',')
+# Threads do driver que executam os callbacks das respostas
+THREADS_DRIVER = int(os.environ.get('BTC_CASSANDRA_THREADS', '4'))
+# Consultas em voo ao mesmo tempo, somando todos os handlers e o streaming
+MAX_CONCORRENCIA = int(os.environ.get('BTC_CASSANDRA_CONCORRENCIA', '64'))
+# Linhas por página nas leituras paginadas
+FETCH_SIZE = int(os.environ.get('BTC_CASSANDRA_FETCH_SIZE', '5000'))
+# Timeout (s) de cada requisição ao cluster
+TIMEOUT_CONSULTA = float(os.environ.get('BTC_CASSANDRA_TIMEOUT', '10'))
+
+_MARCADOR = re.compile(r'%s')
+
+_LATENCIA_LEITURA = REGISTRO.histograma('btc_cassandra_leitura_segundos',
+                                        'Latência de cada página lida do Cassandra (sem a espera por vaga)')
+_ERROS_LEITURA = REGISTRO.contador('btc_cassandra_erros_leitura_total', 'Leituras do Cassandra com erro')
+
+
+class _Paginador:
+    """
+    Liga um ResponseFuture do driver a futures do asyncio, página a página.
+
+    Os callbacks do driver rodam nas threads dele; o resultado é entregue ao
+    loop com call_soon_threadsafe. Os mesmos callbacks são chamados de novo a
+    cada start_fetching_next_page.
+    """
+
+    def __init__(self, futuro, loop):
+        self.futuro = futuro
+        self.loop = loop
+        self.atual = loop.create_future()
+        futuro.add_callbacks(self._ao_receber, self._ao_falhar)
+
+    def _ao_receber(self, linhas):
+        self.loop.call_soon_threadsafe(self._resolver, linhas, None)
+
+    def _ao_falhar(self, excecao):
+        self.loop.call_soon_threadsafe(self._resolver, None, excecao)
+
+    def _resolver(self, linhas, excecao):
+        if self.atual.done():
+            return
+        if excecao is not None:
+            self.atual.set_exception(excecao)
+        else:
+            self.atual.set_result(linhas)
+
+    async def pagina(self):
+        return await self.atual
+
+    def pedir_proxima(self):
+        self.atual = self.loop.create_future()
+        self.futuro.start_fetching_next_page()
+
+
+class SessaoAssincrona:
+    """
+    Acesso não bloqueante ao Cassandra para código asyncio (o server.py).
+
+    As consultas usam o estilo %s do driver e são preparadas uma única vez
+    (cada %s vira um bind marker). `executar_async` do driver é convertido em
+    awaitable, `paginas` entrega o resultado página a página (sem carregar a
+    partição inteira na memória) e um semáforo limita as requisições em voo
+    a `max_concorrencia`.
+    """
+
+    def __init__(self, session, max_concorrencia=MAX_CONCORRENCIA, fetch_size=FETCH_SIZE,
+                 timeout=TIMEOUT_CONSULTA):
+        self.session = session
+        self.fetch_size = fetch_size
+        self.timeout = timeout
+        self.max_concorrencia = max_concorrencia
+        self._vagas = asyncio.Semaphore(max_concorrencia)
+        self.preparados = {}
+        self._preparando = {}
+
+    async def preparar(self, consulta):
+        preparado = self.preparados.get(consulta)
+        if preparado is not None:
+            return preparado
+        # `prepare` é síncrono: roda uma vez por consulta, fora do loop, e
+        # chamadas simultâneas para a mesma consulta esperam a mesma preparação
+        tarefa = self._preparando.get(consulta)
+        if tarefa is None:
+            loop = asyncio.get_running_loop()
+            tarefa = loop.run_in_executor(None, self.session.prepare, _MARCADOR.sub('?', consulta))
+            self._preparando[consulta] = tarefa
+        try:
+            preparado = await tarefa
+        finally:
+            self._preparando.pop(consulta, None)
+        self.preparados[consulta] = preparado
+        return preparado
+
+    async def paginas(self, consulta, parametros=(), fetch_size=None):
+        """Gerador assíncrono das páginas (listas de linhas) do resultado."""
+        preparado = await self.preparar(consulta)
+        vinculada = preparado.bind(parametros)
+        vinculada.fetch_size = fetch_size or self.fetch_size
+        loop = asyncio.get_running_loop()
+        async with self._vagas:
+            inicio = time.perf_counter()
+            paginador = _Paginador(self.session.execute_async(vinculada, timeout=self.timeout), loop)
+            linhas = await self._pagina(paginador, inicio)
+        while True:
+            yield linhas
+            if not paginador.futuro.has_more_pages:
+                return
+            async with self._vagas:
+                inicio = time.perf_counter()
+                paginador.pedir_proxima()
+                linhas = await self._pagina(paginador, inicio)
+
+    async def _pagina(self, paginador, inicio):
+        try:
+            linhas = await paginador.pagina()
+        except Exception:
+            _ERROS_LEITURA.incrementar()
+            raise
+        _LATENCIA_LEITURA.desde(inicio)
+        return linhas
+
+    async def executar(self, consulta, parametros=(), fetch_size=None):
+        """Todas as linhas do resultado (use `paginas` para resultados grandes)."""
+        linhas = []
+        async for pagina in self.paginas(consulta, parametros, fetch_size):
+            linhas.extend(pagina)
+        return linhas
+
+
+async def ler_pagina(sessao, inicio, fim, symbol=SYMBOL_PADRAO, limite=5000, apos=None, colunas=None):
+    """Versão assíncrona de serie_temporal.ler_pagina."""
+    linhas = []
+    for dia in dias_no_intervalo(apos[0] if apos else inicio, fim):
+        consulta, parametros = consulta_pagina(dia, inicio, fim, symbol, limite - len(linhas), apos, colunas)
+        linhas.extend(await sessao.executar(consulta, parametros))
+        if len(linhas) >= limite:
+            ultima = linhas[-1]
+            return linhas, (ultima.dia_tempo, ultima.writer_id, ultima.seq)
+    return linhas, None
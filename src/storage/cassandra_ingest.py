@@ -0,0 +1,227 @@
+import time
+import itertools
+import threading
+from collections import deque
+from decimal import Decimal
+
+from cassandra.query import BatchStatement, BatchType
+from cassandra.protocol import InvalidRequest
+
+from src.storage.serie_temporal import TABELA_TICKS, TABELA_DIAS, criar_esquema, gerar_writer_id
+from src.storage.metricas import REGISTRO
+
+# Colunas DECIMAL da tabela de ticks (o driver espera Decimal nesses parâmetros)
+COLUNAS_DECIMAL = ('valor', 'volume_buy', 'volume_sell')
+
+_LATENCIA_ESCRITA = REGISTRO.histograma('btc_cassandra_escrita_segundos', 'Latência dos lotes gravados no Cassandra')
+_LINHAS_GRAVADAS = REGISTRO.contador('btc_cassandra_linhas_gravadas_total', 'Linhas de ticks gravadas no Cassandra')
+_ERROS_ESCRITA = REGISTRO.contador('btc_cassandra_erros_escrita_total', 'Lotes que falharam ao gravar no Cassandra')
+
+
+class EstatisticasLatencia:
+    """Latência das escritas (ms) nas últimas `janela` requisições, mais contadores."""
+
+    def __init__(self, janela=1000):
+        self.latencias = deque(maxlen=janela)
+        self.linhas = 0
+        self.lotes = 0
+        self.erros = 0
+        self._lock = threading.Lock()
+
+    def registrar(self, inicio, linhas, erro=False):
+        with self._lock:
+            self.latencias.append((time.perf_counter() - inicio) * 1000)
+            self.lotes += 1
+            if erro:
+                self.erros += 1
+            else:
+                self.linhas += linhas
+
+    def resumo(self):
+        with self._lock:
+            ordenadas = sorted(self.latencias)
+        resumo = {'linhas': self.linhas, 'lotes': self.lotes, 'erros': self.erros}
+        if ordenadas:
+            resumo['p50_ms'] = ordenadas[len(ordenadas) // 2]
+            resumo['p99_ms'] = ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * 0.99))]
+            resumo['max_ms'] = ordenadas[-1]
+        return resumo
+
+
+class EscritorCassandra:
+    """
+    Escritor de ticks no Cassandra (tabela única `ticks`, ver serie_temporal).
+
+    - O esquema é verificado uma vez (metadados do cluster ou um único
+      CREATE TABLE IF NOT EXISTS), em vez de um DDL antes de cada insert, e
+      cada dia novo é registrado uma vez em `ticks_dias`.
+    - O INSERT é preparado uma vez por conjunto de colunas.
+    - Linhas sem `writer_id`/`seq` recebem o id deste escritor e o próximo
+      número da sua sequência local: não há leitura antes da escrita nem
+      coordenação entre coletores.
+    - As linhas são agrupadas por partição em lotes UNLOGGED e enviadas com
+      `execute_async`; no máximo `max_em_voo` lotes ficam pendentes, e `inserir`
+      bloqueia (backpressure) quando esse limite é atingido.
+    - Lotes são enviados ao atingir `tamanho_lote` linhas ou a cada
+      `intervalo_lote` segundos (thread de descarga).
+
+    Erros assíncronos vão para `ao_erro(excecao)`; `estatisticas.resumo()`
+    informa contagens e latência (p50/p99/máx). A mesma instância pode ser
+    usada por várias threads: esquema e prepares ficam sob `_lock_esquema`.
+    """
+
+    def __init__(self, session, max_em_voo=32, tamanho_lote=50, intervalo_lote=1.0,
+                 colunas_extra=None, ao_erro=None, writer_id=None):
+        self.session = session
+        self.writer_id = writer_id or gerar_writer_id()
+        self._seq = itertools.count(1)
+        self.tamanho_lote = tamanho_lote
+        self.intervalo_lote = intervalo_lote
+        self.colunas_extra = list(colunas_extra or [])
+        self.ao_erro = ao_erro
+        self.estatisticas = EstatisticasLatencia()
+        self.esquema_verificado = False
+        self.dias_registrados = set()
+        self.preparados = {}
+        self.pendentes = {}
+        self._vagas = threading.BoundedSemaphore(max_em_voo)
+        self.max_em_voo = max_em_voo
+        self._lock = threading.Lock()
+        self._lock_esquema = threading.Lock()
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._laco_descarga, daemon=True, name='cassandra-descarga')
+        self._thread.start()
+
+    def garantir_esquema(self):
+        """Cria as tabelas (e as colunas extras que faltarem) só na primeira escrita."""
+        if self.esquema_verificado:
+            return
+        with self._lock_esquema:
+            if not self.esquema_verificado:
+                self._verificar_esquema()
+
+    def _verificar_esquema(self):
+        metadados = self.session.cluster.metadata.keyspaces.get(self.session.keyspace)
+        tabela = metadados.tables.get(TABELA_TICKS) if metadados else None
+        if tabela is None:
+            criar_esquema(self.session, self.colunas_extra)
+        else:
+            for coluna in self.colunas_extra:
+                if coluna in tabela.columns:
+                    continue
+                try:
+                    self.session.execute(f"ALTER TABLE {TABELA_TICKS} ADD {coluna} DOUBLE")
+                except InvalidRequest:
+                    pass  # A coluna já existe
+        self.esquema_verificado = True
+
+    def _registrar_dia(self, symbol, dia):
+        with self._lock:
+            if (symbol, dia) in self.dias_registrados:
+                return
+            self.dias_registrados.add((symbol, dia))
+        futuro = self.session.execute_async(f"INSERT INTO {TABELA_DIAS} (symbol, dia) VALUES (%s, %s)", (symbol, dia))
+        futuro.add_errback(self._ao_falhar_dia, symbol, dia)
+
+    def _ao_falhar_dia(self, excecao, symbol, dia):
+        # Sem o registro o dia não aparece na listagem de dias: tenta de novo no próximo insert
+        with self._lock:
+            self.dias_registrados.discard((symbol, dia))
+        _ERROS_ESCRITA.incrementar()
+        print(f"Erro ao registrar o dia {dia} de {symbol} em {TABELA_DIAS}: {excecao}")
+        if self.ao_erro:
+            self.ao_erro(excecao)
+
+    def _preparado(self, colunas):
+        preparado = self.preparados.get(colunas)
+        if preparado is None:
+            self.garantir_esquema()
+            with self._lock_esquema:
+                preparado = self.preparados.get(colunas)
+                if preparado is None:
+                    preparado = self.session.prepare(
+                        f"INSERT INTO {TABELA_TICKS} ({', '.join(colunas)}) VALUES ({', '.join(['?'] * len(colunas))})"
+                    )
+                    self.preparados[colunas] = preparado
+        return preparado
+
+    def inserir(self, linha):
+        """
+        Enfileira uma linha (dict coluna -> valor); a partição é (symbol, dia).
+        Retorna a linha com writer_id e seq preenchidos.
+        """
+        if 'writer_id' not in linha:
+            linha = dict(linha, writer_id=self.writer_id, seq=next(self._seq))
+        colunas = tuple(linha)
+        valores = tuple(
+            Decimal(str(valor)) if coluna in COLUNAS_DECIMAL and valor is not None else valor
+            for coluna, valor in linha.items()
+        )
+        preparado = self._preparado(colunas)
+        self._registrar_dia(linha['symbol'], linha['dia'])
+        chave = (linha['symbol'], linha['dia'], colunas)
+        with self._lock:
+            lote = self.pendentes.setdefault(chave, [])
+            lote.append(valores)
+            cheio = len(lote) >= self.tamanho_lote
+            if cheio:
+                del self.pendentes[chave]
+        if cheio:
+            self._enviar(preparado, lote)
+        return linha
+
+    def _enviar(self, preparado, linhas):
+        # Bloqueia enquanto houver `max_em_voo` lotes pendentes (backpressure)
+        self._vagas.acquire()
+        inicio = time.perf_counter()
+        if len(linhas) == 1:
+            futuro = self.session.execute_async(preparado, linhas[0])
+        else:
+            lote = BatchStatement(batch_type=BatchType.UNLOGGED)
+            for valores in linhas:
+                lote.add(preparado, valores)
+            futuro = self.session.execute_async(lote)
+        futuro.add_callbacks(self._ao_concluir, self._ao_falhar,
+                             callback_args=(inicio, len(linhas)), errback_args=(inicio, len(linhas)))
+
+    def _ao_concluir(self, _resultado, inicio, linhas):
+        _LATENCIA_ESCRITA.desde(inicio)
+        _LINHAS_GRAVADAS.incrementar(linhas)
+        self.estatisticas.registrar(inicio, linhas)
+        self._vagas.release()
+
+    def _ao_falhar(self, excecao, inicio, linhas):
+        _ERROS_ESCRITA.incrementar()
+        self.estatisticas.registrar(inicio, linhas, erro=True)
+        self._vagas.release()
+        print(f"Erro ao gravar {linhas} linha(s) no Cassandra: {excecao}")
+        if self.ao_erro:
+            self.ao_erro(excecao)
+
+    def descarregar(self):
+        """Envia todos os lotes pendentes, mesmo incompletos."""
+        with self._lock:
+            pendentes, self.pendentes = self.pendentes, {}
+        for (_, _, colunas), linhas in pendentes.items():
+            self._enviar(self.preparados[colunas], linhas)
+
+    def _laco_descarga(self):
+        while not self._parar.wait(self.intervalo_lote):
+            try:
+                self.descarregar()
+            except Exception as e:
+                print(f"Erro ao descarregar lotes no Cassandra: {e}")
+
+    def aguardar(self):
+        """Descarrega e espera todas as escritas em voo terminarem."""
+        self.descarregar()
+        for _ in range(self.max_em_voo):
+            self._vagas.acquire()
+        for _ in range(self.max_em_voo):
+            self._vagas.release()
+
+    def fechar(self):
+        self._parar.set()
+        self._thread.join()
+        self.aguardar()
+        print(f"Escritor Cassandra encerrado: {self.estatisticas.resumo()}")
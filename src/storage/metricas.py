@@ -0,0 +1,299 @@
+import os
+import sys
+import time
+import bisect
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+# Limites (s) dos buckets de latência: de 100 µs a 30 s
+LIMITES_LATENCIA = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+MIDIA_PROMETHEUS = 'text/plain; version=0.0.4; charset=utf-8'
+# Pilha do profiler que acumula as amostras acima do limite de pilhas distintas
+PILHA_EXCEDENTE = '[outras pilhas]'
+
+
+class Contador:
+    """Valor que só cresce; com `funcao`, é lido de um contador já existente."""
+    tipo = 'counter'
+
+    def __init__(self, funcao=None):
+        self.valor = 0
+        self.funcao = funcao
+        self._lock = threading.Lock()
+
+    def incrementar(self, n=1):
+        with self._lock:
+            self.valor += n
+
+    def ler(self):
+        return self.funcao() if self.funcao else self.valor
+
+
+class Medidor:
+    """Valor instantâneo; com `funcao`, é lido dela na hora da exportação."""
+    tipo = 'gauge'
+
+    def __init__(self, funcao=None):
+        self.valor = 0.0
+        self.funcao = funcao
+
+    def definir(self, valor):
+        self.valor = valor
+
+    def ler(self):
+        return self.funcao() if self.funcao else self.valor
+
+
+class Histograma:
+    """
+    Histograma de buckets fixos (como o do Prometheus): observar custa uma
+    busca binária e um incremento, sem guardar as amostras.
+    """
+    tipo = 'histogram'
+
+    def __init__(self, limites=LIMITES_LATENCIA):
+        self.limites = tuple(limites)
+        self.contagens = [0] * (len(self.limites) + 1)
+        self.soma = 0.0
+        self.n = 0
+        self._lock = threading.Lock()
+
+    def observar(self, valor):
+        i = bisect.bisect_left(self.limites, valor)
+        with self._lock:
+            self.contagens[i] += 1
+            self.soma += valor
+            self.n += 1
+
+    def desde(self, inicio):
+        """Observa o tempo decorrido desde `inicio` (time.perf_counter())."""
+        self.observar(time.perf_counter() - inicio)
+
+    @contextmanager
+    def cronometrar(self):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.desde(inicio)
+
+    def quantil(self, q):
+        """Estimativa do quantil q (0..1) por interpolação dentro do bucket."""
+        with self._lock:
+            contagens, n = list(self.contagens), self.n
+        if not n:
+            return None
+        alvo = q * n
+        acumulado = 0
+        for i, contagem in enumerate(contagens):
+            if contagem and acumulado + contagem >= alvo:
+                if i == len(self.limites):
+                    return self.limites[-1]
+                inferior = self.limites[i - 1] if i else 0.0
+                return inferior + (self.limites[i] - inferior) * (alvo - acumulado) / contagem
+            acumulado += contagem
+        return self.limites[-1]
+
+
+def _rotulos(rotulos, extra=None):
+    pares = list(rotulos) + ([extra] if extra else [])
+    if not pares:
+        return ''
+    escapados = (str(valor).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n') for _, valor in pares)
+    return '{' + ','.join(f'{nome}="{valor}"' for (nome, _), valor in zip(pares, escapados)) + '}'
+
+
+def _numero(valor):
+    if valor is None or valor != valor:
+        return 'NaN'
+    if valor in (float('inf'), float('-inf')):
+        return '+Inf' if valor > 0 else '-Inf'
+    return repr(valor) if isinstance(valor, float) else str(valor)
+
+
+class RegistroMetricas:
+    """
+    Conjunto de métricas de um processo, exportado no formato texto do Prometheus.
+
+    Cada métrica é criada uma vez (normalmente no topo do módulo que a usa) e
+    identificada pelo nome e pelos rótulos. `coletor` exporta como gauges os
+    valores numéricos de um dict já existente (ex.: ConnectionManager.metricas),
+    calculado só na hora da exportação.
+    """
+
+    def __init__(self):
+        self._familias = {}
+        self._coletores = []
+        self._lock = threading.Lock()
+
+    def _obter(self, classe, nome, ajuda, rotulos, **kwargs):
+        chave = tuple(sorted(rotulos.items()))
+        with self._lock:
+            familia = self._familias.setdefault(nome, (classe.tipo, ajuda, {}))
+            if familia[0] != classe.tipo:
+                raise ValueError(f"Métrica {nome} já registrada como {familia[0]}.")
+            metrica = familia[2].get(chave)
+            if metrica is None:
+                metrica = familia[2][chave] = classe(**kwargs)
+        return metrica
+
+    def contador(self, nome, ajuda='', funcao=None, **rotulos):
+        return self._obter(Contador, nome, ajuda, rotulos, funcao=funcao)
+
+    def medidor(self, nome, ajuda='', funcao=None, **rotulos):
+        return self._obter(Medidor, nome, ajuda, rotulos, funcao=funcao)
+
+    def histograma(self, nome, ajuda='', limites=LIMITES_LATENCIA, **rotulos):
+        return self._obter(Histograma, nome, ajuda, rotulos, limites=limites)
+
+    def coletor(self, prefixo, funcao, ajuda=''):
+        with self._lock:
+            self._coletores = [c for c in self._coletores if c[0] != prefixo] + [(prefixo, funcao, ajuda)]
+
+    def _valores_coletados(self):
+        for prefixo, funcao, ajuda in list(self._coletores):
+            try:
+                valores = funcao()
+            except Exception as e:
+                print(f"Erro ao coletar as métricas de {prefixo}: {e}")
+                continue
+            for chave, valor in valores.items():
+                if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+                    yield f"{prefixo}_{chave}", ajuda, valor
+
+    def exportar(self):
+        """Todas as métricas no formato de exposição texto do Prometheus (0.0.4)."""
+        with self._lock:
+            familias = sorted((nome, tipo, ajuda, list(metricas.items()))
+                              for nome, (tipo, ajuda, metricas) in self._familias.items())
+        linhas = []
+        for nome, tipo, ajuda, metricas in familias:
+            if ajuda:
+                linhas.append(f"# HELP {nome} {ajuda}")
+            linhas.append(f"# TYPE {nome} {tipo}")
+            for rotulos, metrica in metricas:
+                if tipo != 'histogram':
+                    linhas.append(f"{nome}{_rotulos(rotulos)} {_numero(metrica.ler())}")
+                    continue
+                with metrica._lock:
+                    contagens, soma, n = list(metrica.contagens), metrica.soma, metrica.n
+                acumulado = 0
+                for limite, contagem in zip(metrica.limites + (float('inf'),), contagens):
+                    acumulado += contagem
+                    linhas.append(f"{nome}_bucket{_rotulos(rotulos, ('le', _numero(float(limite))))} {acumulado}")
+                linhas.append(f"{nome}_sum{_rotulos(rotulos)} {_numero(soma)}")
+                linhas.append(f"{nome}_count{_rotulos(rotulos)} {n}")
+        for nome, ajuda, valor in self._valores_coletados():
+            if ajuda:
+                linhas.append(f"# HELP {nome} {ajuda}")
+            linhas.append(f"# TYPE {nome} gauge")
+            linhas.append(f"{nome} {_numero(valor)}")
+        return '\n'.join(linhas) + '\n'
+
+    def resumo(self):
+        """Linhas legíveis (nome, valor) para painéis: histogramas como n, p50 e p99 em ms."""
+        with self._lock:
+            familias = sorted((nome, list(metricas.items())) for nome, (_, _, metricas) in self._familias.items())
+        linhas = []
+        for nome, metricas in familias:
+            for rotulos, metrica in metricas:
+                rotulo = nome + _rotulos(rotulos)
+                if isinstance(metrica, Histograma):
+                    if metrica.n:
+                        linhas.append((rotulo, f"n={metrica.n} p50={metrica.quantil(0.5) * 1000:.2f} ms "
+                                               f"p99={metrica.quantil(0.99) * 1000:.2f} ms "
+                                               f"média={metrica.soma / metrica.n * 1000:.2f} ms"))
+                    else:
+                        linhas.append((rotulo, "n=0"))
+                else:
+                    valor = metrica.ler()
+                    linhas.append((rotulo, f"{valor:.4g}" if isinstance(valor, float) else str(valor)))
+        linhas += [(nome, f"{valor:.4g}" if isinstance(valor, float) else str(valor))
+                   for nome, _, valor in self._valores_coletados()]
+        return linhas
+
+
+# Registro do processo (coletor, servidor): os módulos criam as suas métricas nele
+REGISTRO = RegistroMetricas()
+
+
+class ProfilerAmostragem:
+    """
+    Profiler por amostragem: a cada `intervalo` segundos copia a pilha de todas
+    as threads (sys._current_frames) e conta cada pilha. Não instrumenta as
+    funções, então o custo é só o da thread de amostragem.
+
+    As pilhas são identificadas por arquivo:função, sem o número da linha,
+    para que o número de pilhas distintas não cresça com o tempo; acima de
+    `max_pilhas`, as amostras de pilhas novas vão para PILHA_EXCEDENTE.
+    `pilhas()` devolve o formato "folded" (func;func;func contagem por linha),
+    que o flamegraph.pl e o speedscope leem direto.
+    """
+
+    def __init__(self, intervalo=0.01, profundidade=64, max_pilhas=10_000):
+        self.intervalo = intervalo
+        self.profundidade = profundidade
+        self.max_pilhas = max_pilhas
+        self.amostras = Counter()
+        self.total = 0
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._thread = None
+
+    def _pilha(self, frame):
+        funcoes = []
+        while frame is not None and len(funcoes) < self.profundidade:
+            codigo = frame.f_code
+            funcoes.append(f"{os.path.basename(codigo.co_filename)}:{codigo.co_name}")
+            frame = frame.f_back
+        return ';'.join(reversed(funcoes))
+
+    def amostrar(self):
+        nomes = {thread.ident: thread.name for thread in threading.enumerate()}
+        proprio = threading.get_ident()
+        pilhas = [f"{nomes.get(ident, ident)};{self._pilha(frame)}"
+                  for ident, frame in sys._current_frames().items() if ident != proprio]
+        with self._lock:
+            for pilha in pilhas:
+                if pilha not in self.amostras and len(self.amostras) >= self.max_pilhas:
+                    pilha = PILHA_EXCEDENTE
+                self.amostras[pilha] += 1
+            self.total += 1
+
+    def _executar(self):
+        while not self._parar.wait(self.intervalo):
+            self.amostrar()
+
+    def iniciar(self):
+        self._thread = threading.Thread(target=self._executar, daemon=True, name='profiler')
+        self._thread.start()
+        return self
+
+    def parar(self):
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def pilhas(self, limite=None):
+        with self._lock:
+            amostras = Counter(self.amostras)
+        return ''.join(f"{pilha} {n}\n" for pilha, n in amostras.most_common(limite))
+
+    def salvar(self, caminho):
+        with open(caminho, 'w', encoding='utf-8') as f:
+            f.write(self.pilhas())
+
+
+def profiler_do_ambiente():
+    """
+    Inicia o profiler se BTC_PROFILER estiver definido (intervalo de amostragem
+    em ms, ex.: BTC_PROFILER=10); retorna None se não estiver.
+    """
+    valor = os.environ.get('BTC_PROFILER')
+    if not valor:
+        return None
+    profiler = ProfilerAmostragem(intervalo=float(valor) / 1000).iniciar()
+    print(f"Profiler por amostragem ativo (a cada {valor} ms).")
+    return profiler
@@ -0,0 +1,118 @@
+import os
+import sys
+import time
+import argparse
+import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from cassandra.cluster import Cluster
+from cassandra.query import SimpleStatement
+
+# Permite executar o script diretamente (python src/storage/migrar_tabelas_diarias.py)
+RAIZ_PROJETO = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if RAIZ_PROJETO not in sys.path:
+    sys.path.insert(0, RAIZ_PROJETO)
+
+from src.collection.liquidez import colunas_liquidez
+from src.storage.cassandra_ingest import EscritorCassandra
+from src.storage.serie_temporal import SYMBOL_PADRAO, TABELA_TICKS, criar_esquema, dia_da_tabela_legado
+
+# Colunas das tabelas antigas copiadas como estão (day_partition vira `dia` e
+# sequential_id vira `seq`, com writer_id = WRITER_LEGADO)
+COLUNAS_COPIADAS = ['id', 'dia_tempo', 'valor', 'volume_buy', 'volume_sell'] + colunas_liquidez()
+WRITER_LEGADO = 'legado'
+
+
+def listar_tabelas_legado(session, keyspace):
+    """Tabelas btc_YYYY_MM_DD do keyspace, da mais antiga para a mais nova."""
+    rows = session.execute("SELECT table_name FROM system_schema.tables WHERE keyspace_name = %s", (keyspace,))
+    tabelas = []
+    for row in rows:
+        try:
+            dia_da_tabela_legado(row.table_name)
+        except ValueError:
+            continue
+        tabelas.append(row.table_name)
+    return sorted(tabelas)
+
+
+def migrar_tabela(session, escritor, keyspace, tabela, symbol, fetch_size):
+    """Copia uma tabela diária para a tabela de ticks, lendo em páginas; retorna (tabela, linhas lidas)."""
+    dia = dia_da_tabela_legado(tabela)
+    colunas_tabela = session.cluster.metadata.keyspaces[keyspace].tables[tabela].columns
+    colunas = [c for c in COLUNAS_COPIADAS if c in colunas_tabela]
+    consulta = SimpleStatement(f"SELECT sequential_id, {', '.join(colunas)} FROM {tabela}", fetch_size=fetch_size)
+    lidas = 0
+    for row in session.execute(consulta):
+        linha = {'symbol': symbol, 'dia': dia, 'writer_id': WRITER_LEGADO, 'seq': row.sequential_id}
+        linha.update((coluna, getattr(row, coluna)) for coluna in colunas)
+        if linha['dia_tempo'] is None:
+            # Sem timestamp não há chave de clustering: usa o início do dia
+            linha['dia_tempo'] = datetime.datetime.combine(dia, datetime.time())
+        escritor.inserir(linha)
+        lidas += 1
+    return tabela, lidas
+
+
+def contar_migradas(session, symbol, dia):
+    """
+    Linhas migradas (writer_id = WRITER_LEGADO) no bucket (symbol, dia). Os
+    coletores ao vivo gravam no mesmo bucket, então o total do bucket não serve
+    para conferir a cópia; o filtro fica restrito a uma única partição.
+    """
+    row = session.execute(
+        f"SELECT COUNT(*) AS total FROM {TABELA_TICKS} WHERE symbol = %s AND dia = %s AND writer_id = %s ALLOW FILTERING",
+        (symbol, dia, WRITER_LEGADO),
+    ).one()
+    return row.total
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Migra as tabelas diárias btc_YYYY_MM_DD para a tabela única de série temporal."
+    )
+    parser.add_argument('--hosts', nargs='+', default=['127.0.0.1'])
+    parser.add_argument('--keyspace', default='btc')
+    parser.add_argument('--symbol', default=SYMBOL_PADRAO)
+    parser.add_argument('--workers', type=int, default=4, help="Tabelas migradas em paralelo.")
+    parser.add_argument('--fetch-size', type=int, default=5000)
+    parser.add_argument('--ttl-dias', type=int, default=None, help="TTL padrão da tabela de ticks (opcional).")
+    parser.add_argument('--apagar-origem', action='store_true',
+                        help="Apaga cada tabela antiga cuja contagem conferir depois da cópia.")
+    args = parser.parse_args()
+
+    cluster = Cluster(args.hosts)
+    session = cluster.connect(args.keyspace)
+    criar_esquema(session, colunas_liquidez(), ttl_segundos=args.ttl_dias * 86400 if args.ttl_dias else None)
+    escritor = EscritorCassandra(session, max_em_voo=64, colunas_extra=colunas_liquidez())
+
+    tabelas = listar_tabelas_legado(session, args.keyspace)
+    print(f"{len(tabelas)} tabelas diárias para migrar.")
+    inicio = time.perf_counter()
+    lidas_por_tabela = {}
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futuros = [executor.submit(migrar_tabela, session, escritor, args.keyspace, tabela, args.symbol, args.fetch_size)
+                   for tabela in tabelas]
+        for futuro in as_completed(futuros):
+            tabela, lidas = futuro.result()
+            lidas_por_tabela[tabela] = lidas
+            print(f"{tabela}: {lidas} linhas lidas.")
+    escritor.fechar()
+    print(f"Migração concluída em {time.perf_counter() - inicio:.1f} s.")
+
+    divergentes = 0
+    for tabela in tabelas:
+        gravadas = contar_migradas(session, args.symbol, dia_da_tabela_legado(tabela))
+        if gravadas != lidas_por_tabela[tabela]:
+            divergentes += 1
+            print(f"{tabela}: {lidas_por_tabela[tabela]} linhas lidas, mas {gravadas} migradas no bucket.")
+        elif args.apagar_origem:
+            session.execute(f"DROP TABLE {tabela}")
+            print(f"{tabela} apagada.")
+    if divergentes:
+        print(f"{divergentes} tabelas com contagem divergente; nenhuma delas foi apagada.")
+    cluster.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+from cassandra.cluster import Cluster
+
+# Permite executar o script diretamente (python src/storage/reconciliar_candles.py)
+RAIZ_PROJETO = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if RAIZ_PROJETO not in sys.path:
+    sys.path.insert(0, RAIZ_PROJETO)
+
+from src.analysis.candles import RESOLUCOES_PADRAO
+from src.collection.backfill import BackfillBinance, BASE_URL_BINANCE
+from src.collection.data_collection import validar_datas, para_ms
+from src.collection.kline_store import KlineStore, INTERVALO_MS
+from src.storage.serie_temporal import SYMBOL_PADRAO
+from src.storage.tabela_candles import (
+    CONSULTA_KLINE, criar_esquema_candles, consultas_intervalo, candle_da_linha, parametros_kline,
+)
+
+# Divergência (bps) entre o fechamento dos ticks e o da kline a partir da qual o candle é listado
+LIMIAR_DIVERGENCIA_BPS = 10.0
+
+
+def deslocamento_local_ms(utc_ms):
+    """
+    Diferença do horário local (usado nos ticks) para UTC (usado nas klines)
+    no instante `utc_ms`, em ms: segue o horário de verão de cada data.
+    """
+    return time.localtime(utc_ms // 1000).tm_gmtoff * 1000
+
+
+def deslocamentos_no_intervalo(inicio_utc_ms, fim_utc_ms):
+    """Deslocamentos distintos em [inicio, fim), amostrados de hora em hora."""
+    return {deslocamento_local_ms(ms) for ms in range(inicio_utc_ms, fim_utc_ms, 3_600_000)} \
+        or {deslocamento_local_ms(inicio_utc_ms)}
+
+
+def klines_como_candles(store, symbol, resolucao, inicio_utc_ms, fim_utc_ms):
+    """Klines do disco -> dict inicio (ms no horário local, como os ticks) -> campos do candle."""
+    df = store.ler(symbol, resolucao, inicio_utc_ms, fim_utc_ms)
+    if df.empty:
+        return {}
+    inicios_utc = df['timestamp'].values.astype('datetime64[ms]').astype(np.int64).tolist()
+    inicios = [inicio + deslocamento_local_ms(inicio) for inicio in inicios_utc]
+    candles = {}
+    for i, inicio in enumerate(inicios):
+        candles[inicio] = {
+            'inicio': inicio,
+            'abertura': float(df['open'].iat[i]), 'maxima': float(df['high'].iat[i]),
+            'minima': float(df['low'].iat[i]), 'fechamento': float(df['close'].iat[i]),
+            'volume': float(df['volume'].iat[i]), 'volume_quote': float(df['quote_asset_volume'].iat[i]),
+            'trades': int(df['number_of_trades'].iat[i]), 'divergencia_bps': None,
+        }
+    return candles
+
+
+def reconciliar(session, store, symbol, resolucao, inicio_utc_ms, fim_utc_ms):
+    """
+    Grava as klines de [inicio, fim) como a versão final dos candles.
+
+    Candles que só existiam nas klines (lacunas da coleta) são criados;
+    os que vieram dos ticks ganham o volume negociado, passam a usar o OHLC
+    da Binance e registram a divergência do fechamento dos ticks em bps.
+    Numa nova execução, os já reconciliados mantêm a divergência calculada
+    antes. Retorna (gravados, criados, divergentes).
+    """
+    klines = klines_como_candles(store, symbol, resolucao, inicio_utc_ms, fim_utc_ms)
+    deslocamentos = deslocamentos_no_intervalo(inicio_utc_ms, fim_utc_ms)
+    existentes = {}
+    for consulta, parametros in consultas_intervalo(resolucao, inicio_utc_ms + min(deslocamentos),
+                                                    fim_utc_ms + max(deslocamentos), symbol):
+        for row in session.execute(consulta, parametros):
+            candle = candle_da_linha(row)
+            existentes[candle['inicio']] = candle
+
+    criados = divergentes = 0
+    for inicio, kline in klines.items():
+        do_tick = existentes.get(inicio)
+        if do_tick is None:
+            criados += 1
+        elif do_tick['fonte'] != 'ticks':
+            # Já reconciliado: os ticks foram sobrescritos, a divergência só existe no registro anterior
+            kline['divergencia_bps'] = do_tick['divergencia_bps']
+        elif do_tick['fechamento'] and kline['fechamento']:
+            kline['divergencia_bps'] = abs(do_tick['fechamento'] - kline['fechamento']) / kline['fechamento'] * 1e4
+            if kline['divergencia_bps'] > LIMIAR_DIVERGENCIA_BPS:
+                divergentes += 1
+                print(f"{symbol} {resolucao} {inicio}: fechamento dos ticks {do_tick['fechamento']} "
+                      f"vs kline {kline['fechamento']} ({kline['divergencia_bps']:.1f} bps)")
+        session.execute(CONSULTA_KLINE, parametros_kline(resolucao, kline, symbol))
+    return len(klines), criados, divergentes
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Reconcilia os candles agregados dos ticks com as klines da Binance."
+    )
+    parser.add_argument('--hosts', nargs='+', default=['127.0.0.1'])
+    parser.add_argument('--keyspace', default='btc')
+    parser.add_argument('--symbol', default=SYMBOL_PADRAO)
+    parser.add_argument('--resolucoes', nargs='+', default=list(RESOLUCOES_PADRAO))
+    parser.add_argument('--inicio', required=True, help='Ex.: "1 Jan, 2025"')
+    parser.add_argument('--fim', required=True, help='Ex.: "8 Jan, 2025"')
+    parser.add_argument('--cache-dir', default="data/raw/klines")
+    parser.add_argument('--base-url', default=BASE_URL_BINANCE)
+    parser.add_argument('--sem-download', action='store_true', help="Usa só as klines já no disco.")
+    args = parser.parse_args()
+
+    inicio, fim = validar_datas(args.inicio, args.fim)
+    inicio_ms, fim_ms = para_ms(inicio), para_ms(fim)
+    deslocamentos = deslocamentos_no_intervalo(inicio_ms, fim_ms)
+    # Os ticks usam o horário local: só dá para casar resoluções cujos limites coincidem nos dois fusos
+    # em todo o intervalo (com horário de verão, antes e depois da mudança)
+    resolucoes = [r for r in args.resolucoes if all(d % INTERVALO_MS[r] == 0 for d in deslocamentos)]
+    for ignorada in sorted(set(args.resolucoes) - set(resolucoes)):
+        print(f"{ignorada}: os candles locais não se alinham às klines UTC neste fuso; ignorada.")
+
+    store = KlineStore(args.cache_dir)
+    if not args.sem_download:
+        BackfillBinance(store, base_url=args.base_url).executar([args.symbol], resolucoes, inicio_ms, fim_ms)
+
+    cluster = Cluster(args.hosts)
+    session = cluster.connect(args.keyspace)
+    criar_esquema_candles(session)
+    for resolucao in resolucoes:
+        gravados, criados, divergentes = reconciliar(session, store, args.symbol, resolucao, inicio_ms, fim_ms)
+        print(f"{args.symbol} {resolucao}: {gravados} candles reconciliados, {criados} criados a partir das "
+              f"klines, {divergentes} com divergência acima de {LIMIAR_DIVERGENCIA_BPS} bps.")
+    cluster.shutdown()
+
+
+if __name__ == '__main__':
+    main()
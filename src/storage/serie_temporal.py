@@ -0,0 +1,211 @@
+import os
+import uuid
+import socket
+import datetime
+
+# Uma única tabela de série temporal no lugar de uma tabela btc_YYYY_MM_DD por dia
+TABELA_TICKS = 'ticks'
+# Dias com dados por símbolo (substitui a varredura do system_schema em /api/tables)
+TABELA_DIAS = 'ticks_dias'
+SYMBOL_PADRAO = 'BTCUSDT'
+PREFIXO_LEGADO = 'btc_'
+_EPOCA = datetime.datetime(1970, 1, 1)
+CONSULTA_DIAS = f"SELECT dia FROM {TABELA_DIAS} WHERE symbol = %s"
+# Colunas devolvidas pela leitura paginada de ticks brutos
+COLUNAS_PAGINA = ('dia_tempo', 'writer_id', 'seq', 'valor', 'volume_buy', 'volume_sell')
+
+
+def criar_esquema(session, colunas_extra=(), ttl_segundos=None):
+    """
+    Cria (se não existirem) a tabela de ticks e a tabela de dias.
+
+    A partição é (symbol, dia): um bucket por símbolo e dia, ordenado por
+    (dia_tempo, writer_id, seq). Cada coletor tem seu writer_id e numera os
+    próprios ticks, então vários coletores gravam ao mesmo tempo sem colisão
+    e sem ler nada antes de escrever. A compactação por janelas de tempo
+    (TWCS, janelas de 1 dia) combina com a escrita sempre no fim da série;
+    com `ttl_segundos` os ticks expiram sozinhos, descartando SSTables inteiras.
+    """
+    extras = ''.join(f"\n            {coluna} DOUBLE," for coluna in colunas_extra)
+    session.execute(f"""CREATE TABLE IF NOT EXISTS {TABELA_TICKS} (
+            symbol TEXT,
+            dia DATE,
+            dia_tempo TIMESTAMP,
+            writer_id TEXT,
+            seq BIGINT,
+            id UUID,
+            valor DECIMAL,
+            volume_buy DECIMAL,
+            volume_sell DECIMAL,{extras}
+            PRIMARY KEY ((symbol, dia), dia_tempo, writer_id, seq)
+        ) WITH CLUSTERING ORDER BY (dia_tempo ASC, writer_id ASC, seq ASC)
+        AND compaction = {{'class': 'TimeWindowCompactionStrategy',
+                           'compaction_window_unit': 'DAYS', 'compaction_window_size': 1}}
+        AND default_time_to_live = {int(ttl_segundos or 0)};""")
+    session.execute(f"""CREATE TABLE IF NOT EXISTS {TABELA_DIAS} (
+            symbol TEXT,
+            dia DATE,
+            PRIMARY KEY (symbol, dia)
+        ) WITH CLUSTERING ORDER BY (dia DESC);""")
+    if ttl_segundos is not None:
+        session.execute(f"ALTER TABLE {TABELA_TICKS} WITH default_time_to_live = {int(ttl_segundos)}")
+
+
+def gerar_writer_id():
+    """Identificador único do processo coletor (host, pid e um sufixo aleatório)."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+def para_ms(momento):
+    """dia_tempo -> ms desde a época, sem conversão de fuso (o valor gravado é o horário do coletor)."""
+    return int((momento - _EPOCA) / datetime.timedelta(milliseconds=1))
+
+
+def de_ms(ms):
+    """Inverso de para_ms."""
+    return _EPOCA + datetime.timedelta(milliseconds=int(ms))
+
+
+def dias_no_intervalo(inicio, fim):
+    """Buckets (datas) que cobrem [inicio, fim]."""
+    dia, ultimo = inicio.date(), fim.date()
+    dias = []
+    while dia <= ultimo:
+        dias.append(dia)
+        dia += datetime.timedelta(days=1)
+    return dias
+
+
+def nome_tabela_legado(dia):
+    """Nome no formato antigo (btc_YYYY_MM_DD), ainda usado como identificador do dia pela API."""
+    return f"{PREFIXO_LEGADO}{dia:%Y_%m_%d}"
+
+
+def dia_da_tabela_legado(nome):
+    """btc_YYYY_MM_DD -> date; ValueError se o nome não estiver nesse formato."""
+    if not nome.startswith(PREFIXO_LEGADO):
+        raise ValueError(f"Nome de tabela inválido: {nome}")
+    return datetime.datetime.strptime(nome[len(PREFIXO_LEGADO):], '%Y_%m_%d').date()
+
+
+def dias_das_linhas(rows):
+    """Linhas de `ticks_dias` -> datas (o driver devolve cassandra.util.Date)."""
+    return [row.dia.date() if hasattr(row.dia, 'date') else row.dia for row in rows]
+
+
+def listar_dias(session, symbol=SYMBOL_PADRAO):
+    """Dias com dados do símbolo, do mais recente ao mais antigo."""
+    return dias_das_linhas(session.execute(CONSULTA_DIAS, (symbol,)))
+
+
+def ler_intervalo(session, inicio, fim, symbol=SYMBOL_PADRAO, colunas=('dia_tempo', 'valor'),
+                  fetch_size=5000):
+    """
+    Lê os ticks de [inicio, fim] atravessando os buckets diários.
+
+    As consultas de cada dia são disparadas juntas (execute_async) e o
+    resultado é devolvido em ordem de tempo, paginado pelo driver.
+    """
+    consulta = session.prepare(
+        f"SELECT {', '.join(colunas)} FROM {TABELA_TICKS} "
+        f"WHERE symbol = ? AND dia = ? AND dia_tempo >= ? AND dia_tempo <= ?"
+    )
+    consulta.fetch_size = fetch_size
+    futuros = [session.execute_async(consulta, (symbol, dia, inicio, fim)) for dia in dias_no_intervalo(inicio, fim)]
+    linhas = []
+    for futuro in futuros:
+        linhas.extend(futuro.result())
+    return linhas
+
+
+def consulta_pagina(dia, inicio, fim, symbol=SYMBOL_PADRAO, limite=5000, apos=None, colunas=None):
+    """(consulta, parâmetros) de um bucket para ler_pagina."""
+    colunas = tuple(dict.fromkeys(('dia_tempo', 'writer_id', 'seq') + tuple(colunas or COLUNAS_PAGINA)))
+    consulta = f"SELECT {', '.join(colunas)} FROM {TABELA_TICKS} WHERE symbol = %s AND dia = %s"
+    if apos and dia == apos[0].date():
+        # Comparação de tupla nas colunas de clustering: continua depois da chave
+        consulta += " AND (dia_tempo, writer_id, seq) > (%s, %s, %s) AND (dia_tempo) <= (%s) LIMIT %s"
+        return consulta, (symbol, dia) + tuple(apos) + (fim, limite)
+    consulta += " AND dia_tempo >= %s AND dia_tempo <= %s LIMIT %s"
+    return consulta, (symbol, dia, inicio, fim, limite)
+
+
+def ler_pagina(session, inicio, fim, symbol=SYMBOL_PADRAO, limite=5000, apos=None, colunas=None):
+    """
+    Uma página de ticks brutos de [inicio, fim], em ordem de chave.
+
+    `apos` é a chave (dia_tempo, writer_id, seq) do último tick da página
+    anterior; a leitura continua logo depois dela, atravessando os buckets
+    diários até juntar `limite` linhas. Retorna (linhas, chave da próxima
+    página ou None se o intervalo acabou).
+    """
+    linhas = []
+    for dia in dias_no_intervalo(apos[0] if apos else inicio, fim):
+        linhas.extend(session.execute(*consulta_pagina(dia, inicio, fim, symbol, limite - len(linhas), apos, colunas)))
+        if len(linhas) >= limite:
+            ultima = linhas[-1]
+            return linhas, (ultima.dia_tempo, ultima.writer_id, ultima.seq)
+    return linhas, None
+
+
+class CursorTicks:
+    """
+    Leitura incremental dos ticks do dia, correta com vários coletores.
+
+    Cada consulta relê uma janela de `sobreposicao` antes do último dia_tempo
+    visto, porque um coletor pode gravar um tick com horário anterior ao de
+    outro que já foi lido (lotes assíncronos, relógios ligeiramente diferentes).
+    As chaves (writer_id, seq) já entregues dentro dessa janela são lembradas,
+    então cada tick é devolvido uma única vez; ticks recebidos por outro meio
+    (o barramento do server.py) entram no cursor com `registrar`. Ao virar o
+    dia o cursor recomeça no novo bucket.
+    """
+
+    def __init__(self, symbol=SYMBOL_PADRAO, sobreposicao=datetime.timedelta(seconds=10),
+                 colunas=('dia_tempo', 'writer_id', 'seq', 'valor')):
+        self.symbol = symbol
+        self.sobreposicao = sobreposicao
+        self.colunas = tuple(dict.fromkeys(('dia_tempo', 'writer_id', 'seq') + tuple(colunas)))
+        self.query = (f"SELECT {', '.join(self.colunas)} FROM {TABELA_TICKS} "
+                      f"WHERE symbol = %s AND dia = %s AND dia_tempo >= %s")
+        self.reiniciar(None)
+
+    def reiniciar(self, dia):
+        self.dia = dia
+        self.ultimo_tempo = _EPOCA
+        self.vistos = {}
+
+    def registrar(self, dia, dia_tempo, writer_id, seq):
+        """Marca um tick como entregue; retorna False se ele já tinha sido visto."""
+        if dia != self.dia:
+            self.reiniciar(dia)
+        chave = (writer_id, seq)
+        if chave in self.vistos:
+            return False
+        self.vistos[chave] = dia_tempo
+        if dia_tempo > self.ultimo_tempo:
+            self.ultimo_tempo = dia_tempo
+        return True
+
+    def _esquecer_antigos(self):
+        # Esquece as chaves que já saíram da janela de sobreposição
+        limite = self.ultimo_tempo - self.sobreposicao
+        self.vistos = {chave: tempo for chave, tempo in self.vistos.items() if tempo >= limite}
+
+    def consulta(self, dia):
+        """(consulta, parâmetros) da próxima leitura do bucket `dia`."""
+        if dia != self.dia:
+            self.reiniciar(dia)
+        desde = max(self.ultimo_tempo - self.sobreposicao, _EPOCA)
+        return self.query, (self.symbol, dia, desde)
+
+    def filtrar(self, dia, rows):
+        """Mantém só os ticks de `rows` ainda não entregues, em ordem de tempo."""
+        novos = [row for row in rows if self.registrar(dia, row.dia_tempo, row.writer_id, row.seq)]
+        self._esquecer_antigos()
+        return novos
+
+    def novos(self, session, dia=None):
+        """Ticks ainda não entregues do bucket `dia` (hoje, por padrão), em ordem de tempo."""
+        dia = dia or datetime.date.today()
+        return self.filtrar(dia, session.execute(*self.consulta(dia)))
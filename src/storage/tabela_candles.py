@@ -0,0 +1,93 @@
+from src.storage.serie_temporal import SYMBOL_PADRAO, de_ms, para_ms
+
+# Candles OHLC por símbolo e resolução, mantidos a partir dos ticks (ver analysis/candles)
+TABELA_CANDLES = 'candles'
+# Resoluções finas particionadas por mês, as demais por ano (partições de tamanho limitado)
+RESOLUCOES_MENSAIS = ('1m', '3m', '5m', '15m', '30m')
+
+COLUNAS_CANDLE = ('abertura', 'maxima', 'minima', 'fechamento', 'ticks', 'volume_buy_medio', 'volume_sell_medio')
+COLUNAS_KLINE = ('abertura', 'maxima', 'minima', 'fechamento', 'volume', 'volume_quote', 'trades', 'divergencia_bps')
+_CHAVE = ('symbol', 'resolucao', 'periodo', 'inicio')
+_COLUNAS_LIDAS = ('inicio',) + COLUNAS_CANDLE + ('volume', 'divergencia_bps', 'fonte')
+
+
+def _insert(colunas):
+    colunas = _CHAVE + colunas + ('fonte',)
+    return f"INSERT INTO {TABELA_CANDLES} ({', '.join(colunas)}) VALUES ({', '.join(['%s'] * len(colunas))})"
+
+
+CONSULTA_CANDLE = _insert(COLUNAS_CANDLE)
+CONSULTA_KLINE = _insert(COLUNAS_KLINE)
+
+
+def criar_esquema_candles(session):
+    """
+    Cria a tabela de candles. `fonte` indica a origem dos preços: 'ticks'
+    (agregado ao vivo) ou 'klines' (reconciliado com a Binance, que passa a
+    valer e informa o volume negociado e a divergência em bps dos ticks).
+    """
+    session.execute(f"""CREATE TABLE IF NOT EXISTS {TABELA_CANDLES} (
+            symbol TEXT,
+            resolucao TEXT,
+            periodo TEXT,
+            inicio TIMESTAMP,
+            abertura DOUBLE,
+            maxima DOUBLE,
+            minima DOUBLE,
+            fechamento DOUBLE,
+            ticks INT,
+            volume_buy_medio DOUBLE,
+            volume_sell_medio DOUBLE,
+            volume DOUBLE,
+            volume_quote DOUBLE,
+            trades INT,
+            divergencia_bps DOUBLE,
+            fonte TEXT,
+            PRIMARY KEY ((symbol, resolucao, periodo), inicio)
+        ) WITH CLUSTERING ORDER BY (inicio ASC);""")
+
+
+def periodo_candle(resolucao, inicio_ms):
+    """Partição do candle: 'YYYY-MM' para resoluções finas, 'YYYY' para as demais."""
+    momento = de_ms(inicio_ms)
+    return f"{momento:%Y-%m}" if resolucao in RESOLUCOES_MENSAIS else f"{momento:%Y}"
+
+
+def periodos_no_intervalo(resolucao, inicio_ms, fim_ms):
+    inicio, fim = de_ms(inicio_ms), de_ms(fim_ms)
+    if resolucao not in RESOLUCOES_MENSAIS:
+        return [str(ano) for ano in range(inicio.year, fim.year + 1)]
+    periodos = []
+    ano, mes = inicio.year, inicio.month
+    while (ano, mes) <= (fim.year, fim.month):
+        periodos.append(f"{ano:04d}-{mes:02d}")
+        ano, mes = (ano + 1, 1) if mes == 12 else (ano, mes + 1)
+    return periodos
+
+
+def parametros_candle(resolucao, candle, symbol=SYMBOL_PADRAO):
+    """Parâmetros de CONSULTA_CANDLE para um candle de analysis.candles.resumo_candle."""
+    inicio = candle['inicio']
+    return ((symbol, resolucao, periodo_candle(resolucao, inicio), de_ms(inicio))
+            + tuple(candle[coluna] for coluna in COLUNAS_CANDLE) + ('ticks',))
+
+
+def parametros_kline(resolucao, candle, symbol=SYMBOL_PADRAO):
+    """Parâmetros de CONSULTA_KLINE para um candle reconciliado (dict com COLUNAS_KLINE e `inicio`)."""
+    inicio = candle['inicio']
+    return ((symbol, resolucao, periodo_candle(resolucao, inicio), de_ms(inicio))
+            + tuple(candle[coluna] for coluna in COLUNAS_KLINE) + ('klines',))
+
+
+def consultas_intervalo(resolucao, inicio_ms, fim_ms, symbol=SYMBOL_PADRAO):
+    """(consulta, parâmetros) de cada partição com candles de [inicio_ms, fim_ms)."""
+    consulta = (f"SELECT {', '.join(_COLUNAS_LIDAS)} FROM {TABELA_CANDLES} "
+                f"WHERE symbol = %s AND resolucao = %s AND periodo = %s AND inicio >= %s AND inicio < %s")
+    return [(consulta, (symbol, resolucao, periodo, de_ms(inicio_ms), de_ms(fim_ms)))
+            for periodo in periodos_no_intervalo(resolucao, inicio_ms, fim_ms)]
+
+
+def candle_da_linha(row):
+    candle = {coluna: getattr(row, coluna) for coluna in _COLUNAS_LIDAS}
+    candle['inicio'] = para_ms(row.inicio)
+    return candle
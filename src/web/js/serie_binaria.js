@@ -0,0 +1,64 @@
+// Leitor do formato binário de séries (ver src/main/formato_binario.py).
+// Os arrays são lidos direto do buffer (Float64Array/Int32Array), sem parse de texto.
+const MIDIA_SERIE_BINARIA = 'application/vnd.btc.serie';
+
+const SERIE_COMPRIMIDA = 1;
+const SERIE_TEMPOS_ABSOLUTOS = 2;
+
+function alinharEm8(posicao) {
+    return posicao + ((8 - (posicao % 8)) % 8);
+}
+
+async function descomprimir(buffer) {
+    // zlib (RFC 1950) = 'deflate' na Compression Streams API
+    const fluxo = new Blob([buffer]).stream().pipeThrough(new DecompressionStream('deflate'));
+    return await new Response(fluxo).arrayBuffer();
+}
+
+// ArrayBuffer -> { meta, tempos: Float64Array (ms), valores: Float64Array }
+async function decodificarSerie(buffer) {
+    const prefixo = new Uint8Array(buffer, 0, 8);
+    if (String.fromCharCode(prefixo[0], prefixo[1], prefixo[2], prefixo[3]) !== 'BTC1') {
+        throw new Error('Mensagem não está no formato binário de séries.');
+    }
+    const flags = prefixo[4];
+    const corpo = flags & SERIE_COMPRIMIDA ? await descomprimir(buffer.slice(8)) : buffer.slice(8);
+    const visao = new DataView(corpo);
+    const n = visao.getUint32(0, true);
+    const tamanhoMeta = visao.getUint32(4, true);
+    const meta = JSON.parse(new TextDecoder().decode(new Uint8Array(corpo, 8, tamanhoMeta)));
+    let posicao = alinharEm8(8 + tamanhoMeta);
+
+    let tempos;
+    if (flags & SERIE_TEMPOS_ABSOLUTOS) {
+        tempos = new Float64Array(corpo, posicao, n);
+        posicao += 8 * n;
+    } else {
+        tempos = new Float64Array(n);
+        let t = visao.getFloat64(posicao, true);
+        const deltas = new Int32Array(corpo, posicao + 8, Math.max(n - 1, 0));
+        if (n > 0) tempos[0] = t;
+        for (let i = 0; i < deltas.length; i++) {
+            t += deltas[i];
+            tempos[i + 1] = t;
+        }
+        posicao = alinharEm8(posicao + 8 + 4 * deltas.length);
+    }
+    const valores = new Float64Array(corpo, posicao, n);
+    return { meta, tempos, valores };
+}
+
+// GET que pede o formato binário e aceita JSON como resposta (servidor antigo ou erro)
+async function buscarSerie(url) {
+    const response = await fetch(url, { headers: { 'Accept': `${MIDIA_SERIE_BINARIA}, application/json;q=0.5` } });
+    if ((response.headers.get('Content-Type') || '').startsWith(MIDIA_SERIE_BINARIA)) {
+        return await decodificarSerie(await response.arrayBuffer());
+    }
+    const json = await response.json();
+    const dados = json.data || [];
+    return {
+        meta: json,
+        tempos: Float64Array.from(dados, p => p.t),
+        valores: Float64Array.from(dados, p => p.value),
+    };
+}
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Permite rodar `pytest` da raiz sem instalar o projeto (imports `src.<pacote>`)
+RAIZ_PROJETO = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if RAIZ_PROJETO not in sys.path:
+    sys.path.insert(0, RAIZ_PROJETO)
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from src.main.formato_binario import (
+    COMPRIMIDO, TEMPOS_ABSOLUTOS, codificar_mensagem, codificar_serie, decodificar_serie,
+)
+
+
+@pytest.mark.parametrize('comprimir', [False, True])
+def test_ida_e_volta(comprimir):
+    tempos = 1_700_000_000_000 + np.cumsum(np.arange(1, 101))
+    valores = np.linspace(60_000, 61_000, 100)
+    dados = codificar_serie(tempos, valores, {'table': 'x'}, comprimir=comprimir)
+    assert bool(dados[4] & COMPRIMIDO) == comprimir
+    assert len(dados[8:]) % 8 == 0 or comprimir
+
+    meta, t, v = decodificar_serie(dados)
+    assert meta == {'table': 'x'}
+    np.testing.assert_array_equal(t, tempos)
+    np.testing.assert_array_equal(v, valores)
+
+
+def test_saltos_grandes_usam_tempos_absolutos():
+    tempos = [0, 10, 40 * 86_400_000]
+    dados = codificar_serie(tempos, [1.0, 2.0, 3.0])
+    assert dados[4] & TEMPOS_ABSOLUTOS
+    np.testing.assert_array_equal(decodificar_serie(dados)[1], tempos)
+
+
+def test_serie_vazia_e_mensagem_sem_pontos():
+    meta, t, v = decodificar_serie(codificar_mensagem({'table': 'ticks', 'points': []}))
+    assert meta == {'table': 'ticks'}
+    assert len(t) == len(v) == 0
+
+
+def test_rejeita_outro_formato():
+    with pytest.raises(ValueError):
+        decodificar_serie(b'{"points": []}')
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.analysis.indicadores import (
+    TAMANHO_BLOCO, SomasAcumuladas, IndicadoresEmBlocos, calcular_indicadores,
+    comparar_com_pandas, retornos, rsi,
+)
+
+
+@pytest.mark.parametrize('periodo', [7, 30, 200])
+def test_desvio_movel_igual_ao_pandas(periodo):
+    # Série curta, mas com vários blocos, para cobrir as emendas entre eles
+    assert comparar_com_pandas(n=5 * TAMANHO_BLOCO, periodo=periodo) < 1e-6
+
+
+def test_somas_por_bloco_igual_ao_calculo_direto():
+    rng = np.random.default_rng(1)
+    n, periodo = 3 * TAMANHO_BLOCO + 17, 50
+    precos = np.geomspace(3_000, 100_000, n)[:, None] + rng.normal(0, 5, (n, 2))
+    somas = SomasAcumuladas(precos)
+    janelas = np.lib.stride_tricks.sliding_window_view(precos, periodo, axis=0)
+
+    media = somas.media(periodo)
+    desvio = somas.desvio(periodo)
+    assert np.isnan(media[:periodo - 1]).all()
+    np.testing.assert_allclose(media[periodo - 1:], janelas.mean(axis=-1), rtol=1e-12)
+    np.testing.assert_allclose(desvio[periodo - 1:], janelas.std(axis=-1, ddof=1), rtol=1e-9)
+
+
+def test_somas_com_nan_igual_ao_rolling():
+    precos = np.arange(1, 2 * TAMANHO_BLOCO + 1, dtype=np.float64)
+    precos[[5, TAMANHO_BLOCO + 3]] = np.nan
+    esperado = pd.Series(precos).rolling(10)
+    somas = SomasAcumuladas(precos[:, None])
+    np.testing.assert_allclose(somas.media(10)[:, 0], esperado.mean().to_numpy(), rtol=1e-12)
+    # NaN nas mesmas posições que o pandas; valores dentro da diferença documentada
+    np.testing.assert_allclose(somas.desvio(10)[:, 0], esperado.std().to_numpy(), rtol=1e-6)
+
+
+def test_retornos_e_rsi_sem_linhas():
+    vazio = np.empty((0, 2))
+    retorno, acumulado = retornos(vazio)
+    assert retorno.shape == acumulado.shape == (0, 2)
+    assert rsi(vazio).shape == (0, 2)
+
+
+def test_calcular_indicadores_sem_linhas():
+    df = pd.DataFrame({'close': pd.Series(dtype=np.float64)})
+    resultado = calcular_indicadores(df, ['retornos', 'mm_7', 'volatilidade_30', 'rsi_14'])
+    assert resultado.empty
+    assert {'retorno_diario', 'retorno_acumulado', 'mm_7', 'volatilidade_30', 'rsi_14'} <= set(resultado.columns)
+
+
+def test_em_blocos_igual_a_serie_inteira_e_aceita_bloco_vazio():
+    precos = np.linspace(100, 200, 500) + np.sin(np.arange(500))
+    df = pd.DataFrame({'close': precos})
+    indicadores = ['retornos', 'mm_7', 'volatilidade_30']
+    esperado = calcular_indicadores(df, indicadores)
+
+    em_blocos = IndicadoresEmBlocos(indicadores)
+    partes = [em_blocos.processar(df.iloc[:0])]
+    partes += [em_blocos.processar(df.iloc[i:i + 64]) for i in range(0, len(df), 64)]
+    assert partes[0].empty
+    pd.testing.assert_frame_equal(pd.concat(partes[1:]), esperado, rtol=1e-9)
@@ -0,0 +1,63 @@
+import numpy as np
+
+from src.collection.order_book import LadoLivro, limite_com_margem
+
+
+def _notional(niveis):
+    return float(sum(preco * quantidade for preco, quantidade in niveis))
+
+
+def test_limite_com_margem():
+    assert limite_com_margem(100) == 500
+    assert limite_com_margem(1000) == 5000
+    assert limite_com_margem(5000) == 5000
+
+
+def test_aplicar_atualiza_remove_e_insere():
+    bids = LadoLivro(decrescente=True)
+    bids.carregar([[100, 1], [99, 2], [98, 3]])
+    # O mesmo preço repetido no lote vale pela última quantidade
+    bids.aplicar([[99, 0], [101, 1], [98, 5], [98, 4]])
+    np.testing.assert_array_equal(bids.niveis(), [[101, 1], [100, 1], [98, 4]])
+    assert bids.melhor() == 101
+    assert bids.notional == _notional([[101, 1], [100, 1], [98, 4]])
+
+
+def test_notional_so_da_janela():
+    asks = LadoLivro(decrescente=False, profundidade=2)
+    asks.carregar([[10, 1], [11, 1], [12, 1], [13, 1]], limite=4)
+    assert asks.notional == 21
+    asks.aplicar([[10, 0]])
+    assert asks.notional == 23
+    assert len(asks.precos) == 3
+
+
+def test_corte_recua_a_fronteira():
+    bids = LadoLivro(decrescente=True, profundidade=2)
+    bids.carregar([[100, 1], [99, 1], [98, 1], [97, 1]], limite=4)
+    assert bids.fronteira == 97
+    bids.aplicar([[102, 1], [101, 1]])
+    # Guarda só `maximo` níveis; os descartados passam a ficar além da fronteira
+    assert len(bids.precos) == 4 and bids.fronteira == 99
+    assert bids.exatos() == 4
+
+
+def test_janela_curta_pede_snapshot():
+    asks = LadoLivro(decrescente=False, profundidade=3)
+    asks.carregar([[10 + i, 1] for i in range(6)], limite=6)
+    asks.aplicar([[10, 0], [11, 0], [12, 0]])
+    assert asks.exatos() == 3 and not asks.curto()
+    asks.aplicar([[13, 0], [20, 1]])
+    # 20 está além da fronteira (15): pode haver níveis entre 15 e 20 que o snapshot não trouxe
+    assert asks.exatos() == 2 and asks.curto()
+
+
+def test_lado_inteiro_e_sem_margem_nunca_ficam_curtos():
+    inteiro = LadoLivro(decrescente=False, profundidade=5)
+    inteiro.carregar([[10, 1], [11, 1]], limite=100)
+    assert inteiro.fronteira is None and not inteiro.curto()
+
+    sem_margem = LadoLivro(decrescente=False, profundidade=3)
+    sem_margem.carregar([[10, 1], [11, 1], [12, 1]])
+    sem_margem.aplicar([[10, 0]])
+    assert not sem_margem.curto()
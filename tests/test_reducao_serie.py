@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from src.analysis.reducao_serie import lttb, minmax, reduzir
+
+
+def _serie(n=10_000):
+    tempos = np.arange(n, dtype=np.int64) * 1000
+    valores = np.sin(np.arange(n) / 50.0)
+    if n > 7777:
+        valores[1234] = 10.0
+        valores[7777] = -10.0
+    return tempos, valores
+
+
+def test_lttb_mantem_extremidades_e_quantidade():
+    tempos, valores = _serie()
+    indices = lttb(tempos, valores, 200)
+    assert len(indices) == 200
+    assert indices[0] == 0 and indices[-1] == len(tempos) - 1
+    assert (np.diff(indices) > 0).all()
+    assert {1234, 7777} <= set(indices)
+
+
+def test_minmax_mantem_picos():
+    tempos, valores = _serie()
+    indices = minmax(tempos, valores, 100)
+    assert len(indices) <= 100
+    assert (np.diff(indices) > 0).all()
+    assert {1234, 7777} <= set(indices)
+
+
+@pytest.mark.parametrize('metodo', ['lttb', 'minmax'])
+def test_serie_menor_volta_inteira(metodo):
+    tempos, valores = _serie(50)
+    t, v = reduzir(tempos, valores, 100, metodo)
+    np.testing.assert_array_equal(t, tempos)
+    np.testing.assert_array_equal(v, valores)
+
+
+def test_metodo_invalido():
+    with pytest.raises(ValueError):
+        reduzir([0, 1], [1.0, 2.0], 1, 'media')
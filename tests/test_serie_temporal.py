@@ -0,0 +1,43 @@
+import datetime
+from collections import namedtuple
+
+from src.storage.serie_temporal import CursorTicks
+
+Linha = namedtuple('Linha', 'dia_tempo writer_id seq valor')
+DIA = datetime.date(2026, 1, 2)
+
+
+def _linha(segundos, writer_id, seq):
+    return Linha(datetime.datetime(2026, 1, 2, 12) + datetime.timedelta(seconds=segundos), writer_id, seq, 1.0)
+
+
+def test_cursor_entrega_cada_tick_uma_vez():
+    cursor = CursorTicks(sobreposicao=datetime.timedelta(seconds=10))
+    primeira = [_linha(0, 'a', 1), _linha(1, 'b', 1), _linha(2, 'a', 2)]
+    assert cursor.filtrar(DIA, primeira) == primeira
+
+    # A releitura da janela traz de novo os já vistos e um atrasado de outro coletor
+    atrasado = _linha(1.5, 'b', 2)
+    segunda = [_linha(1, 'b', 1), atrasado, _linha(2, 'a', 2), _linha(3, 'a', 3)]
+    assert cursor.filtrar(DIA, segunda) == [atrasado, _linha(3, 'a', 3)]
+
+    _, parametros = cursor.consulta(DIA)
+    assert parametros[2] == _linha(3, 'a', 3).dia_tempo - cursor.sobreposicao
+
+
+def test_cursor_registrar_e_virada_do_dia():
+    cursor = CursorTicks()
+    tick = _linha(0, 'a', 1)
+    assert cursor.registrar(DIA, tick.dia_tempo, 'a', 1)
+    assert cursor.filtrar(DIA, [tick]) == []
+
+    # Outro dia: o cursor recomeça e a mesma chave volta a valer
+    amanha = DIA + datetime.timedelta(days=1)
+    assert cursor.filtrar(amanha, [tick]) == [tick]
+    assert cursor.dia == amanha
+
+
+def test_cursor_esquece_chaves_fora_da_janela():
+    cursor = CursorTicks(sobreposicao=datetime.timedelta(seconds=5))
+    cursor.filtrar(DIA, [_linha(0, 'a', 1), _linha(60, 'a', 2)])
+    assert set(cursor.vistos) == {('a', 2)}